@@ -153,6 +153,18 @@ class ActivityType(Code):
                 logger.warn("Missing related object for activity record: {}".format(related_obj_id))
                 return None
 
+    def get_related_objs(self, related_obj_ids):
+        """Fetch related objects for multiple records with 1 query
+
+        Returns a dict mapping ids to related objects.
+        """
+        ModelClass = self.related_model
+        if ModelClass is None or not related_obj_ids:
+            return {}
+        return (ModelClass.objects.all()
+                .select_related()
+                .in_bulk(related_obj_ids))
+
 class ActivityMessageDict(object):
     """Helper class to format our messages.
 
@@ -1255,3 +1267,32 @@ class ActivityRecord(models.Model):
             self._related_obj_cache = self.type_obj.get_related_obj(
                 self.related_obj_id)
         return self._related_obj_cache
+
+    @classmethod
+    def bulk_load_related_objs(cls, records):
+        """Load the related objects for a list of records
+
+        This method does 1 query for each related model used by the records,
+        rather than a query per record.  Afterwards, calling
+        get_related_obj() won't require any DB work.
+        """
+        records_by_model = {}
+        for record in records:
+            if hasattr(record, '_related_obj_cache'):
+                continue
+            model = record.type_obj.related_model
+            if model is None:
+                record._related_obj_cache = None
+            else:
+                records_by_model.setdefault(model, []).append(record)
+
+        # Several types share a related model (for example all the URL
+        # records use URLEdit), so we group by model rather than type
+        for model, model_records in records_by_model.items():
+            related_obj_ids = set(r.related_obj_id for r in model_records
+                                  if r.related_obj_id is not None)
+            related_objs = model_records[0].type_obj.get_related_objs(
+                list(related_obj_ids))
+            for record in model_records:
+                record._related_obj_cache = related_objs.get(
+                    record.related_obj_id)
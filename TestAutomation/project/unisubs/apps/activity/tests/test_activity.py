@@ -415,3 +415,32 @@ class TestViewableByUser(TestCase):
             self.video,
             self.public_team_video,
         ])
+
+class BulkLoadRelatedObjsTest(TestCase):
+    def test_bulk_load_related_objs(self):
+        video = VideoFactory()
+        user = UserFactory()
+        video_url = VideoURLFactory(video=video)
+        team = TeamFactory()
+        clear_activity()
+        url_added = ActivityRecord.objects.create_for_video_url_added(
+            video_url)
+        url_deleted = ActivityRecord.objects.create_for_video_url_deleted(
+            video_url, user)
+        settings_changed = (
+            ActivityRecord.objects.create_for_team_settings_changed(
+                team, user, {'team_visibility': 'public'}))
+        video_added = ActivityRecord.objects.create_for_video_added(video)
+        records = list(ActivityRecord.objects.all())
+        # 1 query for URLEdit and 1 for TeamSettingsChangeInfo
+        with self.assertNumQueries(2):
+            ActivityRecord.bulk_load_related_objs(records)
+        with self.assertNumQueries(0):
+            related_objs = {
+                r.id: r.get_related_obj() for r in records
+            }
+        assert_equal(related_objs[url_added.id].new_url, video_url.url)
+        assert_equal(related_objs[url_deleted.id].old_url, video_url.url)
+        assert_equal(related_objs[settings_changed.id].get_changes(),
+                     {'team_visibility': 'public'})
+        assert_equal(related_objs[video_added.id], None)
@@ -17,12 +17,22 @@
 
 from __future__ import absolute_import
 
+from django.core.cache import cache
 from rest_framework import authentication
 from rest_framework import exceptions
 from auth.models import AmaraApiKey
 from auth.models import CustomUser as User
 
 class TokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate using the X-API-USERNAME and X-API-KEY headers
+
+    Integrations tend to make lots of requests with the same credentials, so
+    we cache the user id and active flag for each username/key pair.  Then
+    we load the user using User.cache.  This means a successful
+    authentication doesn't usually need any DB queries.  The cache is
+    invalidated by AmaraApiKey.save() and CustomUser.save() when the key,
+    username, or active flag changes.
+    """
     def authenticate(self, request):
         username = request.META.get('HTTP_X_API_USERNAME')
         api_key = request.META.get('HTTP_X_API_KEY')
@@ -33,6 +43,26 @@ class TokenAuthentication(authentication.BaseAuthentication):
         if not username:
             return None
 
+        cache_key = AmaraApiKey.auth_cache_key(username, api_key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            user = self.authenticate_credentials(username, api_key)
+            cache.set(cache_key, (user.id, user.is_active),
+                      AmaraApiKey.AUTH_CACHE_TIMEOUT)
+            return (user, None)
+
+        user_id, is_active = cached
+        try:
+            user = User.cache.get_instance(user_id)
+        except User.DoesNotExist:
+            cache.delete(cache_key)
+            raise exceptions.AuthenticationFailed('No such user')
+        if not (is_active and user.is_active):
+            raise exceptions.AuthenticationFailed('User disabled')
+        return (user, None)
+
+    def authenticate_credentials(self, username, api_key):
+        """Check a username/key pair against the DB, skipping the cache."""
         try:
             user = User.objects.get(username=username)
         except User.DoesNotExist:
@@ -44,4 +74,4 @@ class TokenAuthentication(authentication.BaseAuthentication):
         if not AmaraApiKey.objects.filter(user=user, key=api_key).exists():
             raise exceptions.AuthenticationFailed('Invalid API Key')
 
-        return (user, None)
+        return user
@@ -22,16 +22,116 @@ method to use offset/limit based pagination instead of page based pagination.
 
 This will get much simpler  once we switch to django-rest-framework 3.1 which
 has built-in support for this.
+
+Cursor pagination
+-----------------
+
+Views can also support keyset pagination by setting the cursor_ordering
+attribute to a list of fields that uniquely orders the queryset, for example
+``('-created', '-id')``.  Clients opt-in by passing the ``cursor`` query
+param (an empty value gets the first page).  Instead of using OFFSET, each
+page is fetched with a WHERE clause that starts after the last item of the
+previous page, and we skip the COUNT(*) query.  The response uses the same
+meta envelope as offset pagination, but ``offset`` and ``total_count`` are
+null and ``previous`` is always null.  An invalid cursor results in a 400
+response.
 """
 
 from collections import OrderedDict
 
 from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from utils.pagination import (decode_cursor, encode_cursor, get_position,
+                              keyset_filter, InvalidCursor)
 
 class AmaraPagination(pagination.LimitOffsetPagination):
     default_limit = 20
     max_limit = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = self.get_cursor_ordering(queryset, request,
+                                                        view)
+        if self.cursor_ordering is None:
+            return super(AmaraPagination, self).paginate_queryset(
+                queryset, request, view)
+        return self.paginate_queryset_with_cursor(queryset, request)
+
+    def get_cursor_ordering(self, queryset, request, view):
+        """Get the fields to use for cursor pagination
+
+        Returns None if we should use offset pagination instead.
+        """
+        cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if (cursor_ordering is None or
+                self.cursor_query_param not in request.query_params):
+            return None
+        # Don't use cursor pagination if the client asked for a specific
+        # ordering or if the view returned a sliced queryset
+        if api_settings.ORDERING_PARAM in request.query_params:
+            return None
+        if not queryset.query.can_filter():
+            return None
+        return cursor_ordering
+
+    def paginate_queryset_with_cursor(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = None
+        self.count = None
+        self.display_page_controls = False
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset.model)
+        queryset = queryset.order_by(*self.cursor_ordering)
+        if position is not None:
+            queryset = queryset.filter(self.cursor_filter(position))
+        # Fetch an extra item to know if there's a next page
+        results = list(queryset[:self.limit + 1])
+        if len(results) > self.limit:
+            results = results[:self.limit]
+            self.next_position = self.get_position(results[-1])
+        else:
+            self.next_position = None
+        return results
+
+    def cursor_filter(self, position):
+        """Build a Q object that selects items after position"""
+        return keyset_filter(self.cursor_ordering, position)
+
+    def get_position(self, obj):
+        return get_position(obj, self.cursor_ordering)
+
+    def encode_cursor(self, position):
+        return encode_cursor(position)
+
+    def decode_cursor(self, cursor, model):
+        try:
+            return decode_cursor(cursor, self.cursor_ordering, model)
+        except InvalidCursor:
+            raise ValidationError({
+                self.cursor_query_param: self.invalid_cursor_message,
+            })
+
+    def get_next_link(self):
+        if self.cursor_ordering is None:
+            return super(AmaraPagination, self).get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_previous_link(self):
+        if self.cursor_ordering is None:
+            return super(AmaraPagination, self).get_previous_link()
+        return None
 
     def get_paginated_response(self, data):
         return Response(OrderedDict([
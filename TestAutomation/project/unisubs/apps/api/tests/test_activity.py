@@ -17,9 +17,12 @@
 
 from __future__ import absolute_import
 from datetime import datetime, timedelta
+import json
 import time
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from nose.tools import *
 from rest_framework import status
 from rest_framework.reverse import reverse
@@ -30,6 +33,7 @@ from comments.models import Comment
 from subtitles import pipeline
 from utils.test_utils import *
 from utils.factories import *
+from utils.pagination import encode_cursor
 from activity.models import ActivityRecord
 
 class ActivityTest(TestCase):
@@ -179,6 +183,47 @@ class ActivityTest(TestCase):
             url + '?after=' + format_datetime_field(record2.created),
             record3, record2)
 
+    def test_cursor_pagination(self):
+        team = TeamFactory(slug='team', admin=self.user)
+        video = VideoFactory(team=team)
+        self.clear_records()
+        now = datetime.now()
+        records = [
+            ActivityRecord.objects.create('video-added', team=team,
+                                          video=video, user=self.user,
+                                          created=now - timedelta(hours=i))
+            for i in range(5)
+        ]
+        # Give 2 records the same date to test the id tie-breaker
+        records[3].created = records[2].created
+        records[3].save()
+        records.sort(key=lambda r: (r.created, r.id), reverse=True)
+
+        url = reverse('api:team-activity', args=(team.slug,))
+        response = self.client.get(url + '?cursor=&limit=2')
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_equal(response.data['meta']['total_count'], None)
+        assert_equal(response.data['meta']['offset'], None)
+        assert_equal(response.data['meta']['previous'], None)
+        seen = [data['date'] for data in response.data['objects']]
+        while response.data['meta']['next']:
+            response = self.client.get(response.data['meta']['next'])
+            assert_equal(response.status_code, status.HTTP_200_OK)
+            seen.extend(data['date'] for data in response.data['objects'])
+        assert_equal(seen, [format_datetime_field(r.created)
+                            for r in records])
+
+    def test_invalid_cursor(self):
+        team = TeamFactory(slug='team', admin=self.user)
+        url = reverse('api:team-activity', args=(team.slug,))
+        response = self.client.get(url + '?cursor=not-a-cursor')
+        assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # cursors with values that don't match the ordering fields
+        for position in (['x', '1'], ['2018-01-01 00:00:00', 'x'], [1, 2]):
+            response = self.client.get(
+                url + '?cursor=' + encode_cursor(position))
+            assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def check_extra_field(self, activity_type, **extra_fields):
         # We should be able to get just the record we care about by using our
         # user stream and filtering by activity type
@@ -212,6 +257,30 @@ class ActivityTest(TestCase):
         ActivityRecord.objects.create_for_video_url_deleted(vurl, self.user)
         self.check_extra_field('video-url-deleted', url=vurl.url)
 
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def add_url_records(self, video):
+        vurl = VideoURLFactory(video=video, added_by=self.user)
+        ActivityRecord.objects.create_for_video_url_added(vurl)
+        ActivityRecord.objects.create_for_video_url_made_primary(
+            vurl, video.get_primary_videourl_obj(), self.user)
+        ActivityRecord.objects.create_for_video_url_deleted(vurl, self.user)
+        ActivityRecord.objects.create_for_video_deleted(video, self.user)
+
+    def test_list_query_count(self):
+        # The number of queries to list activity shouldn't depend on the
+        # number of records
+        url = reverse('api:user-activity', args=(self.user.username,))
+        self.add_url_records(VideoFactory())
+        query_count = self.count_list_queries(url)
+        for i in range(5):
+            self.add_url_records(VideoFactory())
+        assert_equal(self.count_list_queries(url), query_count)
+
     def test_video_deleted(self):
         video = VideoFactory()
         ActivityRecord.objects.create_for_video_deleted(video, self.user)
@@ -244,6 +313,64 @@ class ActivityTest(TestCase):
         assert_equal(response.status_code, status.HTTP_404_NOT_FOUND)
         assert_equal(can_view_activity.call_args, mock.call(video, self.user))
 
+class ActivityFeedTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(username='test-user')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.team = TeamFactory(slug='team', admin=self.user)
+        ActivityRecord.objects.all().delete()
+        self.records = [
+            ActivityRecord.objects.create_for_video_added(
+                VideoFactory(team=self.team))
+            for i in range(5)
+        ]
+        self.url = reverse('api:team-activity-changes',
+                           args=(self.team.slug,))
+
+    def get_feed(self, query=''):
+        response = self.client.get(self.url + query)
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_equal(response['Content-Type'], 'application/x-ndjson')
+        content = ''.join(response.streaming_content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_feed(self):
+        data = self.get_feed()
+        assert_equal([d['id'] for d in data], [r.id for r in self.records])
+        assert_equal([d['type'] for d in data], ['video-added'] * 5)
+
+    def test_since(self):
+        data = self.get_feed('?since={}'.format(self.records[2].id))
+        assert_equal([d['id'] for d in data],
+                     [r.id for r in self.records[3:]])
+
+    def test_limit(self):
+        data = self.get_feed('?limit=2')
+        assert_equal([d['id'] for d in data],
+                     [r.id for r in self.records[:2]])
+
+    def test_batches(self):
+        with mock.patch('api.views.activity.ActivityFeedMixin.batch_size', 2):
+            data = self.get_feed()
+        assert_equal([d['id'] for d in data], [r.id for r in self.records])
+
+    def test_no_new_records(self):
+        # The feed should return right away rather than waiting for records
+        data = self.get_feed('?since={}'.format(self.records[-1].id))
+        assert_equal(data, [])
+
+    def test_invalid_params(self):
+        for query in ('?since=abc', '?limit=abc', '?type=invalid-type'):
+            response = self.client.get(self.url + query)
+            assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch_for_test('teams.permissions.can_view_activity')
+    def test_permissions(self, can_view_activity):
+        can_view_activity.return_value = False
+        response = self.client.get(self.url)
+        assert_equal(response.status_code, status.HTTP_404_NOT_FOUND)
+
 class LegacyActivityTestCase(TestCase):
     def setUp(self):
         self.user = UserFactory()
@@ -17,16 +17,20 @@
 
 from __future__ import absolute_import
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.http import HttpRequest
 from nose.tools import *
+import mock
 from rest_framework.exceptions import AuthenticationFailed
 
 from api.auth import TokenAuthentication
+from auth.models import AmaraApiKey
 from utils.factories import *
 
 class TestAPIAuth(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = UserFactory()
         self.api_key = self.user.get_api_key()
         self.auth = TokenAuthentication()
@@ -49,3 +53,67 @@ class TestAPIAuth(TestCase):
     def test_no_token(self):
         request = self.make_request(None, None)
         assert_equal(self.auth.authenticate(request), None)
+
+    def test_cached(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        # The first cached authentication loads the user into User.cache
+        self.auth.authenticate(request)
+        with self.assertNumQueries(0):
+            assert_equal(self.auth.authenticate(request), (self.user, None))
+
+    def test_incorrect_token_not_cached(self):
+        request = self.make_request(self.user.username, "foo")
+        for i in range(2):
+            with assert_raises(AuthenticationFailed):
+                self.auth.authenticate(request)
+
+    def test_regenerate_key(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        new_key = AmaraApiKey.objects.get(user=self.user).generate_new_key()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
+        request = self.make_request(self.user.username, new_key)
+        assert_equal(self.auth.authenticate(request), (self.user, None))
+
+    def test_cache_key_normalizes_username(self):
+        # The DB lookup ignores case, accents and trailing spaces, so these
+        # all need to share the cache entry that gets invalidated.
+        correct = AmaraApiKey.auth_cache_key('alice', self.api_key)
+        for username in ('Alice', 'ALICE ', u'Al\xedce'):
+            assert_equal(AmaraApiKey.auth_cache_key(username, self.api_key),
+                         correct)
+
+    def test_cache_key_normalizes_key(self):
+        correct = AmaraApiKey.auth_cache_key('alice', self.api_key)
+        for key in (self.api_key.upper(), self.api_key + '  '):
+            assert_equal(AmaraApiKey.auth_cache_key('alice', key), correct)
+
+    def test_revoke_key_with_upper_case_variant(self):
+        # MySQL accepts the upper-case key, simulate that for the first
+        # authentication
+        request = self.make_request(self.user.username, self.api_key.upper())
+        with mock.patch.object(self.auth, 'authenticate_credentials',
+                               return_value=self.user):
+            self.auth.authenticate(request)
+        AmaraApiKey.objects.get(user=self.user).delete()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
+
+    def test_deactivate(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        self.auth.authenticate(request)
+        self.user.is_active = False
+        self.user.save()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
+
+    def test_username_change(self):
+        request = self.make_request(self.user.username, self.api_key)
+        self.auth.authenticate(request)
+        self.user.username = 'new-username'
+        self.user.save()
+        with assert_raises(AuthenticationFailed):
+            self.auth.authenticate(request)
@@ -696,6 +696,89 @@ class SubtitlesViewTest(TestCase):
         response = self.client.get(url)
         assert_equal(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class BatchSubtitlesViewTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.user = UserFactory(is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('api:subtitles-batch', kwargs={
+            'video_id': self.video.video_id,
+        })
+
+    def post(self, languages, **data):
+        data['languages'] = languages
+        return self.client.post(self.url, json.dumps(data),
+                                content_type='application/json')
+
+    def test_create(self):
+        response = self.post([
+            {
+                'language_code': 'en',
+                'subtitles': SubtitleSetFactory(num_subs=2).to_xml(),
+            },
+            {
+                'language_code': 'fr',
+                'sub_format': 'srt',
+                'subtitles': '1\n00:00:01,000 --> 00:00:02,000\nBonjour\n',
+                'title': 'Titre',
+            },
+        ])
+        assert_equal(response.status_code, status.HTTP_201_CREATED,
+                     response.content)
+        assert_equal(
+            [(v['language_code'], v['version_number'])
+             for v in response.data['versions']],
+            [('en', 1), ('fr', 1)])
+        fr = self.video.subtitle_language('fr').get_tip()
+        assert_equal(fr.title, 'Titre')
+        assert_equal(fr.author, self.user)
+        assert_equal(fr.origin, ORIGIN_API)
+
+    def test_runs_tasks_once(self):
+        test_utils.video_changed_tasks.delay.reset_mock()
+        self.post([
+            {'language_code': code,
+             'subtitles': SubtitleSetFactory().to_xml()}
+            for code in ('en', 'fr', 'de')
+        ])
+        assert_equal(test_utils.video_changed_tasks.delay.call_args_list,
+                     [mock.call(self.video.pk)])
+
+    def test_invalid_subtitles(self):
+        response = self.post([
+            {'language_code': 'en',
+             'subtitles': SubtitleSetFactory().to_xml()},
+            {'language_code': 'fr', 'subtitles': 'invalid'},
+        ])
+        assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+        assert_equal(self.video.newsubtitlelanguage_set.count(), 0)
+        # We should list the problems along with the generic error
+        assert_equal(response.data[0], 'Invalid subtitle data')
+        assert_true(len(response.data) > 1)
+
+    def test_duplicate_languages(self):
+        response = self.post([
+            {'language_code': 'en',
+             'subtitles': SubtitleSetFactory().to_xml()},
+            {'language_code': 'en',
+             'subtitles': SubtitleSetFactory().to_xml()},
+        ])
+        assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_check_user_can_edit_subtitles_permission(self):
+        with test_utils.patch_get_workflow() as workflow:
+            workflow.user_can_edit_subtitles.side_effect = (
+                lambda user, language_code: language_code == 'en')
+            response = self.post([
+                {'language_code': 'en',
+                 'subtitles': SubtitleSetFactory().to_xml()},
+                {'language_code': 'fr',
+                 'subtitles': SubtitleSetFactory().to_xml()},
+            ])
+        assert_equal(response.status_code, status.HTTP_403_FORBIDDEN)
+        assert_equal(self.video.newsubtitlelanguage_set.count(), 0)
+
 class DeleteSubtitleLanguageTest(TestCase):
     def setUp(self):
         self.user = UserFactory(is_superuser=True)
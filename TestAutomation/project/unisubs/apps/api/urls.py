@@ -50,9 +50,15 @@ urlpatterns = router.urls + [
     url(r'^$', views.index.index, name='index'),
     url(r'videos/(?P<video_id>[\w\d]+)/activity/$',
         views.activity.VideoActivityView.as_view(), name='video-activity'),
+    url(r'videos/(?P<video_id>[\w\d]+)/activity/changes/$',
+        views.activity.VideoActivityFeedView.as_view(),
+        name='video-activity-changes'),
     url(r'^videos/(?P<video_id>[\w\d]+)'
         '/languages/(?P<language_code>[\w-]+)/subtitles/$',
         views.subtitles.SubtitlesView.as_view(), name='subtitles'),
+    url(r'^videos/(?P<video_id>[\w\d]+)/subtitles/batch/$',
+        views.subtitles.BatchSubtitlesView.as_view(),
+        name='subtitles-batch'),
     url(r'^videos/(?P<video_id>[\w\d]+)'
         '/languages/(?P<language_code>[\w-]+)/subtitles/actions/$',
         views.subtitles.Actions.as_view(), name='subtitle-actions'),
@@ -80,4 +86,10 @@ urlpatterns = router.urls + [
         views.activity.UserActivityView.as_view(), name='user-activity'),
     url(r'teams/(?P<slug>[\w\d-]+)/activity/$',
         views.activity.TeamActivityView.as_view(), name='team-activity'),
+    url(r'users/(?P<identifier>[^/]+)/activity/changes/$',
+        views.activity.UserActivityFeedView.as_view(),
+        name='user-activity-changes'),
+    url(r'teams/(?P<slug>[\w\d-]+)/activity/changes/$',
+        views.activity.TeamActivityFeedView.as_view(),
+        name='team-activity-changes'),
 ]
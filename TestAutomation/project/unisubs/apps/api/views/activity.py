@@ -29,6 +29,8 @@ Video Activity Resource
     :queryparam bcp-47 language: Filter by the subtitle language
     :queryparam iso-8601 before: Only include activity before this date/time
     :queryparam iso-8601 after: Only include activity after
+    :queryparam string cursor: Use cursor pagination (see
+        :ref:`api-pagination`)
 
     :>json string type: Activity type (:ref:`activity_types`)
     :>json iso-8601 date: Date/time of the activity
@@ -56,6 +58,8 @@ Team Activity Resource
     :queryparam bcp-47 language: Filter by the subtitle language
     :queryparam iso-8601 before: Only include activity before this date/time
     :queryparam iso-8601 after: Only include activity after
+    :queryparam string cursor: Use cursor pagination (see
+        :ref:`api-pagination`)
 
     Response data is the same as the video activity resource.
 
@@ -71,9 +75,43 @@ User Activity Resource
     :queryparam slug team: Filter by team
     :queryparam iso-8601 before: Only include activity before this date/time
     :queryparam iso-8601 after: Only include activity after
+    :queryparam string cursor: Use cursor pagination (see
+        :ref:`api-pagination`)
 
     Response data is the same as the video activity resource.
 
+Activity Change Feeds
+*********************
+
+Change feeds are the best way to mirror an activity stream.  Rather than
+re-querying a time window, clients remember the ``id`` of the last record
+they saw and ask for everything after it.
+
+.. http:get:: /api/videos/(video-id)/activity/changes/
+.. http:get:: /api/teams/(slug)/activity/changes/
+.. http:get:: /api/users/(username)/activity/changes/
+
+    :queryparam integer since: Only include records with an id greater than
+        this (defaults to 0, which returns the entire stream)
+    :queryparam integer limit: Maximum number of records to return (default
+        and max: 10000)
+
+    The same filters as the corresponding activity resource are supported
+    (except for ``before`` and ``after``) and the same permission checks
+    apply.
+
+    The response is streamed as newline-delimited JSON
+    (``application/x-ndjson``), one record per line, ordered by id.  Each
+    record has the same fields as the activity resource, plus:
+
+    :>json integer id: Record id.  Pass the id of the last record you
+        received as the ``since`` param to continue the feed.
+
+    The response ends as soon as there are no more records.  To tail a feed,
+    re-request it periodically with the same ``since`` value until new
+    records show up.  Invalid ``since``, ``limit`` or filter values result
+    in a 400 response.
+
 .. _activity_types:
 
 Activity Types
@@ -201,16 +239,20 @@ Get details on one activity item
 from __future__ import absolute_import
 
 from datetime import datetime
+import json
 
 from django.core.exceptions import PermissionDenied
-from django.http import Http404
+from django.db.models import Manager
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import filters
 from rest_framework import generics
 from rest_framework import serializers
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.reverse import reverse
+from rest_framework.utils.encoders import JSONEncoder
 import dateutil.parser
 
 from activity.models import ActivityRecord
@@ -225,6 +267,19 @@ import auth.permissions
 import teams.permissions
 import videos.permissions
 
+class ActivityListSerializer(serializers.ListSerializer):
+    """Serialize a list of activity records
+
+    The user, team and video are fetched by the select_related() call in
+    ActivityManager.  Here we also fetch the related objects that the
+    get_*_extra() methods need, using a query per related model rather than
+    a query per record.
+    """
+    def to_representation(self, data):
+        records = list(data.all() if isinstance(data, Manager) else data)
+        ActivityRecord.bulk_load_related_objs(records)
+        return super(ActivityListSerializer, self).to_representation(records)
+
 class ActivitySerializer(serializers.ModelSerializer):
     type = serializers.SlugField()
     user = UserField(read_only=True)
@@ -285,6 +340,7 @@ class ActivitySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ActivityRecord
+        list_serializer_class = ActivityListSerializer
         fields = (
             'type', 'date', 'user', 'video', 'language', 'video_uri',
             'language_uri',
@@ -332,6 +388,7 @@ class ActivityFilterBackend(filters.BaseFilterBackend):
 class VideoActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
     filter_backends = (ActivityFilterBackend,)
+    cursor_ordering = ('-created', '-id')
     enabled_filters = ['type', 'user', 'language', 'before', 'after']
 
     def get_queryset(self):
@@ -344,6 +401,7 @@ class VideoActivityView(generics.ListAPIView):
 class TeamActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
     filter_backends = (ActivityFilterBackend,)
+    cursor_ordering = ('-created', '-id')
     enabled_filters = ['video', 'video_language', 'type', 'user',
                        'language', 'before', 'after']
 
@@ -360,6 +418,7 @@ class TeamActivityView(generics.ListAPIView):
 class UserActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
     filter_backends = (ActivityFilterBackend,)
+    cursor_ordering = ('-created', '-id')
     enabled_filters = ['video', 'team', 'video_language', 'type', 
                        'language', 'before', 'after']
 
@@ -374,6 +433,68 @@ class UserActivityView(generics.ListAPIView):
             raise Http404()
         return ActivityRecord.objects.for_user(user)
 
+class ActivityFeedMixin(object):
+    """Stream records from an activity view as a change feed
+
+    Mix this in to an activity list view to stream every record with an id
+    greater than the since param as newline-delimited JSON.  We re-use the
+    view's get_queryset() and filters, so permission scoping is the same as
+    the regular listing.
+
+    Records are fetched in batches using the id as a keyset, so each batch
+    is a cheap index range scan no matter how far into the stream the client
+    is.
+    """
+    batch_size = 100
+    max_limit = 10000
+    # The feed uses since instead of the date filters
+    disabled_filters = ['before', 'after']
+
+    def list(self, request, *args, **kwargs):
+        self.enabled_filters = [f for f in self.enabled_filters
+                                if f not in self.disabled_filters]
+        queryset = self.get_queryset()
+        try:
+            queryset = self.filter_queryset(queryset)
+        except Http404:
+            # ActivityFilterBackend raises Http404 for invalid filter values
+            raise ValidationError('invalid filter value')
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit',
+                                                     self.max_limit)),
+                        self.max_limit)
+        except ValueError:
+            raise ValidationError('since and limit must be integers')
+        return StreamingHttpResponse(
+            self.stream_records(queryset, since, limit),
+            content_type='application/x-ndjson')
+
+    def stream_records(self, queryset, since, limit):
+        queryset = queryset.order_by('id')
+        last_id = since
+        remaining = limit
+        while remaining > 0:
+            batch = list(queryset.filter(id__gt=last_id)
+                         [:min(self.batch_size, remaining)])
+            if not batch:
+                return
+            serializer = self.get_serializer(batch, many=True)
+            for record, data in zip(batch, serializer.data):
+                data['id'] = record.id
+                yield json.dumps(data, cls=JSONEncoder) + '\n'
+            last_id = batch[-1].id
+            remaining -= len(batch)
+
+class VideoActivityFeedView(ActivityFeedMixin, VideoActivityView):
+    pass
+
+class TeamActivityFeedView(ActivityFeedMixin, TeamActivityView):
+    pass
+
+class UserActivityFeedView(ActivityFeedMixin, UserActivityView):
+    pass
+
 class LegacyActivitySerializer(serializers.ModelSerializer):
     type = serializers.IntegerField(source='type_code')
     type_name = serializers.SlugField(source='type')
@@ -419,6 +540,7 @@ class LegacyActivitySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ActivityRecord
+        list_serializer_class = ActivityListSerializer
         fields = (
             'id', 'type', 'type_name', 'created', 'video', 'video_uri',
             'language', 'language_url', 'user', 'comment', 'new_video_title',
@@ -214,6 +214,29 @@ Creating new subtitles
         set is available for this language - optional, defaults to false.
         **(deprecated, use action instead)**
 
+Adding subtitles for several languages
+^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+.. http:post:: /api/videos/(video-id)/subtitles/batch/
+
+    Add subtitles for several languages with one request.  The subtitles
+    for all languages are added together: if there's an error with any of
+    them, then none are added.
+
+    :<json list languages: List of subtitle data, one for each language.
+        Each item contains ``language_code`` and ``subtitles``, plus the
+        optional ``sub_format``, ``title``, ``description``, ``metadata``,
+        ``action`` and ``is_complete`` fields from the subtitles resource.
+    :<json string origin: Same as the subtitles resource, used for all
+        languages.
+
+    :>json list versions: List of version data for the new subtitles, in the
+        same order as ``languages``.  Each item contains ``language_code``,
+        ``version_number`` and ``resource_uri``.
+
+    If the subtitles for a language can't be parsed, the response is a 400
+    with a list of the problems found, like the subtitles resource returns.
+
 Deleting subtitles
 ^^^^^^^^^^^^^^^^^^
 
@@ -313,6 +336,7 @@ from api.fields import (LanguageCodeField, TimezoneAwareDateTimeField,
 from api.views.apiswitcher import APISwitcherMixin
 from videos.models import Video
 from subtitles import compat
+from subtitles import parsing
 from subtitles import pipeline
 from subtitles import workflows
 from subtitles.models import (SubtitleLanguage, SubtitleVersion,
@@ -323,7 +347,6 @@ from subtitles.types import SubtitleFormatList
 import babelsubs
 from babelsubs.storage import SubtitleSet
 from utils.http import data_from_url
-from utils.subtitles import load_subtitles
 import videos.tasks
 import teams.permissions
 
@@ -624,15 +647,18 @@ class SubtitlesField(serializers.CharField):
             raise serializers.ValidationError("Invalid subtitle data")
         if isinstance(value, unicode):
             value = value.encode('utf-8')
-        try:
-            return load_subtitles(
-                self.context['language_code'], value,
-                self.context['sub_format'])
-        except babelsubs.SubtitleParserError, e:
-            logger.warn("Error parsing subtitles ({}/{})".format(
-                self.context['video'].video_id,
-                self.context['language_code']), exc_info=True)
-            raise serializers.ValidationError("Invalid subtitle data")
+        return parse_subtitles_field(self.context, value)
+
+def parse_subtitles_field(context, value):
+    try:
+        return parsing.parse_subtitles(context['language_code'], value,
+                                       context['sub_format'])
+    except parsing.ParseError, e:
+        logger.warn("Error parsing subtitles ({}/{}): {}".format(
+            context['video'].video_id, context['language_code'], e))
+        raise serializers.ValidationError(
+            ["Invalid subtitle data"] +
+            [parsing.format_error(error) for error in e.errors])
 
 class SubFormatField(serializers.ChoiceField):
     def __init__(self, **kwargs):
@@ -647,6 +673,17 @@ class LanguageForSubtitlesSerializer(serializers.Serializer):
     name = serializers.CharField(source='get_language_code_display')
     dir = serializers.CharField()
 
+def convert_origin(value):
+    """Convert the origin field for the subtitles serializers."""
+    if not value or value == 'api':
+        return ORIGIN_API
+    elif value == 'editor':
+        return ORIGIN_WEB_EDITOR
+    elif value == 'upload':
+        return ORIGIN_UPLOAD
+    else:
+        raise ValidationError('invalid origin value: {}'.format(value))
+
 class SubtitlesSerializer(serializers.Serializer):
     ORIGIN_CHOICES = [
         ('api', _('API')),
@@ -733,14 +770,7 @@ class SubtitlesSerializer(serializers.Serializer):
         return data
 
     def validate_origin(self, value):
-        if not value or value == 'api':
-            return ORIGIN_API
-        elif value == 'editor':
-            return ORIGIN_WEB_EDITOR
-        elif value == 'upload':
-            return ORIGIN_UPLOAD
-        else:
-            raise ValidationError('invalid origin value: {}'.format(value))
+        return convert_origin(value)
 
     def to_representation(self, version):
         data = super(SubtitlesSerializer, self).to_representation(version)
@@ -768,15 +798,7 @@ class SubtitlesSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid subtitle data")
         if isinstance(value, unicode):
             value = value.encode('utf-8')
-        try:
-            return load_subtitles(
-                self.context['language_code'], value,
-                self.context['sub_format'])
-        except babelsubs.SubtitleParserError, e:
-            logger.warn("Error parsing subtitles ({}/{})".format(
-                self.context['video'].video_id,
-                self.context['language_code']), exc_info=True)
-            raise serializers.ValidationError("Invalid subtitle data")
+        return parse_subtitles_field(self.context, value)
 
     def create(self, validated_data):
         action = complete = None
@@ -930,6 +952,99 @@ class SubtitlesView(generics.CreateAPIView):
         videos.tasks.video_changed_tasks.delay(video.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class BatchSubtitlesItemSerializer(serializers.Serializer):
+    language_code = LanguageCodeField()
+    sub_format = SubFormatField(required=False, default='dfxp')
+    subtitles = serializers.CharField(trim_whitespace=False)
+    title = serializers.CharField(required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    metadata = VideoMetadataSerializer(required=False)
+    action = serializers.CharField(required=False, allow_blank=True)
+    is_complete = serializers.NullBooleanField(required=False)
+
+class BatchSubtitlesSerializer(serializers.Serializer):
+    languages = BatchSubtitlesItemSerializer(many=True)
+    origin = serializers.ChoiceField(
+        required=False, default='api',
+        choices=SubtitlesSerializer.ORIGIN_CHOICES)
+
+    def validate_languages(self, value):
+        if not value:
+            raise ValidationError('no languages given')
+        language_codes = [item['language_code'] for item in value]
+        if len(set(language_codes)) != len(language_codes):
+            raise ValidationError('duplicate language codes')
+        return value
+
+    def validate_origin(self, value):
+        return convert_origin(value)
+
+class BatchSubtitlesView(views.APIView):
+    """Add subtitles for several languages with pipeline.add_subtitles_batch()
+    """
+    def post(self, request, video_id, format=None):
+        video = get_object_or_404(Video, video_id=video_id)
+        workflow = workflows.get_workflow(video)
+        serializer = BatchSubtitlesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        for item in serializer.validated_data['languages']:
+            if (not workflow.user_can_edit_subtitles(
+                    request.user, item['language_code']) or
+                not user_can_access_subtitles_format(
+                    request.user, item['sub_format'])):
+                raise PermissionDenied()
+        items = [self.make_pipeline_item(item)
+                 for item in serializer.validated_data['languages']]
+        try:
+            versions = pipeline.add_subtitles_batch(
+                video, items, author=request.user, committer=request.user,
+                origin=serializer.validated_data['origin'])
+        except parsing.ParseError, e:
+            logger.warn("Error parsing subtitles ({}): {}".format(
+                video.video_id, e))
+            raise ValidationError(
+                ["Invalid subtitle data"] +
+                [parsing.format_error(error) for error in e.errors])
+        except babelsubs.SubtitleParserError:
+            logger.warn("Error parsing subtitles ({})".format(video.video_id),
+                        exc_info=True)
+            return Response('Invalid subtitle data',
+                            status=status.HTTP_400_BAD_REQUEST)
+        except (ActionError, LookupError), e:
+            return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+        videos.tasks.video_changed_tasks.delay(video.pk)
+        return Response({
+            'versions': [
+                {
+                    'language_code': version.language_code,
+                    'version_number': version.version_number,
+                    'resource_uri': reverse('api:subtitles', kwargs={
+                        'video_id': video.video_id,
+                        'language_code': version.language_code,
+                    }, request=request),
+                }
+                for version in versions
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+    def make_pipeline_item(self, data):
+        subtitles = data['subtitles']
+        if isinstance(subtitles, unicode):
+            subtitles = subtitles.encode('utf-8')
+        item = {
+            'language_code': data['language_code'],
+            'sub_format': data['sub_format'],
+            'subtitles': subtitles,
+        }
+        for name in ('title', 'description', 'metadata'):
+            if name in data:
+                item[name] = data[name]
+        if 'action' in data:
+            item['action'] = data['action']
+        elif 'is_complete' in data:
+            item['complete'] = data['is_complete']
+        return item
+
 class LanguageFollowerView(views.APIView):
     def get(self, request, video_id, language_code, *args, **kwargs):
         subtitle_language = Video.objects.get(video_id=video_id).subtitle_language(language_code)
@@ -1244,6 +1244,7 @@ class TeamNotificationViewSet(TeamSubviewMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TeamNotificationSerializer
     lookup_field = 'number'
     lookup_value_regex = r'\d+'
+    cursor_ordering = ('-number',)
 
     def get_queryset(self):
         return (TeamNotification.objects
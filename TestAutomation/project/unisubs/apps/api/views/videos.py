@@ -248,6 +248,7 @@ from teams import permissions as team_perms
 from teams.models import Team, TeamVideo, Project, VideoVisibility
 from subtitles.models import SubtitleLanguage
 from videos import metadata
+from videos.listing import annotate_videos
 from videos.models import Video, URL_MAX_LENGTH
 from videos.types import video_type_registrar, VideoTypeError
 import videos.tasks
@@ -330,19 +331,9 @@ class VideoListSerializer(serializers.ListSerializer):
         # the result to the default to_representation() method
 
         if isinstance(qs, QuerySet):
-            # Note: we have to use prefetch_related the teamvideo attributes,
-            # otherwise it will filter out non-team videos.  I think this is a
-            # django 1.4 bug.
-            qs = (qs.select_related('teamvideo')
-                  .prefetch_related('teamvideo__team', 'teamvideo__project',
-                                    'newsubtitlelanguage_set', 'videourl_set'))
-        # run bulk_has_public_version(), otherwise we have a query for each
-        # language of each video
-        videos = list(qs)
-        all_languages = []
-        for v in videos:
-            all_languages.extend(v.all_subtitle_languages())
-        SubtitleLanguage.bulk_has_public_version(all_languages)
+            # all_urls and video_type list every URL, so prefetch them all
+            qs = qs.prefetch_related('videourl_set')
+        videos = annotate_videos(qs, languages=True)
         return super(VideoListSerializer, self).to_representation(videos)
 
 class VideoThumbnailField(serializers.URLField):
@@ -591,6 +582,7 @@ class VideoViewSet(mixins.CreateModelMixin,
     permission_classes = (IsAuthenticatedOrReadOnly,)
     filter_backends = (filters.OrderingFilter,)
     ordering_fields = ('title', 'created')
+    cursor_ordering = ('-id',)
 
     def get_serializer_context(self):
         return {
@@ -0,0 +1,79 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpRequest
+from django.test.utils import CaptureQueriesContext
+
+from api.auth import TokenAuthentication
+from auth.models import AmaraApiKey, CustomUser as User
+
+class Command(BaseCommand):
+    help = ("Compare the per-request overhead of API key authentication "
+            "with and without the authentication cache")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--requests', dest='requests',
+                            type=int, default=2000,
+                            help='Number of requests to authenticate')
+
+    def handle(self, **options):
+        # Create a throwaway user and roll back when we're done
+        with transaction.atomic():
+            user = User.objects.create(username='api-auth-benchmark')
+            request = HttpRequest()
+            request.META['HTTP_X_API_USERNAME'] = user.username
+            request.META['HTTP_X_API_KEY'] = user.get_api_key()
+            auth = TokenAuthentication()
+            try:
+                self.run_benchmark(user, request, auth, options['requests'])
+            finally:
+                cache.delete(AmaraApiKey.auth_cache_key(
+                    user.username, request.META['HTTP_X_API_KEY']))
+                User.cache.invalidate_by_pk(user.pk)
+                transaction.set_rollback(True)
+
+    def run_benchmark(self, user, request, auth, count):
+        uncached_time = self.time_calls(
+            'uncached', count,
+            lambda: auth.authenticate_credentials(
+                user.username, request.META['HTTP_X_API_KEY']))
+        # Warm up the auth cache and User.cache
+        auth.authenticate(request)
+        auth.authenticate(request)
+        cached_time = self.time_calls('cached', count,
+                                      lambda: auth.authenticate(request))
+        if cached_time:
+            self.stdout.write('speedup: {:.2f}x\n'.format(
+                uncached_time / cached_time))
+
+    def time_calls(self, label, count, func):
+        with CaptureQueriesContext(connection) as context:
+            start_time = time.time()
+            for i in xrange(count):
+                func()
+            elapsed = time.time() - start_time
+        self.stdout.write(
+            '{}: {:.3f}ms/request, {:.2f} queries/request\n'.format(
+                label, elapsed * 1000 / count, len(context) / float(count)))
+        return elapsed
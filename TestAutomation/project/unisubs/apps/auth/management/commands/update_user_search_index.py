@@ -0,0 +1,54 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth.models import CustomUser as User, UserSearchToken
+
+class Command(BaseCommand):
+    help = "Rebuild the UserSearchToken index for all users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-b', '--batch-size', dest='batch-size',
+                            type=int, default=500,
+                            help='Number of users to update at once')
+        parser.add_argument('-s', '--start-id', dest='start-id',
+                            type=int, default=0,
+                            help='Resume from this user id')
+
+    def handle(self, **options):
+        batch_size = options['batch-size']
+        last_id = options['start-id']
+        start_time = time.time()
+        count = 0
+        while True:
+            users = list(User.objects.filter(id__gt=last_id)
+                         .order_by('id')[:batch_size])
+            if not users:
+                break
+            for user in users:
+                UserSearchToken.objects.update_for_user(user)
+                last_id = user.id
+                count += 1
+            rate = count / (time.time() - start_time)
+            self.stdout.write(
+                'indexed {} users ({:.2f} users/sec last_id: {})\n'.format(
+                    count, rate, last_id))
+            self.stdout.flush()
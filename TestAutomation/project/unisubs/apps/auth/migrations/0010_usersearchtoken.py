@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amara_auth', '0009_auto_20181129_0617'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=30)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='amara_auth.CustomUser')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='usersearchtoken',
+            unique_together=set([('user', 'token')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='usersearchtoken',
+            index_together=set([('token', 'user')]),
+        ),
+    ]
@@ -23,7 +23,9 @@ import hashlib
 import hmac
 import os
 import random
+import re
 import string
+import unicodedata
 import urllib
 import uuid
 
@@ -38,6 +40,7 @@ from django.db import models
 from django.db import transaction
 from django.db.models import Max
 from django.db.models.signals import post_save
+from django.utils.encoding import force_text
 from django.utils.http import urlquote
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _, ugettext
@@ -109,26 +112,17 @@ class CustomUserManager(UserManager):
                                   for i in xrange(6))
             yield '{}{}{}'.format(part1, rand_string, part2)
 
-    def search(self, query):
+    def search(self, query, team=None):
+        """Search for users using the UserSearchToken index
+
+        Each term in query must be a prefix of a word in the user's name,
+        username, email or biography.  If team is given, only members of that
+        team are searched.
+        """
         qs = self.all()
-        valid_term = False
-        for term in [term.strip() for term in query.split()]:
-            if term:
-                valid_term = True
-                try:
-                    sql = """(LOWER(first_name) LIKE %s
-                OR LOWER(last_name) LIKE %s
-                OR LOWER(email) LIKE %s
-                OR LOWER(username) LIKE %s
-                OR LOWER(biography) LIKE %s)"""
-                    term = '%' + term.lower() + '%'
-                    qs = qs.extra(where=[sql], params=[term, term, term, term, term])
-                except Exception as e:
-                    logger.error(e)
-        if valid_term:
-            return qs
-        else:
-            return self.none()
+        if team is not None:
+            qs = qs.filter(team_members__team=team)
+        return UserSearchToken.objects.filter_users(qs, query, team)
 
     '''
     Gets all users except for the amara-bot
@@ -213,6 +207,12 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
         'first_name', 'last_name', 'full_name', 'biography', 'picture',
         'homepage', 'email',
     ]
+    # Fields that we index with UserSearchToken.  Ordered by importance, if
+    # there are too many tokens we drop ones from the later fields.
+    SEARCH_FIELDS = [
+        'username', 'first_name', 'last_name', 'full_name', 'email',
+        'biography',
+    ]
 
     class Meta:
         db_table = 'auth_customuser'
@@ -221,6 +221,7 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
     def __init__(self, *args, **kwargs):
         super(CustomUser, self).__init__(*args, **kwargs)
         self.start_tracking_profile_fields()
+        self._initial_api_auth_data = (self.username, self.is_active)
 
     def __unicode__(self):
         if self.is_amara_anonymous:
@@ -357,14 +358,25 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
         send_email_confirmation = kwargs.pop('send_email_confirmation', True)
         if self.pk:
             self.check_profile_changed()
+        search_changed = (self._state.adding or
+                          self.calc_search_data() != self._initial_search_data)
+        api_auth_changed = (
+            not self._state.adding and
+            (self.username, self.is_active) != self._initial_api_auth_data)
         super(CustomUser, self).save(*args, **kwargs)
         self.start_tracking_profile_fields()
+        if api_auth_changed:
+            self.invalidate_api_auth_cache(self._initial_api_auth_data[0])
+            self._initial_api_auth_data = (self.username, self.is_active)
+        if search_changed:
+            UserSearchToken.objects.update_for_user(self)
 
         if send_confirmation and send_email_confirmation:
             EmailConfirmation.objects.send_confirmation(self)
 
     def start_tracking_profile_fields(self):
         self._initial_profile_data = self.calc_profile_data()
+        self._initial_search_data = self.calc_search_data()
 
     def calc_profile_data(self):
         return {
@@ -372,6 +384,9 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
             for name in CustomUser.PROFILE_FIELDS
         }
 
+    def calc_search_data(self):
+        return [getattr(self, name) for name in CustomUser.SEARCH_FIELDS]
+
     def check_profile_changed(self):
         if self.calc_profile_data() != self._initial_profile_data:
             signals.user_profile_changed.send(self)
@@ -704,6 +719,22 @@ class CustomUser(BaseUser, secureid.SecureIDMixin):
     def get_api_key(self):
         return AmaraApiKey.objects.get_or_create(user=self)[0].key
 
+    def invalidate_api_auth_cache(self, username=None):
+        """Invalidate the cached API authentication for this user.
+
+        api.auth.TokenAuthentication caches the user id and active flag for
+        each username/API key pair.  This needs to be called when the
+        username or active flag changes.  Pass in username to invalidate the
+        cache for an old username.
+        """
+        if username is None:
+            username = self.username
+        keys = AmaraApiKey.objects.filter(user_id=self.pk).values_list(
+            'key', flat=True)
+        cache.delete_many([AmaraApiKey.auth_cache_key(username, key)
+                           for key in keys])
+        CustomUser.cache.invalidate_by_pk(self.pk)
+
     def ensure_api_key_created(self):
         AmaraApiKey.objects.get_or_create(user=self)
 
@@ -814,6 +845,102 @@ class UserLanguage(models.Model):
         super(UserLanguage, self).delete(*args, **kwargs)
         CustomUser.cache.invalidate_by_pk(self.user_id)
 
+SEARCH_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def collation_key(text):
+    """Normalize text the way MySQL's default collation compares it
+
+    The collation is case and accent insensitive, so for example accented
+    and unaccented versions of a word compare as equal.  We lowercase and
+    strip accents so that strings that the DB considers equal are also equal
+    in python.
+    """
+    text = force_text(text, errors='replace').lower()
+    text = text.replace(u'\xdf', u'ss')
+    return u''.join(c for c in unicodedata.normalize('NFKD', text)
+                    if not unicodedata.combining(c))
+
+def calc_search_tokens(text):
+    """Split text into normalized tokens for UserSearchToken
+
+    Tokens are normalized with collation_key().  Otherwise a name like "Jose
+    Jose", with an accent on one of them, would create 2 tokens that the
+    unique index considers equal and the INSERT would fail.
+    """
+    if not text:
+        return []
+    return [
+        token[:UserSearchToken.MAX_LENGTH]
+        for token in SEARCH_TOKEN_RE.findall(collation_key(text))
+    ]
+
+class UserSearchTokenManager(models.Manager):
+    def update_for_user(self, user):
+        """Update the search tokens for a user after their fields change.
+
+        We only delete/insert the tokens that changed.
+        """
+        new_tokens = []
+        for text in user.calc_search_data():
+            for token in calc_search_tokens(text):
+                if token not in new_tokens:
+                    new_tokens.append(token)
+        new_tokens = set(new_tokens[:UserSearchToken.MAX_TOKENS_PER_USER])
+        current_tokens = set(self.filter(user=user)
+                             .values_list('token', flat=True))
+        to_delete = current_tokens - new_tokens
+        if to_delete:
+            self.filter(user=user, token__in=to_delete).delete()
+        self.bulk_create([
+            UserSearchToken(user=user, token=token)
+            for token in new_tokens - current_tokens
+        ])
+
+    def filter_users(self, qs, query, team=None):
+        """Filter a CustomUser queryset to users that match a search query
+
+        Each term in query must be a prefix of one of the user's tokens.  Pass
+        in team to also restrict the token lookups to that team's members,
+        which is much faster for large sites.
+        """
+        terms = calc_search_tokens(query)
+        if not terms:
+            return qs.none()
+        for term in terms:
+            # Use istartswith since it translates to a plain LIKE that can use
+            # the index on MySQL.  Tokens are always normalized.
+            token_qs = self.filter(token__istartswith=term)
+            if team is not None:
+                token_qs = token_qs.filter(user__team_members__team=team)
+            qs = qs.filter(id__in=token_qs.values('user_id'))
+        return qs
+
+class UserSearchToken(models.Model):
+    """Index of words that we use to search for users
+
+    We store one row for each word in a user's name, username, email, and
+    biography.  This lets us do indexed prefix searches rather than scanning
+    every user row with LIKE '%term%'.
+
+    Tokens are updated in CustomUser.save().  Use the
+    update_user_search_index command to rebuild them.
+    """
+    MAX_LENGTH = 30
+    MAX_TOKENS_PER_USER = 200
+
+    user = models.ForeignKey(CustomUser, related_name='search_tokens')
+    token = models.CharField(max_length=MAX_LENGTH)
+
+    objects = UserSearchTokenManager()
+
+    class Meta:
+        unique_together = [
+            ('user', 'token'),
+        ]
+        index_together = [
+            ('token', 'user'),
+        ]
+
 class Announcement(models.Model):
     content = models.CharField(max_length=500)
     created = models.DateTimeField(help_text=_(u'This is date when start to display announcement. And only the last will be displayed.'))
@@ -988,12 +1115,54 @@ class AmaraApiKey(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     key = models.CharField(max_length=256, blank=True, default=generate_api_key)
 
+    # How long to cache API authentication.  We invalidate the cache when
+    # keys are regenerated or users deactivated, this is just a backstop for
+    # changes that bypass save().
+    AUTH_CACHE_TIMEOUT = 60 * 10
+
     class Meta:
         db_table = 'auth_amaraapikey'
 
+    def __init__(self, *args, **kwargs):
+        super(AmaraApiKey, self).__init__(*args, **kwargs)
+        self._initial_key = self.key
+
     def __unicode__(self):
         return u"Api key for {}: {}".format(self.user, self.key)
 
+    @staticmethod
+    def auth_cache_key(username, key):
+        """Get the cache key for API authentication with a username/key
+
+        We use a hash so that API keys aren't stored in the cache keys.
+
+        The username and key lookups ignore case, accents and trailing
+        spaces, so we normalize both the same way.  Otherwise each spelling
+        would get its own cache entry, and invalidating the entry for
+        user.username and the stored key would leave the others working
+        after a key change.
+        """
+        username = collation_key(username.rstrip())
+        if key is not None:
+            key = collation_key(key.rstrip())
+        digest = hashlib.sha256(u'{}\n{}'.format(username, key)
+                                .encode('utf-8')).hexdigest()
+        return 'api-auth-{}'.format(digest)
+
+    def save(self, *args, **kwargs):
+        key_changed = (not self._state.adding and
+                       self.key != self._initial_key)
+        super(AmaraApiKey, self).save(*args, **kwargs)
+        if key_changed:
+            cache.delete(AmaraApiKey.auth_cache_key(self.user.username,
+                                                    self._initial_key))
+        self._initial_key = self.key
+
+    def delete(self, *args, **kwargs):
+        cache.delete(AmaraApiKey.auth_cache_key(self.user.username,
+                                                self._initial_key))
+        super(AmaraApiKey, self).delete(*args, **kwargs)
+
     def generate_new_key(self, commit=True):
         self.key = generate_api_key()
         if commit:
@@ -30,7 +30,7 @@ from django.core import mail
 from django.test import TestCase
 
 from auth import signals
-from auth.models import CustomUser as User, UserLanguage
+from auth.models import CustomUser as User, UserLanguage, UserSearchToken
 from auth.models import LoginToken, AmaraApiKey
 from caching.tests.utils import assert_invalidates_model_cache
 from externalsites.models import YouTubeAccount, VimeoSyncAccount
@@ -145,6 +145,56 @@ class UserProfileChangedTest(TestCase):
             u.save()
             assert_false(handler.called)
 
+class UserSearchTest(TestCase):
+    def tokens(self, user):
+        return set(UserSearchToken.objects.filter(user=user)
+                   .values_list('token', flat=True))
+
+    def test_tokens_created(self):
+        user = UserFactory(username='bsmith', first_name='Ben',
+                           last_name='Smith', email='ben.smith@example.com',
+                           biography='Likes cats')
+        assert_equal(self.tokens(user), set([
+            'bsmith', 'ben', 'smith', 'example', 'com', 'likes', 'cats',
+        ]))
+
+    def test_tokens_updated(self):
+        user = UserFactory(username='bsmith', first_name='Ben',
+                           last_name='Smith', email='')
+        user.first_name = 'Benjamin'
+        user.save()
+        assert_equal(self.tokens(user),
+                     set(['bsmith', 'benjamin', 'smith']))
+
+    def test_search(self):
+        user = UserFactory(username='bsmith', first_name='Ben',
+                           last_name='Smith')
+        other_user = UserFactory(username='jsmith', first_name='John',
+                                 last_name='Smith')
+        assert_items_equal(User.objects.search('smith'), [user, other_user])
+        # prefix matching
+        assert_items_equal(User.objects.search('Smi'), [user, other_user])
+        # all terms must match
+        assert_items_equal(User.objects.search('ben smith'), [user])
+        # non-prefix substrings don't match
+        assert_items_equal(User.objects.search('mith'), [])
+        # empty queries don't match anything
+        assert_items_equal(User.objects.search(''), [])
+
+    def test_tokens_normalized(self):
+        # MySQL's collation considers these names to be duplicate tokens
+        user = UserFactory(username='jose', first_name=u'Jos\xe9',
+                           last_name='Jose', email='',
+                           biography=u'Stra\xdfe Strasse')
+        assert_equal(self.tokens(user), set(['jose', 'strasse']))
+        assert_items_equal(User.objects.search(u'JOS\xc9'), [user])
+
+    def test_search_team(self):
+        team = TeamFactory()
+        member = TeamMemberFactory(team=team, user__first_name='Ben').user
+        UserFactory(first_name='Ben')
+        assert_items_equal(User.objects.search('ben', team=team), [member])
+
 class UniqueUsernameTest(TestCase):
     def test_username_already_unique(self):
         # if the username is unique to begin with, we should use that
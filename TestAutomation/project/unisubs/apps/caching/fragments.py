@@ -0,0 +1,158 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2017 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""caching.fragments -- Batch cache lookups for the template cache tags
+
+The {% cache-by-user %} and {% cache-by-video %} tags store rendered template
+fragments in a CacheGroup.  Fetching each fragment separately means a cache
+round trip per tag.  Instead, we keep a FragmentCache for each request:
+
+    - The first time a cache tag renders in a template, we find all cache
+      tags of the same type in that template and fetch them with one
+      get_many() call.
+    - Misses are rendered as normal, then saved up and written with one
+      set_many() call per cache group when the response is finished (see
+      AmaraCachingMiddleware).
+    - We count hits and misses for each template and log them along with the
+      hit rate at the end of the request.
+"""
+
+from __future__ import absolute_import
+import logging
+
+from utils import requestdata
+
+logger = logging.getLogger('caching.fragments')
+
+def get_fragment_cache(request):
+    """Get the FragmentCache for a request, creating it if needed."""
+    try:
+        return request._fragment_cache
+    except AttributeError:
+        request._fragment_cache = FragmentCache()
+        return request._fragment_cache
+
+def finish_request(request):
+    """Write out the pending fragments and report the hit rates."""
+    fragment_cache = getattr(request, '_fragment_cache', None)
+    if fragment_cache is not None:
+        fragment_cache.flush()
+        fragment_cache.report()
+        del request._fragment_cache
+
+class FragmentCache(object):
+    """Fetch and store template fragments for a request."""
+    def __init__(self):
+        # map CacheGroup prefixes to _GroupFragments objects
+        self.groups = {}
+        # map template names to [hits, misses]
+        self.stats = {}
+
+    def get(self, cache_group, node, context):
+        """Get the cached fragment for a cache tag
+
+        Returns: the cached content or None if it's not in the cache.
+        """
+        group = self._get_group(cache_group)
+        if node.key not in group.fetched_keys:
+            keys = set(n.key for n in find_sibling_nodes(node, context))
+            keys.add(node.key)
+            group.fetch(keys)
+        content = group.values.get(node.key)
+        stats = self.stats.setdefault(template_name(context), [0, 0])
+        if content is not None:
+            stats[0] += 1
+        else:
+            stats[1] += 1
+        return content
+
+    def set(self, cache_group, node, content):
+        """Store a rendered fragment
+
+        The content will be written to the cache in flush().
+        """
+        group = self._get_group(cache_group)
+        group.values[node.key] = content
+        group.pending[node.key] = content
+
+    def flush(self):
+        """Write all pending fragments to the cache."""
+        for group in self.groups.values():
+            group.flush()
+
+    def report(self):
+        for name, (hits, misses) in self.stats.items():
+            hit_rate = float(hits) / (hits + misses)
+            logger.info('fragment cache %s: %s/%s hits', name, hits,
+                        hits + misses, extra={
+                            'template': name,
+                            'hits': hits,
+                            'misses': misses,
+                            'hit_rate': hit_rate,
+                        })
+            requestdata.log('fragment-cache-hit-rate:{}'.format(name),
+                            hit_rate)
+
+    def _get_group(self, cache_group):
+        try:
+            return self.groups[cache_group.prefix]
+        except KeyError:
+            group = _GroupFragments(cache_group)
+            self.groups[cache_group.prefix] = group
+            return group
+
+class _GroupFragments(object):
+    """Track the fragments for a single CacheGroup."""
+    def __init__(self, cache_group):
+        self.cache_group = cache_group
+        self.fetched_keys = set()
+        self.values = {}
+        self.pending = {}
+
+    def fetch(self, keys):
+        keys = keys - self.fetched_keys
+        self.values.update(self.cache_group.get_many(list(keys)))
+        self.fetched_keys.update(keys)
+
+    def flush(self):
+        if self.pending:
+            self.cache_group.set_many(self.pending)
+            self.pending = {}
+
+def current_template(context):
+    """Get the template that's currently rendering."""
+    # render_context.template is set for each template, including included
+    # templates.  context.template is the top-level template.
+    template = getattr(context.render_context, 'template', None)
+    if template is None:
+        template = context.template
+    return template
+
+def template_name(context):
+    template = current_template(context)
+    if template is not None and template.name:
+        return template.name
+    else:
+        return '<unknown>'
+
+def find_sibling_nodes(node, context):
+    """Find cache tags of the same type in the current template."""
+    template = current_template(context)
+    if template is None:
+        return []
+    return template.nodelist.get_nodes_by_type(type(node))
@@ -18,8 +18,11 @@
 
 """caching.middleware -- django middleware for caching."""
 
+from caching import fragments
+
 class AmaraCachingMiddleware(object):
     def process_response(self, request, response):
+        fragments.finish_request(request)
         # by default, don't cache pages in varnish or other upstream caches
         if 'cache-control' not in response:
             response['cache-control'] = 'private'
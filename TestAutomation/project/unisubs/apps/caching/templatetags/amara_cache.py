@@ -22,6 +22,7 @@ from django import template
 from django.utils.translation import get_language
 
 from auth.models import AnonymousUserCacheGroup
+from caching.fragments import get_fragment_cache
 
 register = template.Library()
 
@@ -59,6 +60,19 @@ class CacheNode(template.Node):
         except StandardError:
             logger.warn("error getting cache group", exc_info=True)
             return self.nodelist.render(context)
+        request = context.get('request')
+        if request is None:
+            return self.render_without_batching(context, cache_group)
+        fragment_cache = get_fragment_cache(request)
+        content = fragment_cache.get(cache_group, self, context)
+        if content is None:
+            content = self.nodelist.render(context)
+            fragment_cache.set(cache_group, self, content)
+        return content
+
+    def render_without_batching(self, context, cache_group):
+        # Without a request, we don't have anywhere to batch the lookups.
+        # Just use the cache group directly.
         content = cache_group.get(self.key)
         if content is None:
             content = self.nodelist.render(context)
@@ -0,0 +1,105 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2017 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.client import RequestFactory
+from nose.tools import *
+import mock
+
+from caching import fragments
+from caching.cachegroup import CacheGroup
+from utils.factories import *
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.video.cache.invalidate()
+        self.template = Template(
+            '{% load amara_cache %}'
+            '{% cache-by-video one %}{{ value }}-1{% endcache %}'
+            '{% cache-by-video two %}{{ value }}-2{% endcache %}'
+            '{% if show_three %}'
+            '{% cache-by-video three %}{{ value }}-3{% endcache %}'
+            '{% endif %}')
+        get_many_patcher = mock.patch.object(
+            CacheGroup, 'get_many', autospec=True,
+            side_effect=CacheGroup.get_many)
+        set_many_patcher = mock.patch.object(
+            CacheGroup, 'set_many', autospec=True,
+            side_effect=CacheGroup.set_many)
+        self.get_many = get_many_patcher.start()
+        self.set_many = set_many_patcher.start()
+        self.addCleanup(get_many_patcher.stop)
+        self.addCleanup(set_many_patcher.stop)
+
+    def render(self, value, show_three=True):
+        self.request = RequestFactory().get('/')
+        return self.template.render(Context({
+            'request': self.request,
+            'video': self.video,
+            'value': value,
+            'show_three': show_three,
+        }))
+
+    def finish_request(self):
+        fragments.finish_request(self.request)
+
+    def test_single_get_many(self):
+        assert_equal(self.render('a'), 'a-1a-2a-3')
+        assert_equal(self.get_many.call_count, 1)
+        assert_equal(self.set_many.call_count, 0)
+        self.finish_request()
+        assert_equal(self.set_many.call_count, 1)
+
+    def test_cache_hits(self):
+        self.render('a')
+        self.finish_request()
+        self.get_many.reset_mock()
+        self.set_many.reset_mock()
+        assert_equal(self.render('b'), 'a-1a-2a-3')
+        assert_equal(self.get_many.call_count, 1)
+        self.finish_request()
+        assert_equal(self.set_many.call_count, 0)
+
+    def test_prefetch_skipped_fragments(self):
+        # We should fetch fragments inside conditional blocks up front, even
+        # if they don't get rendered
+        self.render('a', show_three=False)
+        self.finish_request()
+        self.get_many.reset_mock()
+        assert_equal(self.render('b'), 'a-1a-2b-3')
+        assert_equal(self.get_many.call_count, 1)
+
+    def test_hit_rate_stats(self):
+        self.render('a')
+        assert_equal(fragments.get_fragment_cache(self.request).stats,
+                     {'<unknown>': [0, 3]})
+        self.finish_request()
+        self.render('b', show_three=False)
+        assert_equal(fragments.get_fragment_cache(self.request).stats,
+                     {'<unknown>': [2, 0]})
+
+    def test_without_request(self):
+        context = Context({'video': self.video, 'value': 'a',
+                           'show_three': True})
+        assert_equal(self.template.render(context), 'a-1a-2a-3')
+        assert_equal(self.template.render(context), 'a-1a-2a-3')
+        assert_equal(self.set_many.call_count, 0)
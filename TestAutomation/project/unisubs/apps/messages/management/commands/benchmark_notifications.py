@@ -0,0 +1,89 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import time
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from auth.models import CustomUser as User
+from messages.notify import NotificationFanout
+from teams.models import Team
+from utils import send_templated_email
+
+class Command(BaseCommand):
+    help = ("Compare notification throughput of per-user sending and "
+            "NotificationFanout using the locmem email backend")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--recipients', dest='recipients',
+                            type=int, default=5000,
+                            help='Number of recipients to notify')
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def handle(self, **options):
+        # Use unsaved objects so that we only measure rendering and sending
+        team = Team(name='Benchmark Team', slug='benchmark-team')
+        new_member = User(username='new-member')
+        users = [
+            User(username='user-{}'.format(i),
+                 email='user-{}@example.com'.format(i),
+                 notify_by_email=True)
+            for i in xrange(options['recipients'])
+        ]
+        context = {
+            'new_member': new_member,
+            'team': team,
+            'role': 'contributor',
+            'url_base': '{}://{}'.format(settings.DEFAULT_PROTOCOL,
+                                         settings.HOSTNAME),
+        }
+        subject = 'Benchmark Team team has a new member'
+        template_name = 'messages/email/team-new-member.html'
+
+        mail.outbox = []
+        start_time = time.time()
+        for user in users:
+            send_templated_email(user, subject, template_name,
+                                 dict(context, user=user))
+        per_user_time = time.time() - start_time
+        self.report('per-user', per_user_time, len(mail.outbox))
+
+        mail.outbox = []
+        start_time = time.time()
+        fanout = NotificationFanout(context)
+        for user in users:
+            fanout.add_email(user, subject, template_name)
+        fanout.send()
+        fanout_time = time.time() - start_time
+        self.report('fanout', fanout_time, len(mail.outbox))
+
+        if fanout_time:
+            self.stdout.write('speedup: {:.2f}x\n'.format(
+                per_user_time / fanout_time))
+
+    def report(self, label, elapsed, count):
+        if elapsed:
+            rate = count / elapsed
+        else:
+            rate = 0
+        self.stdout.write('{}: {} emails in {:.2f}s ({:.0f} emails/s)\n'.format(
+            label, count, elapsed, rate))
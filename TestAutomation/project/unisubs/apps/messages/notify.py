@@ -20,10 +20,12 @@ import re
 import textwrap
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import (EmailMessage, EmailMultiAlternatives,
+                              get_connection)
 from django.template.loader import render_to_string
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
 from lxml import html
 
 from auth.models import CustomUser as User
@@ -36,6 +38,9 @@ Notifications = Enum('Notifications', [
     ('TEAM_INVITATION', _('Team invitation')),
 ])
 
+# How many emails to hand to the email backend at once
+EMAIL_CHUNK_SIZE = 100
+
 def notify_users(notification, user_list, subject, template_name,
                  context, send_email=None):
     """
@@ -67,17 +72,121 @@ def notify_users(notification, user_list, subject, template_name,
 @job
 def do_notify_users(notification, user_ids, subject, message, html_message,
                     send_email):
-    user_list = User.objects.filter(id__in=user_ids)
+    user_list = User.objects.filter(id__in=user_ids, is_active=True)
+    emails = []
+    messages = []
     for user in user_list:
-        if not user.is_active:
-            continue
         if should_send_email(user, send_email):
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL,
-                      [user.email], html_message=html_message)
+            email = EmailMultiAlternatives(subject, message,
+                                           settings.DEFAULT_FROM_EMAIL,
+                                           [user.email])
+            email.attach_alternative(html_message, 'text/html')
+            emails.append(email)
         if user.notify_by_message:
-            Message.objects.create(user=user, subject=subject,
-                                   message_type=SYSTEM_NOTIFICATION,
-                                   content=html_message, html_formatted=True)
+            messages.append(Message(user=user, subject=subject,
+                                    message_type=SYSTEM_NOTIFICATION,
+                                    content=html_message,
+                                    html_formatted=True))
+    _bulk_create_messages(messages)
+    send_emails(emails)
+
+def send_emails(emails, chunk_size=EMAIL_CHUNK_SIZE):
+    """
+    Send a list of EmailMessage objects using a single connection
+
+    The messages are passed to the email backend in chunks of chunk_size.
+    Returns the number of emails sent.
+    """
+    if not emails:
+        return 0
+    sent = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for i in xrange(0, len(emails), chunk_size):
+            sent += connection.send_messages(emails[i:i+chunk_size]) or 0
+    finally:
+        connection.close()
+    return sent
+
+def _bulk_create_messages(messages):
+    if not messages or getattr(settings, "MESSAGES_DISABLED", False):
+        return
+    for message in messages:
+        message.auto_truncate_subject()
+    Message.objects.bulk_create(messages)
+
+class NotificationFanout(object):
+    """
+    Send the same templated notification to many users
+
+    Each template is rendered once per (template, locale) with a placeholder
+    for the "user" context variable, then the recipient is substituted in for
+    each user.  This means that the templates can use {{ user }}, but not
+    any of its attributes.
+
+    Call add_message() and add_email() for each recipient, then send() to
+    insert all the Messages with one bulk_create() and send all the emails
+    over a single connection.
+    """
+    USER_PLACEHOLDER = u'__NOTIFY_USER_PLACEHOLDER__'
+
+    def __init__(self, context):
+        self.context = dict(context, user=self.USER_PLACEHOLDER)
+        # match the context that send_templated_email() uses
+        self.email_context = dict(
+            self.context, domain=settings.HOSTNAME,
+            url_base=u'{}://{}'.format(settings.DEFAULT_PROTOCOL,
+                                       settings.HOSTNAME))
+        self.rendered = {}
+        self.messages = []
+        self.emails = []
+
+    def render(self, template_name, user, for_email=False):
+        key = (template_name, get_language(), for_email)
+        if key not in self.rendered:
+            if for_email:
+                context = self.email_context
+            else:
+                context = self.context
+            self.rendered[key] = render_to_string(template_name, context)
+        return self.rendered[key].replace(
+            self.USER_PLACEHOLDER, conditional_escape(unicode(user)))
+
+    def add_message(self, user, subject, template_name, **attrs):
+        """
+        Add a Message for a user, if they have notify_by_message set
+
+        attrs are extra attributes to set on the Message (object, author,
+        etc).
+        """
+        if not user.notify_by_message:
+            return
+        message = Message(user=user, subject=subject,
+                          message_type=SYSTEM_NOTIFICATION,
+                          content=self.render(template_name, user))
+        for name, value in attrs.items():
+            setattr(message, name, value)
+        self.messages.append(message)
+
+    def add_email(self, user, subject, template_name):
+        """
+        Add an email for a user, if they have notify_by_email set
+        """
+        if not (user.email and user.notify_by_email):
+            return
+        email = EmailMessage(subject,
+                             self.render(template_name, user, for_email=True),
+                             settings.DEFAULT_FROM_EMAIL, [user.email],
+                             bcc=settings.EMAIL_BCC_LIST)
+        email.content_subtype = 'html'
+        self.emails.append(email)
+
+    def send(self):
+        _bulk_create_messages(self.messages)
+        send_emails(self.emails)
+        self.messages = []
+        self.emails = []
 
 def should_send_email(user, send_email):
     """
@@ -38,6 +38,7 @@ from localeurl.utils import universal_url
 from teams.moderation_const import REVIEWED_AND_PUBLISHED, \
      REVIEWED_AND_PENDING_APPROVAL, REVIEWED_AND_SENT_BACK
 from messages.models import Message, SYSTEM_NOTIFICATION
+from messages.notify import NotificationFanout
 from utils import send_templated_email
 from utils.taskqueue import job
 from utils.text import fmt
@@ -103,31 +104,22 @@ def application_sent(application_pk):
         return False
     notifiable = TeamMember.objects.filter(team=application.team, user__is_active=True,
                  role__in=[TeamMember.ROLE_ADMIN, TeamMember.ROLE_OWNER])
-    for m in notifiable:
-
-        template_name = "messages/application-sent.txt"
-        context = {
-            "application": application,
-            "applicant": application.user,
-            "url_base": get_url_base(),
-            "team":application.team,
-            "note":application.note,
-            "user":m.user,
-        }
-        body = render_to_string(template_name,context)
-        subject  = fmt(
-            ugettext(u'%(user)s is applying for team %(team)s'),
-            user=application.user, team=application.team.name)
-        if m.user.notify_by_message:
-            msg = Message()
-            msg.message_type = 'S'
-            msg.subject = subject
-            msg.content = body
-            msg.user = m.user
-            msg.object = application.team
-            msg.author = application.user
-            msg.save()
-        send_templated_email(m.user, subject, "messages/email/application-sent-email.html", context)
+    subject  = fmt(
+        ugettext(u'%(user)s is applying for team %(team)s'),
+        user=application.user, team=application.team.name)
+    fanout = NotificationFanout({
+        "application": application,
+        "applicant": application.user,
+        "url_base": get_url_base(),
+        "team":application.team,
+        "note":application.note,
+    })
+    for m in notifiable.select_related('user'):
+        fanout.add_message(m.user, subject, "messages/application-sent.txt",
+                           object=application.team, author=application.user)
+        fanout.add_email(m.user, subject,
+                         "messages/email/application-sent-email.html")
+    fanout.send()
     return True
 
 
@@ -178,28 +170,21 @@ def team_member_new(member_pk):
     # notify  admins and owners through messages
     notifiable = TeamMember.objects.filter(team=member.team, user__is_active=True,
        role__in=[TeamMember.ROLE_ADMIN, TeamMember.ROLE_OWNER]).exclude(pk=member.pk)
-    for m in notifiable:
-        context = {
-            "new_member": member.user,
-            "team":member.team,
-            "user":m.user,
-            "role":member.role,
-            "url_base":get_url_base(),
-        }
-        body = render_to_string("messages/team-new-member.txt",context)
-        subject = fmt(
-            ugettext("%(team)s team has a new member"),
-            team=member.team)
-        if m.user.notify_by_message:
-            msg = Message()
-            msg.message_type = 'S'
-            msg.subject = subject
-            msg.content = body
-            msg.user = m.user
-            msg.object = m.team
-            msg.save()
-        template_name = "messages/email/team-new-member.html"
-        send_templated_email(m.user, subject, template_name, context)
+    subject = fmt(
+        ugettext("%(team)s team has a new member"),
+        team=member.team)
+    fanout = NotificationFanout({
+        "new_member": member.user,
+        "team":member.team,
+        "role":member.role,
+        "url_base":get_url_base(),
+    })
+    for m in notifiable.select_related('user'):
+        fanout.add_message(m.user, subject, "messages/team-new-member.txt",
+                           object=member.team)
+        fanout.add_email(m.user, subject,
+                         "messages/email/team-new-member.html")
+    fanout.send()
 
     # does this team have a custom message for this?
     team_default_message = None
@@ -259,24 +244,17 @@ def team_member_leave(team_pk, user_pk):
     subject = fmt(
         ugettext(u"%(user)s has left the %(team)s team"),
         user=user, team=team)
-    for m in notifiable:
-        context = {
-            "parting_member": user,
-            "team":team,
-            "user":m.user,
-            "url_base":get_url_base(),
-        }
-        body = render_to_string("messages/team-member-left.txt",context)
-        if m.user.notify_by_message:
-            msg = Message()
-            msg.message_type = 'S'
-            msg.subject = subject
-            msg.content = body
-            msg.user = m.user
-            msg.object = team
-            msg.save()
-        send_templated_email(m.user, subject, "messages/email/team-member-left.html", context)
-
+    fanout = NotificationFanout({
+        "parting_member": user,
+        "team":team,
+        "url_base":get_url_base(),
+    })
+    for m in notifiable.select_related('user'):
+        fanout.add_message(m.user, subject, "messages/team-member-left.txt",
+                           object=team)
+        fanout.add_email(m.user, subject,
+                         "messages/email/team-member-left.html")
+    fanout.send()
 
     context = {
         "team":team,
@@ -360,7 +338,7 @@ def email_confirmed(user_pk):
     return True
 
 @job
-def videos_imported_message(user_pk, imported_videos):
+def videos_imported_message(user_pk, imported_videos, timings=None):
     from messages.models import Message
     user = User.objects.get(pk=user_pk)
     if not user.is_active:
@@ -370,7 +348,8 @@ def videos_imported_message(user_pk, imported_videos):
                     reverse("profiles:videos", kwargs={'user_id': user_pk}))
     context = {"user": user,
                "imported_videos": imported_videos,
-               "my_videos_url": url}
+               "my_videos_url": url,
+               "timings": timings}
 
     if user.notify_by_message:
         body = render_to_string("messages/videos-imported.txt", context)
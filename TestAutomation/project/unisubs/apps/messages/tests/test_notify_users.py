@@ -20,18 +20,14 @@ from lxml import etree
 import mock
 import re
 
+from django.utils import translation
+
 import pytest
 
 from messages import notify
 from messages.models import Message
 from utils.factories import *
 
-@pytest.fixture(autouse=True)
-def mock_send_mail(monkeypatch):
-    mock_send_mail = mock.Mock()
-    with mock.patch('messages.notify.send_mail', mock_send_mail):
-        yield mock_send_mail
-
 @pytest.fixture(autouse=True)
 def setup_settings(settings):
     settings.DEFAULT_FROM_EMAIL = 'test@example.com'
@@ -59,7 +55,7 @@ def test_should_send_email():
     assert not notify.should_send_email(
         UserFactory(notify_by_email=True), False)
 
-def test_send_email(mock_send_mail):
+def test_send_email(mailoutbox):
     """
     Templates often start with a line like "{% load i18n %}\n".  Make sure the
     newline at the end of that doesn't show up as a leading newline in the
@@ -71,11 +67,11 @@ def test_send_email(mock_send_mail):
                         'Test subject', 'tests/test-message.html', {})
 
 
-def test_text_rendering(mock_send_mail):
+def test_text_rendering(mailoutbox):
     user = UserFactory(notify_by_email=True)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
-    text = mock_send_mail.call_args[0][1]
+    text = mailoutbox[0].body
     assert text == """\
 Here's a link: Home (https://test.amara.org/)
 
@@ -89,7 +85,7 @@ really really really really really really really really really long
 line.
 """
 
-def test_message(mock_send_mail):
+def test_message():
     user = UserFactory(notify_by_message=True)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
@@ -98,18 +94,91 @@ def test_message(mock_send_mail):
     last_message = Message.objects.for_user(user).order_by('-id')[:1].get()
     assert last_message.subject == 'Test subject'
 
-def test_notify_by_message_unset(mock_send_mail):
+def test_notify_by_message_unset():
     user = UserFactory(notify_by_message=False)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
     # test that we don't send a message
     assert Message.objects.for_user(user).count() == 0
 
-def test_inactive_user(mock_send_mail):
+def test_inactive_user(mailoutbox):
     user = UserFactory(notify_by_message=True, notify_by_email=True,
                        is_active=False)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
     # test that we don't send a message or an email
     assert Message.objects.for_user(user).count() == 0
-    assert not mock_send_mail.called
+    assert len(mailoutbox) == 0
+
+def test_many_users(mailoutbox):
+    users = [UserFactory(notify_by_email=True, notify_by_message=True)
+             for i in range(3)]
+    notify.notify_users(notify.Notifications.ROLE_CHANGED, users,
+                        'Test subject', 'tests/test-message.html', {})
+    assert sorted(email.to[0] for email in mailoutbox) == sorted(
+        u.email for u in users)
+    for email in mailoutbox:
+        assert email.alternatives[0][1] == 'text/html'
+    for user in users:
+        assert Message.objects.for_user(user).count() == 1
+
+def test_send_emails_uses_one_connection(mailoutbox):
+    emails = [mock.Mock() for i in range(5)]
+    connection = mock.Mock()
+    connection.send_messages.side_effect = lambda emails: len(emails)
+    with mock.patch('messages.notify.get_connection') as get_connection:
+        get_connection.return_value = connection
+        assert notify.send_emails(emails, chunk_size=2) == 5
+    assert get_connection.call_count == 1
+    assert connection.send_messages.call_args_list == [
+        mock.call(emails[0:2]),
+        mock.call(emails[2:4]),
+        mock.call(emails[4:5]),
+    ]
+    assert connection.close.called
+
+class TestNotificationFanout(object):
+    @pytest.fixture
+    def mock_render_to_string(self):
+        with mock.patch('messages.notify.render_to_string') as mock_render:
+            mock_render.side_effect = lambda template_name, context: (
+                u'Hi {}'.format(context['user']))
+            yield mock_render
+
+    def test_render_once(self, mock_render_to_string):
+        fanout = notify.NotificationFanout({})
+        users = [UserFactory(first_name=u'Ben & Jerry', last_name=u''),
+                 UserFactory()]
+        assert fanout.render('template.txt', users[0]) == u'Hi Ben &amp; Jerry'
+        assert fanout.render('template.txt', users[1]) == (
+            u'Hi {}'.format(unicode(users[1])))
+        assert mock_render_to_string.call_count == 1
+
+    def test_render_per_locale(self, mock_render_to_string):
+        fanout = notify.NotificationFanout({})
+        user = UserFactory()
+        with translation.override('en'):
+            fanout.render('template.txt', user)
+            fanout.render('template.txt', user)
+        with translation.override('fr'):
+            fanout.render('template.txt', user)
+        assert mock_render_to_string.call_count == 2
+
+    def test_send(self, mailoutbox, mock_render_to_string):
+        team = TeamFactory()
+        email_user = UserFactory(notify_by_email=True,
+                                 notify_by_message=False)
+        message_user = UserFactory(notify_by_email=False,
+                                   notify_by_message=True)
+        fanout = notify.NotificationFanout({})
+        for user in (email_user, message_user):
+            fanout.add_message(user, 'Subject', 'template.txt', object=team)
+            fanout.add_email(user, 'Subject', 'template.html')
+        fanout.send()
+
+        assert [email.to for email in mailoutbox] == [[email_user.email]]
+        assert mailoutbox[0].content_subtype == 'html'
+        assert Message.objects.for_user(email_user).count() == 0
+        message = Message.objects.for_user(message_user).get()
+        assert message.object == team
+        assert message.content == u'Hi {}'.format(unicode(message_user))
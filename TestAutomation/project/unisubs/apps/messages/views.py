@@ -27,7 +27,6 @@ from django.urls import reverse
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.utils.http import cookie_date
 from django.utils.translation import ugettext_lazy as _
-from django.db.models import Q
 from django.db.models import Max
 
 from auth.models import CustomUser as User
@@ -227,12 +226,9 @@ def new(request):
 
 @render_to_json
 def search_users(request):
-    users = User.objects.all()
     q = request.GET.get('term')
-    search_in_fields = Q(username__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q)
+    users = User.objects.search(q).filter(is_active=True)
     results = [[u.id, escape(u.username), escape(unicode(u))]
-               for u in users.filter(search_in_fields,
-                                            is_active=True)]
-    results = results[:MAX_MEMBER_SEARCH_RESULTS]
+               for u in users[:MAX_MEMBER_SEARCH_RESULTS]]
 
     return { 'results': results }
@@ -43,6 +43,7 @@ from utils.rpc import RpcRouter
 from utils.text import fmt
 from teams.models import Task
 from subtitles.models import SubtitleLanguage
+from videos.listing import annotate_videos
 from videos.models import (
     VideoUrl, Video, VIDEO_TYPE_YOUTUBE, VideoFeed
 )
@@ -191,7 +192,8 @@ def videos(request, user_id):
                        paginate_by=VIDEOS_ON_PAGE,
                        template_name='profiles/videos.html',
                        extra_context=context,
-                       template_object_name='user_video')
+                       template_object_name='user_video',
+                       prepare_objects=annotate_videos)
 
 
 @login_required
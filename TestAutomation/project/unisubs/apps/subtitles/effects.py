@@ -0,0 +1,194 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""subtitles.effects -- Side effects that run after the pipeline commits
+
+pipeline.add_subtitles() locks the video row while it adds a version.  To
+keep the lock time short, the locked section only does the work that needs
+to be in the transaction: inserting the version, setting its visibility and
+updating the language.  Everything else goes into an EffectQueue, which runs
+once the transaction commits.  If the pipeline is called inside an outer
+transaction, the effects wait until that one commits, so that the deferred
+job and anything reading the cache see the new version.
+
+There are 2 kinds of effects:
+
+    - inline effects run in the current process, right after the commit.
+      These are for things the caller depends on, like action.perform()
+      publishing the new version.
+    - deferred effects are registered with the @effect decorator and sent to
+      a worker as one job.  They only take ids as arguments and must be
+      idempotent, since a job may be retried.  Adding the same effect with
+      the same arguments twice only runs it once.
+
+Both kinds run in the order they were added, with all inline effects before
+the deferred ones.
+
+EffectQueue also records how long each phase of the pipeline took.  Timings
+are logged and sent to utils.requestdata with a "pipeline-" prefix:
+
+    - prepare: parsing the subtitles and looking up parents before locking
+    - lock-wait: waiting for the video row lock
+    - transaction: the entire transaction, including lock-wait
+    - effects: running the inline effects and queueing the deferred ones
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import time
+
+from django.db.transaction import on_commit
+
+from utils import requestdata
+from utils.taskqueue import job
+
+logger = logging.getLogger('subtitles.effects')
+
+EFFECTS = {}
+
+def effect(name):
+    """Decorator to register a deferred effect."""
+    def wrapper(func):
+        EFFECTS[name] = func
+        return func
+    return wrapper
+
+class EffectQueue(object):
+    """Queue effects to run after a pipeline transaction
+
+    Attributes:
+        timings: OrderedDict mapping phase names to seconds
+    """
+    def __init__(self):
+        self.inline = []
+        self.deferred = []
+        self.timings = OrderedDict()
+
+    def add_inline(self, func, *args, **kwargs):
+        """Add an effect that runs in the current process."""
+        self.inline.append((func, args, kwargs))
+
+    def defer(self, name, **kwargs):
+        """Add an effect that runs in a worker
+
+        Args:
+            name: name of the effect, passed to @effect
+            **kwargs: ids to pass to the effect
+        """
+        if name not in EFFECTS:
+            raise ValueError('Unknown effect: {}'.format(name))
+        if (name, kwargs) not in self.deferred:
+            self.deferred.append((name, kwargs))
+
+    @contextmanager
+    def time_phase(self, phase):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.timings[phase] = (self.timings.get(phase, 0.0) +
+                                   time.time() - start_time)
+
+    def run(self):
+        """Run the effects
+
+        Call this after the transaction is committed.  Use run_on_commit() if
+        there may be a transaction running.
+        """
+        with self.time_phase('effects'):
+            for func, args, kwargs in self.inline:
+                func(*args, **kwargs)
+            if self.deferred:
+                run_deferred_effects.delay(self.deferred)
+        self.inline = []
+        self.deferred = []
+        self.report()
+
+    def run_on_commit(self):
+        """Run the effects once the current transaction commits
+
+        If there's no transaction running, they run immediately.
+        """
+        on_commit(self.run)
+
+    def report(self):
+        logger.info('subtitle pipeline: %s',
+                    ', '.join('{}: {:.3f}s'.format(phase, seconds)
+                              for phase, seconds in self.timings.items()))
+        for phase, seconds in self.timings.items():
+            requestdata.log('pipeline-{}'.format(phase),
+                            int(seconds * 1000))
+
+@job
+def run_deferred_effects(effects):
+    """Run deferred effects in a worker
+
+    If an effect fails, we log the error and continue with the rest of them.
+    """
+    start_time = time.time()
+    for name, kwargs in effects:
+        try:
+            EFFECTS[name](**kwargs)
+        except Exception:
+            logger.exception('Error running pipeline effect %s (%s)', name,
+                             kwargs)
+    logger.info('subtitle pipeline deferred effects: %.3fs (%s)',
+                time.time() - start_time,
+                ', '.join(name for name, kwargs in effects))
+
+@effect('update-followers')
+def update_followers(language_id, user_id):
+    """Make the author of a version follow the language."""
+    from subtitles.models import SubtitleLanguage
+    try:
+        language = SubtitleLanguage.objects.get(id=language_id)
+    except SubtitleLanguage.DoesNotExist:
+        return
+    # followers.add() skips users that are already following
+    language.followers.add(user_id)
+
+@effect('fork-dependents')
+def fork_dependents(language_id):
+    """Fork the direct translations of a language."""
+    from subtitles.models import SubtitleLanguage
+    from subtitles.translationgraph import TranslationGraph
+    try:
+        language = SubtitleLanguage.objects.get(id=language_id)
+    except SubtitleLanguage.DoesNotExist:
+        return
+    # Build the graph from the DB rather than using the cached one, so that
+    # we see the versions from the transaction we're following.  Forked
+    # languages aren't dependents, so running this twice is safe.
+    graph = TranslationGraph.build(language.video_id)
+    language_ids = graph.dependents(language.id, direct=True)
+    if not language_ids:
+        return
+    for dependent in SubtitleLanguage.objects.filter(id__in=language_ids):
+        dependent.fork()
+
+@effect('api-subtitles-edited')
+def api_subtitles_edited(version_id):
+    """Send the api_subtitles_edited signal for a version."""
+    from subtitles.models import SubtitleVersion
+    from teams.signals import api_subtitles_edited
+    try:
+        version = SubtitleVersion.objects.get(id=version_id)
+    except SubtitleVersion.DoesNotExist:
+        return
+    api_subtitles_edited.send(version)
@@ -30,6 +30,7 @@ from django.utils.translation import ugettext
 
 from activity.models import ActivityRecord
 from externalsites.models import SyncHistory
+from subtitles import parsing
 from subtitles import pipeline
 from subtitles.shims import is_dependent
 from subtitles.models import ORIGIN_UPLOAD, SubtitleLanguage
@@ -42,7 +43,6 @@ from teams.permissions import (
 from videos.tasks import video_changed_tasks
 from ui.forms import AmaraClearableFileInput, LanguageField
 from utils.text import fmt
-from utils.subtitles import load_subtitles
 from utils.translation import (ALL_LANGUAGE_CHOICES,
                                get_language_choices,
                                get_language_label)
@@ -200,8 +200,12 @@ class SubtitlesUploadForm(forms.Form):
             # we don't know the language code yet, since we are early in the
             # clean process.  Set it to blank for now and we'll set it to the
             # correct value in save()
-            self._parsed_subtitles = load_subtitles('', decoded,
-                                                    self.extension)
+            self._parsed_subtitles = parsing.parse_subtitles('', decoded,
+                                                             self.extension)
+        except parsing.ParseError, e:
+            raise forms.ValidationError([
+                parsing.format_error(error) for error in e.errors
+            ])
         except TypeError, e:
             raise forms.ValidationError(e)
         except ValueError, e:
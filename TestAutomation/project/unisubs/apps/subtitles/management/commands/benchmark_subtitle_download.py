@@ -0,0 +1,77 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+import time
+
+import babelsubs
+from django.core.management.base import BaseCommand
+
+from subtitles.models import SubtitleVersion
+from subtitles.views import download_chunks, buffer_chunks
+from utils.subtitles import create_new_subtitles
+
+class Command(BaseCommand):
+    help = ("Compare building subtitle downloads as a single string with "
+            "streaming them in chunks")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--cues', dest='cues', type=int,
+                            default=20000, help='Number of cues to generate')
+        parser.add_argument('-f', '--format', dest='formats',
+                            action='append',
+                            help='Format to test (default: dfxp, srt, vtt)')
+
+    def handle(self, **options):
+        subtitles = create_new_subtitles('en')
+        for i in xrange(options['cues']):
+            subtitles.append_subtitle(i * 2000, i * 2000 + 1500,
+                                      'Subtitle number {}'.format(i))
+        # Use an unsaved version, we only need the serialized subtitles
+        version = SubtitleVersion(language_code='en')
+        version.set_subtitles(subtitles)
+        for format in options['formats'] or ['dfxp', 'srt', 'vtt']:
+            self.run_benchmark(version, format)
+
+    def run_benchmark(self, version, format):
+        version._subtitles = None
+        start_time = time.time()
+        output = babelsubs.to(version.get_subtitles(), format,
+                              language=version.language_code)
+        self.report(format, 'single string', time.time() - start_time,
+                    None, len(output))
+        del output
+
+        version._subtitles = None
+        start_time = time.time()
+        first_chunk_time = None
+        max_chunk = 0
+        for chunk in buffer_chunks(download_chunks(version, format)):
+            if first_chunk_time is None:
+                first_chunk_time = time.time() - start_time
+            max_chunk = max(max_chunk, len(chunk))
+        self.report(format, 'streaming', time.time() - start_time,
+                    first_chunk_time, max_chunk)
+
+    def report(self, format, label, elapsed, first_chunk_time, buffer_size):
+        if first_chunk_time is None:
+            first_chunk_time = elapsed
+        self.stdout.write(
+            '{} {}: {:.3f}s total, {:.3f}s to first byte, '
+            'largest buffer {} chars\n'.format(
+                format, label, elapsed, first_chunk_time, buffer_size))
@@ -0,0 +1,120 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+import os
+import time
+
+import babelsubs
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from subtitles import parsing
+from utils.subtitles import create_new_subtitles
+
+CORPUS_DIR = os.path.join(settings.PROJECT_ROOT, 'babelsubs', 'babelsubs',
+                          'tests', 'data')
+
+class Command(BaseCommand):
+    help = ("Compare parsing uploads inline with the subtitles.parsing "
+            "process pool, using the babelsubs test files scaled up")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--scale', dest='scale', type=int,
+                            default=200,
+                            help='Number of times to repeat the cues in '
+                            'each file')
+
+    def handle(self, **options):
+        corpus = self.build_corpus(options['scale'])
+        total_size = sum(len(content) for name, fmt, content in corpus)
+        self.stdout.write('{} files, {} KB total\n'.format(
+            len(corpus), total_size // 1024))
+
+        start_time = time.time()
+        slowest = 0
+        for name, fmt, content in corpus:
+            file_start = time.time()
+            parsing._parse('en', content, fmt)
+            slowest = max(slowest, time.time() - file_start)
+        self.report('inline', time.time() - start_time, slowest)
+
+        start_time = time.time()
+        slowest = 0
+        for name, fmt, content in corpus:
+            file_start = time.time()
+            parsing.parse_subtitles('en', content, fmt)
+            slowest = max(slowest, time.time() - file_start)
+        self.report('routed (inline limit {} KB)'.format(
+            parsing.INLINE_MAX_SIZE // 1024), time.time() - start_time,
+            slowest)
+
+        # Send everything to the pool at once, like several web workers
+        # uploading at the same time would.
+        start_time = time.time()
+        with parsing._use_pool() as pool:
+            results = [
+                pool.apply_async(parsing._parse_to_dfxp, ('en', content, fmt))
+                for name, fmt, content in corpus
+            ]
+            for result in results:
+                result.get(parsing.PARSE_TIMEOUT)
+        self.report('pool, {} concurrent files'.format(len(corpus)),
+                    time.time() - start_time, None)
+        parsing._reset_pool()
+
+    def build_corpus(self, scale):
+        """Scale up each file from the babelsubs test data
+
+        Returns: list of (filename, format, content) tuples
+        """
+        corpus = []
+        for filename in sorted(os.listdir(CORPUS_DIR)):
+            fmt = filename.rsplit('.', 1)[-1]
+            if fmt not in babelsubs.get_available_formats():
+                continue
+            with open(os.path.join(CORPUS_DIR, filename)) as f:
+                content = f.read()
+            try:
+                subtitles = parsing.parse_subtitles('en', content, fmt)
+            except parsing.ParseError:
+                self.stdout.write('skipping {} (parse error)\n'.format(
+                    filename))
+                continue
+            items = list(subtitles.subtitle_items())
+            if not items:
+                continue
+            span = max(item.end_time for item in items) or 0
+            scaled = create_new_subtitles('en')
+            for i in xrange(scale):
+                offset = i * (span + 1000)
+                for item in items:
+                    scaled.append_subtitle(
+                        self.shift(item.start_time, offset),
+                        self.shift(item.end_time, offset), item.text)
+            corpus.append((filename, fmt, babelsubs.to(scaled, fmt)))
+        return corpus
+
+    def shift(self, time, offset):
+        return time + offset if time is not None else None
+
+    def report(self, label, elapsed, slowest):
+        line = '{}: {:.3f}s total'.format(label, elapsed)
+        if slowest is not None:
+            line += ', slowest file blocked the caller {:.3f}s'.format(slowest)
+        self.stdout.write(line + '\n')
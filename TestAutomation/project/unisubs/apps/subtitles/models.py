@@ -22,6 +22,7 @@ import collections
 import itertools
 import json
 import logging
+import re
 from datetime import datetime, date, timedelta
 
 
@@ -44,9 +45,11 @@ from babelsubs.storage import SubtitleSet
 from babelsubs.storage import calc_changes
 from babelsubs.generators.html import HTMLGenerator
 from babelsubs import load_from
+from babelsubs.xmlconst import TTML_NAMESPACE_URI_LEGACY
 from subtitles import signals
+from subtitles.translationgraph import TranslationGraph
 from utils import dates
-from utils.compress import compress, decompress
+from utils.compress import compress, decompress, iter_decompress
 from utils.subtitles import create_new_subtitles
 from utils.text import fmt
 from utils import translation
@@ -78,6 +81,9 @@ def mapcat(fn, iterable):
     """
     return itertools.chain.from_iterable(itertools.imap(fn, iterable))
 
+# Matches the language code in the root tag of our stored DFXP
+STORED_DFXP_LANGUAGE_RE = re.compile(r'<tt\b[^>]*\bxml:lang="([^"]*)"')
+
 def ensure_stringy(val):
     """Ensure the given value is a stringy type, like str or unicode.
 
@@ -130,6 +136,26 @@ def lineage_to_json(lineage):
 def json_to_lineage(json_lineage):
     return json.loads(json_lineage)
 
+def make_subtitle_set(language_code, subtitles):
+    """Convert the subtitles passed to SubtitleVersion.set_subtitles()
+
+    Returns: SubtitleSet
+    """
+    # TODO: Fix the language code to use the proper standard.
+    if subtitles == None:
+        return create_new_subtitles(language_code)
+    elif isinstance(subtitles, str) or isinstance(subtitles, unicode):
+        return SubtitleSet(language_code, initial_data=subtitles)
+    elif isinstance(subtitles, SubtitleSet):
+        return subtitles
+    else:
+        try:
+            i = iter(subtitles)
+            return SubtitleSet.from_list(language_code, i)
+        except TypeError:
+            raise TypeError("Cannot create SubtitleSet from type %s"
+                            % str(type(subtitles)))
+
 def get_lineage(parents):
     """Return a lineage map for a version that has the given parents."""
     lineage = {}
@@ -443,7 +469,13 @@ class SubtitleLanguage(models.Model):
         super(SubtitleLanguage, self).__init__(*args, **kwargs)
         self._tip_cache = {}
         self._translation_source_version_cache = {}
+        self._translation_graph = None
         self._frozen = False
+        # Value of subtitles_complete in the DB, as far as we know.  post_save
+        # handlers use this to see if it changed.  It's None if the field was
+        # deferred.
+        self.saved_subtitles_complete = self.__dict__.get(
+            'subtitles_complete')
 
     def get_soft_limits(self):
         """
@@ -531,8 +563,9 @@ class SubtitleLanguage(models.Model):
     def freeze(self):
         """Suspend sending signals until thaw() is called
 
-        This controls the subtitles_completed and subtitles_added signals.  We
-        probably should fold in subtitles_published at some point too.
+        This controls the subtitles_completed, subtitles_incomplete and
+        subtitles_added signals.  We probably should fold in
+        subtitles_published at some point too.
         """
         if self._frozen:
             return
@@ -566,6 +599,7 @@ class SubtitleLanguage(models.Model):
             return
         self.subtitles_complete = False
         self.save()
+        self.send_signal(signals.subtitles_incomplete)
 
     def is_rtl(self):
         return translation.is_rtl(self.language_code)
@@ -594,6 +628,7 @@ class SubtitleLanguage(models.Model):
             self.created = dates.now()
 
         super(SubtitleLanguage, self).save(*args, **kwargs)
+        self.saved_subtitles_complete = self.subtitles_complete
 
     def change_language_code(self, language_code):
         # change current language_code
@@ -910,8 +945,12 @@ EXISTS(
         for p in parents:
             sv.parents.add(p)
 
+        # The parents change the TranslationGraph, but saving them doesn't
+        # trigger the signal handlers that invalidate the video cache.
+        Video.cache.invalidate_by_pk(self.video_id)
         cache.invalidate_language_cache(self)
         self.clear_tip_cache()
+        self.clear_translation_source_cache()
         self.send_signal(signals.subtitles_added, version=sv)
         return sv
 
@@ -1055,10 +1094,9 @@ EXISTS(
         could be revisited in the future.
 
         """
-        source_language = self.get_translation_source_language(
-            ignore_forking=ignore_forking
-        )
-        return source_language.language_code if source_language else None
+        if not ignore_forking and self.is_forked:
+            return None
+        return self.get_translation_graph().source_language_code(self.id)
 
 
     def get_translation_source_language(self, ignore_forking=False):
@@ -1095,24 +1133,25 @@ EXISTS(
 
     def clear_translation_source_cache(self):
         self._translation_source_version_cache = {}
+        self._translation_graph = None
+
+    def get_translation_graph(self):
+        """Get the TranslationGraph for our video."""
+        if self._translation_graph is None:
+            self._translation_graph = TranslationGraph.for_video(
+                self.video_id)
+        return self._translation_graph
 
     def _get_translation_source_version(self, ignore_forking=False):
         if not ignore_forking and self.is_forked:
             return None
 
-        qs = SubtitleVersion.objects.raw("""\
-SELECT parents.*
-FROM subtitles_subtitleversion children
-JOIN subtitles_subtitleversion_parents pmap
-    ON children.id=pmap.from_subtitleversion_id
-JOIN subtitles_subtitleversion parents
-    ON parents.id=pmap.to_subtitleversion_id
-WHERE children.subtitle_language_id=%s AND parents.subtitle_language_id != %s
-ORDER BY children.version_number DESC
-LIMIT 1;""", (self.id, self.id))
+        version_id = self.get_translation_graph().source_version_id(self.id)
+        if version_id is None:
+            return None
         try:
-            return qs[0]
-        except IndexError:
+            return SubtitleVersion.objects.get(id=version_id)
+        except SubtitleVersion.DoesNotExist:
             return None
 
     def get_dependent_subtitle_languages(self, direct=False):
@@ -1130,41 +1169,20 @@ LIMIT 1;""", (self.id, self.id))
             >>> en.get_dsl(direct=True)
             [fr]
 
-        Note that this is NOT going to be very performant.
+        Dependents are calculated with the video's TranslationGraph, so
+        this only needs a query to load the languages.  Forked languages are
+        never dependents.
 
         This is a shim for the existing UI.  Once the new one comes this
         monstrosity will be torn out.
 
         """
-        # Start with all the subtitle languages for the video.
-        sls = self.video.newsubtitlelanguage_set
-
-        # Exclude this one.
-        sls = sls.exclude(id=self.id)
-
-        # Exclude those that are already forked.  They can't be dependents.
-        sls = sls.exclude(is_forked=True)
-
-        # Realize the query to get the list of remaining SubtitleLanguages that
-        # could possibly be dependents.  Hopefully there shouldn't be too many.
-        sls = list(sls)
-
-        # Check the lineage maps for the candidates to determine if they're
-        # dependents.
-        results = []
-        for sl in sls:
-            tip = sl.get_tip()
-            if tip and self.language_code in tip.lineage:
-                results.append(sl)
-
-        # Direct translations are restricted to those that come directly from
-        # the source language (this).
-        if direct:
-            lc = self.language_code
-            results = [sl for sl in results
-                       if sl.get_translation_source_language_code() == lc]
-
-        return results
+        language_ids = self.get_translation_graph().dependents(
+            self.id, direct=direct)
+        if not language_ids:
+            return []
+        return list(SubtitleLanguage.objects.filter(id__in=language_ids)
+                    .order_by('id'))
 
 
     def fork(self):
@@ -1547,6 +1565,29 @@ class SubtitleVersion(models.Model):
 
         return self._subtitles
 
+    def iter_stored_dfxp(self):
+        """Iterate over the stored DFXP for this version without parsing it
+
+        We store the output of SubtitleSet.to_xml(), so for most versions
+        the stored XML is exactly what we would generate after parsing it.
+        This method streams it straight from the decompressor in chunks.
+
+        Returns None if we can't use the stored XML.  This happens if the
+        subtitles have already been loaded (they may have been changed), if
+        they use the legacy TTML namespace, or if they were stored with the
+        wrong language code.  Callers should use get_subtitles() in that
+        case.
+        """
+        if self._subtitles is not None:
+            return None
+        chunks = iter_decompress(self.serialized_subtitles)
+        first_chunk = next(chunks, '')
+        match = STORED_DFXP_LANGUAGE_RE.search(first_chunk)
+        if (match is None or match.group(1) != self.language_code or
+                TTML_NAMESPACE_URI_LEGACY in first_chunk):
+            return None
+        return itertools.chain([first_chunk], chunks)
+
     def set_subtitles(self, subtitles):
         """Set the SubtitleSet for this version.
 
@@ -1559,20 +1600,7 @@ class SubtitleVersion(models.Model):
           create a SubtitleSet from that.
 
         """
-        # TODO: Fix the language code to use the proper standard.
-        if subtitles == None:
-            subtitles = create_new_subtitles(self.language_code)
-        elif isinstance(subtitles, str) or isinstance(subtitles, unicode):
-            subtitles = SubtitleSet(self.language_code, initial_data=subtitles)
-        elif isinstance(subtitles, SubtitleSet):
-            pass
-        else:
-            try:
-                i = iter(subtitles)
-                subtitles = SubtitleSet.from_list(self.language_code, i)
-            except TypeError:
-                raise TypeError("Cannot create SubtitleSet from type %s"
-                                % str(type(subtitles)))
+        subtitles = make_subtitle_set(self.language_code, subtitles)
 
         self.subtitle_count = len(subtitles)
         self.serialized_subtitles = compress(subtitles.to_xml())
@@ -0,0 +1,268 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""subtitles.parsing -- Parse uploaded subtitle files
+
+Parsing a large upload is CPU-bound work (lxml and the regex-based text
+parsers) and blocks the web worker while it runs.  parse_subtitles() routes
+uploads by size:
+
+    - Small files are parsed inline, since sending them to another process
+      would cost more than parsing them.
+    - Large files are sent to a process pool and need to finish within
+      PARSE_TIMEOUT seconds.  If they don't, we replace the pool to stop the
+      parse and report an error.
+
+parse_subtitles_batch() parses several files at once.  Its large files go to
+the pool together and share one deadline.
+
+SubtitleSets can't be pickled, so the pool sends back the subtitles as DFXP
+and we load that in the calling process.  That's a single lxml parse, which
+is much cheaper than parsing the original text formats.
+
+If the subtitles can't be parsed, we raise ParseError, which lists the
+problems by line number when we can find them: XML syntax errors for DFXP
+and malformed timing lines for SRT/WebVTT.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+import multiprocessing
+import re
+import threading
+import time
+
+import babelsubs
+from babelsubs.storage import SubtitleSet
+
+from utils.subtitles import load_subtitles
+
+# Files larger than this (in bytes/characters) are parsed in the pool
+INLINE_MAX_SIZE = 64 * 1024
+# Max number of seconds to spend parsing a file in the pool
+PARSE_TIMEOUT = 20
+# Number of processes in the pool
+POOL_SIZE = 2
+# Restart pool processes after they parse this many files, to bound their
+# memory use
+POOL_MAX_TASKS = 100
+
+TIMING_LINE_RES = {
+    'srt': re.compile(r'^\d{2}:\d{2}:\d{2}(,\d*)? --> '
+                      r'\d{2}:\d{2}:\d{2}(,\d*)?$'),
+    'vtt': re.compile(r'^(\d{2}:)?\d{2}:\d{2}(.\d*)? --> '
+                      r'(\d{2}:)?\d{2}:\d{2}(.\d*)?([ \t]+.+)?$'),
+}
+
+LineError = namedtuple('LineError', 'line message')
+
+class ParseError(babelsubs.SubtitleParserError):
+    """Uploaded subtitles couldn't be parsed
+
+    Attributes:
+        errors: list of LineError tuples.  line is the 1-based line number,
+            or None for errors that aren't tied to a line.
+    """
+    def __init__(self, errors):
+        super(ParseError, self).__init__(
+            '; '.join(format_error(error) for error in errors))
+        self.errors = errors
+
+def format_error(error):
+    if error.line is None:
+        return error.message
+    else:
+        return 'Line {}: {}'.format(error.line, error.message)
+
+def parse_subtitles(language_code, content, sub_format):
+    """Parse uploaded subtitles
+
+    Args:
+        language_code: language of the subtitles
+        content: subtitle data, in the same form as
+            utils.subtitles.load_subtitles() accepts
+        sub_format: format of the subtitles
+
+    Returns:
+        SubtitleSet
+
+    Raises:
+        ParseError: the subtitles couldn't be parsed
+        TypeError: sub_format isn't a supported format
+    """
+    return parse_subtitles_batch([(language_code, content, sub_format)])[0]
+
+def parse_subtitles_batch(items):
+    """Parse several uploads at once
+
+    Large files are all sent to the pool up front and share a single
+    PARSE_TIMEOUT deadline, which includes the time they spend waiting for a
+    pool process.
+
+    Args:
+        items: list of (language_code, content, sub_format) tuples, like the
+            parse_subtitles() args
+
+    Returns:
+        list of SubtitleSets, in the same order as items
+
+    Raises:
+        ParseError: one of the items couldn't be parsed
+        TypeError: a sub_format isn't a supported format
+    """
+    results = [None] * len(items)
+    pooled = []
+    for i, (language_code, content, sub_format) in enumerate(items):
+        if len(content) <= INLINE_MAX_SIZE:
+            results[i] = _parse(language_code, content, sub_format)
+        else:
+            pooled.append(i)
+    if pooled:
+        subtitle_sets = _parse_in_pool([items[i] for i in pooled])
+        for i, subtitles in zip(pooled, subtitle_sets):
+            results[i] = subtitles
+    return results
+
+def _parse(language_code, content, sub_format):
+    try:
+        return load_subtitles(language_code, content, sub_format)
+    except (babelsubs.SubtitleParserError, ValueError), e:
+        raise ParseError(find_errors(content, sub_format, e))
+
+# The pool is shared by all threads.  When a parse times out, we retire the
+# pool: new parses go to a new pool and the old one is terminated once the
+# other parses running on it are done.  That stops the runaway parse without
+# killing the others.
+_pool = None
+_pool_lock = threading.Lock()
+# Maps pools to the number of _use_pool() blocks using them
+_pool_users = {}
+
+@contextmanager
+def _use_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = multiprocessing.Pool(POOL_SIZE,
+                                         maxtasksperchild=POOL_MAX_TASKS)
+            _pool_users[_pool] = 0
+        pool = _pool
+        _pool_users[pool] += 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            if pool is not _pool and _pool_users[pool] == 0:
+                del _pool_users[pool]
+                pool.terminate()
+
+def _retire_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+def _reset_pool():
+    """Terminate the current pool, for the tests and benchmarks"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if not _pool_users[_pool]:
+                del _pool_users[_pool]
+            _pool.terminate()
+            _pool = None
+
+def _parse_in_pool(items):
+    with _use_pool() as pool:
+        results = [pool.apply_async(_parse_to_dfxp, item) for item in items]
+        deadline = time.time() + PARSE_TIMEOUT
+        outputs = []
+        for result in results:
+            try:
+                outputs.append(result.get(max(deadline - time.time(), 0)))
+            except multiprocessing.TimeoutError:
+                _retire_pool(pool)
+                raise ParseError([LineError(
+                    None, 'Parsing took longer than {} seconds'.format(
+                        PARSE_TIMEOUT))])
+    subtitle_sets = []
+    for (language_code, content, sub_format), (dfxp, errors) in zip(
+            items, outputs):
+        if errors:
+            raise ParseError([LineError(*error) for error in errors])
+        subtitle_sets.append(SubtitleSet(language_code, initial_data=dfxp))
+    return subtitle_sets
+
+def _parse_to_dfxp(language_code, content, sub_format):
+    """Parse subtitles in a pool process
+
+    Returns: (dfxp, errors) tuple.  errors is a list of (line, message)
+        tuples if the subtitles couldn't be parsed.
+    """
+    try:
+        subtitles = _parse(language_code, content, sub_format)
+    except ParseError, e:
+        return None, [tuple(error) for error in e.errors]
+    return subtitles.to_xml(), None
+
+def find_errors(content, sub_format, parse_error):
+    """Find the lines that caused a parse error
+
+    Returns: list of LineError tuples
+    """
+    xml_error = _find_xml_error(parse_error)
+    if xml_error is not None:
+        errors = [LineError(xml_error.lineno,
+                            getattr(xml_error, 'msg', None) or
+                            str(xml_error))]
+    elif sub_format in TIMING_LINE_RES:
+        errors = _check_timing_lines(content, TIMING_LINE_RES[sub_format],
+                                     sub_format == 'srt')
+    else:
+        errors = []
+    if not errors:
+        message = str(getattr(parse_error, 'original_error', None) or
+                      parse_error) or 'Invalid subtitle data'
+        errors = [LineError(None, message)]
+    return errors
+
+def _find_xml_error(parse_error):
+    # DFXPParser passes the lxml/expat error as an arg to
+    # SubtitleParserError, other code uses original_error
+    candidates = [getattr(parse_error, 'original_error', None)]
+    candidates.extend(parse_error.args)
+    for candidate in candidates:
+        if (isinstance(candidate, Exception) and
+                getattr(candidate, 'lineno', None) is not None):
+            return candidate
+    return None
+
+def _check_timing_lines(content, timing_re, check_numbers):
+    if not isinstance(content, unicode):
+        content = content.decode('utf-8', 'replace')
+    lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    errors = []
+    for i, line in enumerate(lines):
+        if '-->' not in line:
+            continue
+        if not timing_re.match(line.strip()):
+            errors.append(LineError(i + 1, 'Invalid timing line'))
+        elif check_numbers and (i == 0 or not lines[i-1].strip().isdigit()):
+            errors.append(LineError(i + 1, 'Missing subtitle number'))
+    return errors
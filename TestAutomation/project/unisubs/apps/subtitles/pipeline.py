@@ -59,11 +59,19 @@ from django.db import transaction
 from videos.models import Video
 from subtitles.models import (
     SubtitleLanguage, SubtitleVersion, ORIGIN_ROLLBACK, ORIGIN_API,
-    ORIGIN_UPLOAD, ORIGIN_WEB_EDITOR
+    ORIGIN_UPLOAD, ORIGIN_WEB_EDITOR, make_subtitle_set
 )
+from subtitles import parsing
 from subtitles import signals
 from subtitles import workflows
-from teams.signals import api_subtitles_edited
+from subtitles.effects import EffectQueue
+
+# Per-language keys for add_subtitles_batch()
+BATCH_ITEM_KEYS = set([
+    'language_code', 'subtitles', 'sub_format', 'title', 'description',
+    'duration', 'metadata', 'parents', 'note', 'visibility',
+    'visibility_override', 'complete', 'action', 'created',
+])
 
 # Utility Functions -----------------------------------------------------------
 def _strip_nones(d):
@@ -279,7 +287,14 @@ def _update_visibility_and_tasks(team_video, version, committer, complete):
     if not team.workflow_enabled:
         return
 
-    workflow = team.get_workflow()
+    from teams.models import WorkflowResolver
+    # Use one resolver for everything below.  Attaching it to the team video
+    # means the permission checks and any tasks we create don't need to look
+    # the workflow up again.
+    resolver = WorkflowResolver.for_team(team)
+    if not hasattr(team_video, '_cached_workflow'):
+        resolver.add_to_team_video(team_video)
+    workflow = resolver.resolve_team()
 
     # We know the workflow uses tasks.  However, the user may be able to bypass
     # the moderation system in some cases.
@@ -314,15 +329,6 @@ def _update_visibility_and_tasks(team_video, version, committer, complete):
             _create_necessary_tasks(version, team_video, workflow, committer,
                                     complete)
 
-def _update_followers(subtitle_language, author):
-    """Update language followers when adding a new version."""
-    if author:
-        subtitle_language.followers.add(author)
-
-def _fork_dependents(subtitle_language):
-    for dsl in subtitle_language.get_dependent_subtitle_languages(direct=True):
-        dsl.fork()
-
 def _get_version(video, v):
     """Get the appropriate SV belonging to the given video.
 
@@ -379,46 +385,98 @@ def _timings_changed(subtitle_language, new_version):
     return new_timings != old_timings
 
 
+def _prepare_subtitles(video, language_code, subtitles, parents):
+    """Do the work for _add_subtitles() that doesn't need the video lock
+
+    Returns: (subtitles, parents) tuple, with the subtitles converted to a
+    SubtitleSet and the parents converted to SubtitleVersions.
+    """
+    return (make_subtitle_set(language_code, subtitles),
+            [_get_version(video, p) for p in (parents or [])])
+
 def _add_subtitles(video, sl, subtitles, title, duration, description, author,
                    visibility, visibility_override, parents,
                    rollback_of_version_number, committer, created, note,
-                   origin, metadata, action):
+                   origin, metadata, action, effects):
     """Add subtitles in the language to the video.  Really.
 
     This function is the meat of the subtitle pipeline.  The user-facing
     add_subtitles is a thin wrappers around this.
+
+    subtitles and parents should already be converted by
+    _prepare_subtitles().  Work that can happen after the transaction is
+    added to effects, which is an EffectQueue.
     """
     with transaction.atomic():
-        # Use select_for_update() to lock the row for our video.  We know
-        # that we're going to do some work, then potentially update the video,
-        # locking at the start prevents deadlocks.
+        _lock_video(video, effects)
+        return _add_version(video, sl, subtitles, title, duration,
+                            description, author, visibility,
+                            visibility_override, parents,
+                            rollback_of_version_number, committer, created,
+                            note, origin, metadata, action, effects)
+
+def _lock_video(video, effects):
+    # Use select_for_update() to lock the row for our video.  We know
+    # that we're going to do some work, then potentially update the video,
+    # locking at the start prevents deadlocks.
+    with effects.time_phase('lock-wait'):
         Video.objects.select_for_update().get(id=video.id)
 
-        data = {'title': title, 'duration': duration, 'description': description, 'author': author,
-                'visibility': visibility, 'visibility_override': visibility_override,
-                'parents': [_get_version(video, p) for p in (parents or [])],
-                'rollback_of_version_number': rollback_of_version_number,
-                'created': created, 'note': note, 'origin': origin,
-                'metadata': metadata}
-        _strip_nones(data)
-        version = sl.add_version(subtitles=subtitles, **data)
-        _perform_team_operations(version, committer, action)
-        if action:
-            action.validate(author, video, sl, version)
-            action.update_language(author, video, sl, version)
-        _update_followers(sl, author)
-        if origin in (ORIGIN_UPLOAD, ORIGIN_API):
-            _fork_dependents(sl)
-        elif origin == ORIGIN_WEB_EDITOR and _timings_changed(sl, version):
-            # fork languages when they are edited in the new editor, since it's
-            # easy to make things out-of-sync from the source language.  Once we
-            # switch over to only using the new editor, we can get rid of the
-            # entire concept of forking.
-            sl.fork()
-            _fork_dependents(sl)
-        return version
-
-def _rollback_to(video, subtitle_language, version_number, rollback_author):
+def _add_version(video, sl, subtitles, title, duration, description, author,
+                 visibility, visibility_override, parents,
+                 rollback_of_version_number, committer, created, note, origin,
+                 metadata, action, effects):
+    """Does the work for _add_subtitles() once the video is locked."""
+    data = {'title': title, 'duration': duration, 'description': description, 'author': author,
+            'visibility': visibility, 'visibility_override': visibility_override,
+            'parents': parents,
+            'rollback_of_version_number': rollback_of_version_number,
+            'created': created, 'note': note, 'origin': origin,
+            'metadata': metadata}
+    _strip_nones(data)
+    version = sl.add_version(subtitles=subtitles, **data)
+    _perform_team_operations(version, committer, action)
+    if action:
+        action.validate(author, video, sl, version)
+        action.update_language(author, video, sl, version)
+    if author:
+        effects.defer('update-followers', language_id=sl.id,
+                      user_id=author.id)
+    if origin in (ORIGIN_UPLOAD, ORIGIN_API):
+        effects.defer('fork-dependents', language_id=sl.id)
+    elif origin == ORIGIN_WEB_EDITOR and _timings_changed(sl, version):
+        # fork languages when they are edited in the new editor, since it's
+        # easy to make things out-of-sync from the source language.  Once we
+        # switch over to only using the new editor, we can get rid of the
+        # entire concept of forking.
+        sl.fork()
+        effects.defer('fork-dependents', language_id=sl.id)
+    return version
+
+def _parse_batch(items):
+    """Parse the subtitles for add_subtitles_batch()
+
+    Items with a sub_format go through parsing.parse_subtitles_batch(), like
+    uploads do, so large files are parsed in the process pool with one
+    deadline for the whole batch.
+    """
+    to_parse = [i for i, item in enumerate(items) if item.get('sub_format')]
+    parsed = parsing.parse_subtitles_batch([
+        (items[i]['language_code'], items[i]['subtitles'],
+         items[i]['sub_format'])
+        for i in to_parse
+    ])
+    subtitle_sets = [
+        None if item.get('sub_format') else
+        make_subtitle_set(item['language_code'], item['subtitles'])
+        for item in items
+    ]
+    for i, subtitles in zip(to_parse, parsed):
+        subtitle_sets[i] = subtitles
+    return subtitle_sets
+
+def _rollback_to(video, subtitle_language, version_number, rollback_author,
+                 effects):
     current = subtitle_language.get_tip(full=True)
     target = subtitle_language.subtitleversion_set.full().get(version_number=version_number)
 
@@ -427,6 +485,7 @@ def _rollback_to(video, subtitle_language, version_number, rollback_author):
         'video': target.video,
         'sl': subtitle_language,
         'subtitles': target.get_subtitles(),
+        'effects': effects,
         'title': target.title,
         'duration': target.duration,
         'description': target.description,
@@ -450,7 +509,7 @@ def _rollback_to(video, subtitle_language, version_number, rollback_author):
     data['author'] = rollback_author
 
     # The new version is always simply a child of the current tip.
-    data['parents'] = None
+    data['parents'] = []
 
     # Finally, rollback versions have a special attribute to track them.
     data['rollback_of_version_number'] = version_number
@@ -461,9 +520,9 @@ def _rollback_to(video, subtitle_language, version_number, rollback_author):
     # fork the dependent translations.  For now.  Once the new UI is in place
     # this horrible "forking" crap is going away entirely.
     if current.subtitle_count != target.subtitle_count:
-        _fork_dependents(version.subtitle_language)
+        effects.defer('fork-dependents', language_id=subtitle_language.id)
 
-    api_subtitles_edited.send(version)
+    effects.defer('api-subtitles-edited', version_id=version.id)
 
     return version
 
@@ -523,6 +582,10 @@ def add_subtitles(video, language_code, subtitles,
     Created should be a datetime that will set the "created" date for the
     resulting version.  If not given it will default to today.
 
+    Only adding the version happens while the video row is locked.  Parsing
+    the subtitles happens before that and the other side effects happen
+    after the transaction commits (see subtitles.effects).
+
     """
     # complete and action do similar things.  In _add_subtitles _add_subtitles
     # we only want to deal with action, not complete.  this 
@@ -531,21 +594,117 @@ def add_subtitles(video, language_code, subtitles,
                                             complete, action)
     if action:
         visibility = action.subtitle_visibility
-    with transaction.atomic():
-        subtitle_language = _get_language(video, language_code)
-        subtitle_language.freeze()
-        version = _add_subtitles(video, subtitle_language, subtitles, title,
-                                 duration, description, author, visibility,
-                                 visibility_override, parents, None, committer,
-                                 created, note, origin, metadata, action)
-    video.cache.invalidate()
-    api_subtitles_edited.send(version)
+    effects = EffectQueue()
+    with effects.time_phase('prepare'):
+        subtitles, parents = _prepare_subtitles(video, language_code,
+                                                subtitles, parents)
+    with effects.time_phase('transaction'):
+        with transaction.atomic():
+            subtitle_language = _get_language(video, language_code)
+            subtitle_language.freeze()
+            version = _add_subtitles(video, subtitle_language, subtitles,
+                                     title, duration, description, author,
+                                     visibility, visibility_override, parents,
+                                     None, committer, created, note, origin,
+                                     metadata, action, effects)
+    effects.add_inline(video.cache.invalidate)
     if action:
-        action.perform(author, video, version.subtitle_language, version)
-    subtitle_language.thaw()
+        effects.add_inline(action.perform, author, video,
+                           version.subtitle_language, version)
+    effects.add_inline(subtitle_language.thaw)
+    effects.defer('api-subtitles-edited', version_id=version.id)
+    effects.run_on_commit()
 
     return version
 
+def add_subtitles_batch(video, items, author=None, committer=None,
+                        origin=None):
+    """Add subtitles in several languages to the video at once.
+
+    This works like calling add_subtitles() for each language, except:
+
+      - The subtitles for all languages are parsed up front, before we lock
+        the video.
+      - All versions are added in a single transaction, which locks the
+        video once.  If one language fails, none of them are added.
+      - video.cache is invalidated once and the deferred effects for all
+        versions run in a single job.
+      - subtitles_imported is sent once with all new versions.  The
+        per-language signals are still sent for each language.
+
+    items is a list of dicts, one for each language.  Each dict must have
+    the language_code and subtitles keys.  If it has a sub_format key,
+    subtitles should be a string in that format, otherwise it's handled like
+    the subtitles param to add_subtitles().  They can also have any of these
+    add_subtitles() params: title, description, duration, metadata, parents,
+    note, visibility, visibility_override, complete, action and created.
+
+    author, committer and origin work like add_subtitles() and are used for
+    all languages.
+
+    Returns a list of SubtitleVersions, in the same order as items.
+
+    Raises parsing.ParseError if the subtitles for an item with a sub_format
+    can't be parsed.
+    """
+    if not items:
+        return []
+    for item in items:
+        unknown_keys = set(item.keys()) - BATCH_ITEM_KEYS
+        if unknown_keys:
+            raise ValueError("Unknown keys: {}".format(
+                ', '.join(sorted(unknown_keys))))
+    language_codes = [item['language_code'] for item in items]
+    if len(set(language_codes)) != len(language_codes):
+        raise ValueError("Duplicate language codes")
+
+    effects = EffectQueue()
+    with effects.time_phase('prepare'):
+        actions = [
+            _calc_action_for_add_subtitles(
+                video, item['language_code'], author, item.get('complete'),
+                item.get('action'))
+            for item in items
+        ]
+        subtitle_sets = _parse_batch(items)
+        parent_lists = [[_get_version(video, p)
+                         for p in (item.get('parents') or [])]
+                        for item in items]
+    versions = []
+    with effects.time_phase('transaction'):
+        with transaction.atomic():
+            _lock_video(video, effects)
+            for item, action, subtitles, parents in zip(
+                    items, actions, subtitle_sets, parent_lists):
+                if action:
+                    visibility = action.subtitle_visibility
+                else:
+                    visibility = item.get('visibility')
+                subtitle_language = _get_language(video,
+                                                  item['language_code'])
+                subtitle_language.freeze()
+                versions.append(_add_version(
+                    video, subtitle_language, subtitles, item.get('title'),
+                    item.get('duration'), item.get('description'), author,
+                    visibility, item.get('visibility_override'), parents,
+                    None, committer, item.get('created'), item.get('note'),
+                    origin, item.get('metadata'), action, effects))
+    effects.add_inline(video.cache.invalidate)
+    for action, version in zip(actions, versions):
+        if action:
+            effects.add_inline(action.perform, author, video,
+                               version.subtitle_language, version)
+    for version in versions:
+        effects.add_inline(version.subtitle_language.thaw)
+    effects.add_inline(signals.subtitles_imported.send,
+                       sender=versions[0].subtitle_language,
+                       versions=versions)
+    for version in versions:
+        effects.defer('api-subtitles-edited', version_id=version.id)
+    effects.run_on_commit()
+
+    return versions
+
 def _calc_action_for_add_subtitles(video, language_code, author, complete,
                                    action_name):
     # complete and action do similar things.  In _add_subtitles _add_subtitles
@@ -583,10 +742,13 @@ def rollback_to(video, language_code, version_number,
     subtitle_language = SubtitleLanguage.objects.get(video=video,
                                                      language_code=language_code)
     subtitle_language.freeze()
-    with transaction.atomic():
-        version = _rollback_to(video, subtitle_language, version_number,
-                               rollback_author)
-    video.cache.invalidate()
-    subtitle_language.thaw()
+    effects = EffectQueue()
+    with effects.time_phase('transaction'):
+        with transaction.atomic():
+            version = _rollback_to(video, subtitle_language, version_number,
+                                   rollback_author, effects)
+    effects.add_inline(video.cache.invalidate)
+    effects.add_inline(subtitle_language.thaw)
+    effects.run_on_commit()
     return version
 
@@ -29,6 +29,8 @@ subtitles_imported = dispatch.Signal(providing_args=['versions'])
 #   - Note that this signal may can multiple times for a single
 #     SubtitleLanguage
 subtitles_completed = dispatch.Signal()
+# Called when a SubtitleLanguage goes from complete to incomplete
+subtitles_incomplete = dispatch.Signal()
 # Called when we have a new public/complete version
 subtitles_published = dispatch.Signal(providing_args=['version'])
 subtitle_language_changed = dispatch.Signal(providing_args=['old_language'])
@@ -23,9 +23,13 @@ import json
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.urls import reverse
+from nose.tools import *
+import babelsubs
+import mock
 
 from auth.models import CustomUser
 from subtitles import pipeline
+from subtitles.models import SubtitleVersion
 from subtitles.tests.utils import (
     make_video
 )
@@ -101,6 +105,57 @@ class EditorViewTest(TestCase):
         # no translation to be showed
         pass
 
+class EditorDataTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.login(username=self.user.username, password='password')
+        self.video = VideoFactory(primary_audio_language_code='en')
+        for i in range(3):
+            pipeline.add_subtitles(self.video, 'en', SubtitleSetFactory())
+        pipeline.add_subtitles(self.video, 'en', SubtitleSetFactory(),
+                               visibility='private')
+        for i in range(2):
+            pipeline.add_subtitles(self.video, 'fr', SubtitleSetFactory())
+
+    def get_editor(self, language_code):
+        url = reverse("subtitles:subtitle-editor",
+                      args=(self.video.video_id, language_code))
+        return self.client.get(url)
+
+    def get_languages_data(self, language_code):
+        response = self.get_editor(language_code)
+        data = json.loads(response.context['editor_data'])
+        return dict((l['language_code'], l) for l in data['languages'])
+
+    def test_versions(self):
+        languages = self.get_languages_data('fr')
+        # The private en version isn't visible to our user
+        assert_equal([(v['version_no'], v['visibility'], 'subtitles' in v)
+                      for v in languages['en']['versions']],
+                     [(1, 'public', False),
+                      (2, 'public', False),
+                      (3, 'public', True)])
+        assert_equal([(v['version_no'], 'subtitles' in v)
+                      for v in languages['fr']['versions']],
+                     [(1, False), (2, True)])
+        assert_equal(languages['en']['numVersions'], 4)
+
+    def test_query_count_fixed(self):
+        with self.settings(DEBUG=True):
+            # Load the editor twice each time, so that the caches are
+            # populated for the request we check
+            self.get_editor('fr')
+            response = self.get_editor('fr')
+            query_count = response['X-Query-Count']
+            assert_true(int(response['X-Editor-Data-Size']) > 0)
+            for language_code in ('de', 'es', 'it'):
+                for i in range(3):
+                    pipeline.add_subtitles(self.video, language_code,
+                                           SubtitleSetFactory())
+            self.get_editor('fr')
+            response = self.get_editor('fr')
+            assert_equal(response['X-Query-Count'], query_count)
+
 class NotLoggedInEditor(TestCase):
     def setUp(self):
         team = TeamFactory(slug="private-team", name="Private Team")
@@ -136,3 +191,57 @@ class NotLoggedInEditor(TestCase):
         self.assertEqual(response.status_code, 403)
         response = self.client.get(url, HTTP_X_API_USERNAME=self.user.username, HTTP_X_APIKEY=self.user.get_api_key())
         self.assertEqual(response.status_code, 200)
+
+class DownloadTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.version = pipeline.add_subtitles(
+            self.video, 'en', SubtitleSetFactory(num_subs=10))
+
+    def download(self, format):
+        url = reverse('subtitles:download', args=(
+            self.video.video_id, 'en', self.version.version_number, 'subs',
+            format))
+        response = self.client.get(url)
+        assert_equal(response.status_code, 200)
+        assert_true(response.streaming)
+        return ''.join(response.streaming_content)
+
+    def check_download(self, format):
+        subtitles = SubtitleVersion.objects.get(
+            pk=self.version.pk).get_subtitles()
+        assert_equal(self.download(format).decode('utf-8'),
+                     babelsubs.to(subtitles, format, language='en'))
+
+    def test_dfxp(self):
+        self.check_download('dfxp')
+
+    def test_srt(self):
+        self.check_download('srt')
+
+    def test_vtt(self):
+        self.check_download('vtt')
+
+    def test_dfxp_skips_parsing(self):
+        with mock.patch.object(SubtitleVersion, 'get_subtitles') as mock_get:
+            self.download('dfxp')
+        assert_equal(mock_get.call_count, 0)
+
+class DownloadAllTest(TestCase):
+    def test_download_all(self):
+        video = VideoFactory(primary_audio_language_code='en')
+        pipeline.add_subtitles(video, 'en', SubtitleSetFactory())
+        pipeline.add_subtitles(video, 'fr', SubtitleSetFactory())
+        url = reverse('subtitles:download_all', args=(video.video_id,
+                                                      'subtitles'))
+        response = self.client.get(url)
+        assert_equal(response.status_code, 200)
+        assert_true(response.streaming)
+        assert_equal(''.join(response.streaming_content),
+                     video.get_merged_dfxp())
+
+    def test_no_public_subtitles(self):
+        video = VideoFactory()
+        url = reverse('subtitles:download_all', args=(video.video_id,
+                                                      'subtitles'))
+        assert_equal(self.client.get(url).status_code, 404)
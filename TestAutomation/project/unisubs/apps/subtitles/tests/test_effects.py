@@ -0,0 +1,165 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from nose.tools import *
+import mock
+
+from subtitles import effects
+from subtitles import pipeline
+from subtitles.models import ORIGIN_UPLOAD
+from utils.factories import *
+from utils.test_utils import monkeypatch
+
+class EffectQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(effects.EFFECTS, {
+            'test-effect': lambda **kwargs: self.calls.append(
+                ('deferred', kwargs)),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record_inline(self, value):
+        self.calls.append(('inline', value))
+
+    def test_order(self):
+        queue = effects.EffectQueue()
+        queue.defer('test-effect', id=1)
+        queue.add_inline(self.record_inline, 1)
+        queue.defer('test-effect', id=2)
+        queue.add_inline(self.record_inline, 2)
+        queue.run()
+        assert_equal(self.calls, [
+            ('inline', 1),
+            ('inline', 2),
+            ('deferred', {'id': 1}),
+            ('deferred', {'id': 2}),
+        ])
+
+    def test_coalesce_deferred(self):
+        queue = effects.EffectQueue()
+        queue.defer('test-effect', id=1)
+        queue.defer('test-effect', id=1)
+        queue.run()
+        assert_equal(self.calls, [('deferred', {'id': 1})])
+
+    def test_single_job(self):
+        queue = effects.EffectQueue()
+        queue.defer('test-effect', id=1)
+        queue.defer('test-effect', id=2)
+        with mock.patch.object(effects.run_deferred_effects, 'delay') as delay:
+            queue.run()
+        assert_equal(delay.call_args, mock.call([
+            ('test-effect', {'id': 1}),
+            ('test-effect', {'id': 2}),
+        ]))
+
+    def test_unknown_effect(self):
+        with assert_raises(ValueError):
+            effects.EffectQueue().defer('unknown-effect')
+
+    def test_failed_effect_doesnt_stop_others(self):
+        def fail(**kwargs):
+            raise ValueError()
+        with mock.patch.dict(effects.EFFECTS, {'fail': fail}):
+            effects.run_deferred_effects([('fail', {}),
+                                          ('test-effect', {'id': 1})])
+        assert_equal(self.calls, [('deferred', {'id': 1})])
+
+class PipelineEffectsTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.user = UserFactory()
+        patcher = mock.patch.object(effects.run_deferred_effects, 'delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_deferred_effects(self):
+        version = pipeline.add_subtitles(self.video, 'en',
+                                         SubtitleSetFactory(num_subs=2),
+                                         author=self.user,
+                                         origin=ORIGIN_UPLOAD)
+        language = version.subtitle_language
+        assert_equal(self.delay.call_args, mock.call([
+            ('update-followers', {'language_id': language.id,
+                                  'user_id': self.user.id}),
+            ('fork-dependents', {'language_id': language.id}),
+            ('api-subtitles-edited', {'version_id': version.id}),
+        ]))
+        # The effects haven't run yet
+        assert_false(language.followers.filter(id=self.user.id).exists())
+
+    def test_run_deferred_effects(self):
+        version = pipeline.add_subtitles(self.video, 'en',
+                                         SubtitleSetFactory(num_subs=2),
+                                         author=self.user)
+        effects.run_deferred_effects(*self.delay.call_args[0])
+        assert_true(version.subtitle_language.followers
+                    .filter(id=self.user.id).exists())
+
+    def test_effects_are_idempotent(self):
+        source = pipeline.add_subtitles(self.video, 'en',
+                                        SubtitleSetFactory(num_subs=2))
+        translation = pipeline.add_subtitles(self.video, 'fr',
+                                             SubtitleSetFactory(num_subs=2),
+                                             parents=[source])
+        pipeline.add_subtitles(self.video, 'en',
+                               SubtitleSetFactory(num_subs=3),
+                               author=self.user, origin=ORIGIN_UPLOAD)
+        deferred = self.delay.call_args[0][0]
+        effects.run_deferred_effects(deferred)
+        effects.run_deferred_effects(deferred)
+        language = translation.subtitle_language
+        language.refresh_from_db()
+        assert_true(language.is_forked)
+        assert_equal(language.followers.count(), 0)
+        assert_equal(source.subtitle_language.followers.count(), 1)
+
+    def test_timings(self):
+        with mock.patch('subtitles.effects.requestdata') as requestdata:
+            pipeline.add_subtitles(self.video, 'en',
+                                   SubtitleSetFactory(num_subs=2))
+        assert_equal(
+            [c[0][0] for c in requestdata.log.call_args_list],
+            ['pipeline-prepare', 'pipeline-lock-wait', 'pipeline-transaction',
+             'pipeline-effects'])
+
+class PipelineEffectsCommitTest(TransactionTestCase):
+    def setUp(self):
+        monkeypatch.effects_on_commit.run_original_for_test()
+        self.video = VideoFactory()
+        patcher = mock.patch.object(effects.run_deferred_effects, 'delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_effects_wait_for_outer_transaction(self):
+        with transaction.atomic():
+            version = pipeline.add_subtitles(self.video, 'en',
+                                             SubtitleSetFactory(num_subs=2))
+            assert_false(self.delay.called)
+        assert_equal(self.delay.call_args, mock.call([
+            ('api-subtitles-edited', {'version_id': version.id}),
+        ]))
+
+    def test_effects_run_immediately_without_transaction(self):
+        pipeline.add_subtitles(self.video, 'en',
+                               SubtitleSetFactory(num_subs=2))
+        assert_true(self.delay.called)
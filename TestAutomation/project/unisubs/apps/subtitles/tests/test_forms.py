@@ -87,3 +87,16 @@ class SubtitleUploadFormTest(TestCase):
         # when outputting it, we're getting the same thing back
         self.assertIn(expected_text, generated)
 
+    def test_parse_errors(self):
+        form = SubtitlesUploadForm(
+            self.user,
+            self.video,
+            True,
+            data = {
+                'language_code': 'en',
+            },
+            files={'draft': SimpleUploadedFile(
+                'subs.srt', "1\n00:00:0x,000 --> 00:00:02,000\nHello\n")}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['draft'], ['Line 2: Invalid timing line'])
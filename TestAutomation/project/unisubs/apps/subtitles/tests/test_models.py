@@ -26,6 +26,7 @@ from django.db import transaction, IntegrityError
 from django.test import TestCase
 from nose.tools import *
 
+import babelsubs
 from babelsubs.storage import SubtitleSet
 
 from auth.models import CustomUser as User
@@ -2075,6 +2076,35 @@ class TestBulkHasPublicVersion(TestCase):
             assert_true(languages[0].has_public_version())
             assert_false(languages[1].has_public_version())
 
+class IterStoredDFXPTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        version = pipeline.add_subtitles(self.video, 'en',
+                                         SubtitleSetFactory(num_subs=10))
+        self.version_pk = version.pk
+
+    def reload_version(self):
+        return SubtitleVersion.objects.get(pk=self.version_pk)
+
+    def test_stream_stored_dfxp(self):
+        chunks = self.reload_version().iter_stored_dfxp()
+        assert_not_equal(chunks, None)
+        expected = babelsubs.to(self.reload_version().get_subtitles(),
+                                'dfxp', language='en')
+        assert_equal(''.join(chunks), expected)
+
+    def test_subtitles_loaded(self):
+        # If the subtitles are loaded, they may have changed so we can't use
+        # the stored DFXP
+        version = self.reload_version()
+        version.get_subtitles()
+        assert_equal(version.iter_stored_dfxp(), None)
+
+    def test_wrong_language_code(self):
+        SubtitleVersion.objects.filter(pk=self.version_pk).update(
+            language_code='fr')
+        assert_equal(self.reload_version().iter_stored_dfxp(), None)
+
 class TestTeamInteractions(TestCase):
     def setUp(self):
         self.user1 = UserFactory()
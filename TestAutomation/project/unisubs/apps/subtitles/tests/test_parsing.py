@@ -0,0 +1,163 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import multiprocessing
+import threading
+import time
+
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from subtitles import parsing
+
+SRT = u"""\
+1
+00:00:01,000 --> 00:00:02,000
+Hello
+
+2
+00:00:03,000 --> 00:00:04,000
+World
+"""
+
+def slow_parse_to_dfxp(language_code, content, sub_format):
+    # Used in the pool processes.  The first line of content is the number
+    # of seconds to sleep.
+    delay, content = content.split('\n', 1)
+    time.sleep(float(delay))
+    return parsing._parse(language_code, content, sub_format).to_xml(), None
+
+class ParseSubtitlesTest(TestCase):
+    def setUp(self):
+        self.addCleanup(parsing._reset_pool)
+
+    def check_subtitles(self, subtitles):
+        assert_equal([(s.start_time, s.end_time, s.text)
+                      for s in subtitles.subtitle_items()],
+                     [(1000, 2000, 'Hello'), (3000, 4000, 'World')])
+
+    def test_parse_inline(self):
+        with mock.patch('subtitles.parsing._parse_in_pool') as parse_in_pool:
+            subtitles = parsing.parse_subtitles('en', SRT, 'srt')
+        assert_false(parse_in_pool.called)
+        self.check_subtitles(subtitles)
+
+    @mock.patch('subtitles.parsing.INLINE_MAX_SIZE', 5)
+    def test_parse_in_pool(self):
+        self.check_subtitles(parsing.parse_subtitles('en', SRT, 'srt'))
+
+    @mock.patch('subtitles.parsing.INLINE_MAX_SIZE', 5)
+    def test_errors_from_pool(self):
+        with assert_raises(parsing.ParseError) as cm:
+            parsing.parse_subtitles('en', '<tt><body>', 'dfxp')
+        assert_equal(len(cm.exception.errors), 1)
+        assert_not_equal(cm.exception.errors[0].line, None)
+
+    @mock.patch('subtitles.parsing.INLINE_MAX_SIZE', 5)
+    def test_timeout(self):
+        pool = mock.Mock()
+        pool.apply_async.return_value.get.side_effect = (
+            multiprocessing.TimeoutError())
+        with mock.patch('subtitles.parsing.multiprocessing.Pool',
+                        return_value=pool):
+            with assert_raises(parsing.ParseError) as cm:
+                parsing.parse_subtitles('en', SRT, 'srt')
+        timeout = pool.apply_async.return_value.get.call_args[0][0]
+        assert_true(0 < timeout <= parsing.PARSE_TIMEOUT)
+        assert_equal(cm.exception.errors[0].line, None)
+        # The pool should be terminated to stop the parse
+        assert_true(pool.terminate.called)
+        assert_equal(parsing._pool, None)
+
+    @mock.patch('subtitles.parsing.INLINE_MAX_SIZE', 5)
+    @mock.patch('subtitles.parsing.PARSE_TIMEOUT', 2)
+    @mock.patch('subtitles.parsing._parse_to_dfxp', slow_parse_to_dfxp)
+    def test_timeout_doesnt_stop_other_parses(self):
+        outcomes = {}
+        def parse(name, delay):
+            try:
+                outcomes[name] = parsing.parse_subtitles(
+                    'en', '{}\n{}'.format(delay, SRT), 'srt')
+            except parsing.ParseError, e:
+                outcomes[name] = e
+        slow = threading.Thread(target=parse, args=('slow', 30))
+        slow.start()
+        # Start the other parse so that it's still running when the slow one
+        # times out, but finishes within its own deadline
+        time.sleep(1)
+        parse('fast', 1.5)
+        slow.join()
+        assert_true(isinstance(outcomes['slow'], parsing.ParseError))
+        self.check_subtitles(outcomes['fast'])
+        # The slow parse's pool should be terminated once the fast parse was
+        # done with it
+        assert_equal(parsing._pool, None)
+        assert_equal(parsing._pool_users, {})
+
+    @mock.patch('subtitles.parsing.INLINE_MAX_SIZE', len(SRT))
+    def test_batch(self):
+        with mock.patch('subtitles.parsing._parse',
+                        wraps=parsing._parse) as parse:
+            results = parsing.parse_subtitles_batch([
+                ('en', SRT + '\n' * 10, 'srt'),
+                ('fr', SRT, 'srt'),
+            ])
+        for subtitles in results:
+            self.check_subtitles(subtitles)
+        assert_equal([s.language_code for s in results], ['en', 'fr'])
+        # Only the small file should be parsed inline
+        assert_equal(parse.call_args_list, [mock.call('fr', SRT, 'srt')])
+
+    def test_srt_timing_errors(self):
+        srt = SRT.replace('00:00:01,000', '00:00:0x,000')
+        srt = srt.replace('2\n00:00:03', '00:00:03')
+        srt = srt.replace('00:00:03,000 -->', '00:00:03,000 -> ')
+        with assert_raises(parsing.ParseError) as cm:
+            parsing.parse_subtitles('en', srt, 'srt')
+        assert_equal(cm.exception.errors, [
+            parsing.LineError(2, 'Invalid timing line'),
+        ])
+
+    def test_missing_number(self):
+        with assert_raises(parsing.ParseError) as cm:
+            parsing.parse_subtitles(
+                'en', '00:00:01,000 --> 00:00:02,000\nHello\n', 'srt')
+        assert_equal(cm.exception.errors, [
+            parsing.LineError(1, 'Missing subtitle number'),
+        ])
+
+    def test_xml_errors(self):
+        dfxp = ('<tt xmlns="http://www.w3.org/ns/ttml">\n'
+                '<body>\n'
+                '<div>\n'
+                '</body>\n')
+        with assert_raises(parsing.ParseError) as cm:
+            parsing.parse_subtitles('en', dfxp, 'dfxp')
+        assert_equal(len(cm.exception.errors), 1)
+        assert_equal(cm.exception.errors[0].line, 4)
+
+    def test_error_without_line(self):
+        with assert_raises(parsing.ParseError) as cm:
+            parsing.parse_subtitles('en', 'no subtitles here', 'srt')
+        assert_equal(len(cm.exception.errors), 1)
+        assert_equal(cm.exception.errors[0].line, None)
+
+    def test_unknown_format(self):
+        with assert_raises(TypeError):
+            parsing.parse_subtitles('en', SRT, 'unknown-format')
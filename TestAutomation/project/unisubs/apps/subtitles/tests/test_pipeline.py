@@ -24,11 +24,13 @@ from __future__ import absolute_import
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from nose.tools import *
+import mock
 
 from babelsubs.storage import SubtitleSet, SubtitleLine
 
 from auth.models import CustomUser as User
 from subtitles import pipeline
+from subtitles import signals
 from subtitles.models import SubtitleLanguage, SubtitleVersion
 from subtitles.tests.utils import make_video, make_video_2
 from subtitles.tests.test_workflows import MockAction
@@ -634,6 +636,84 @@ class TestBasicAdding(TestCase):
                                              complete=False, author=user,
                                              action='action')
 
+class TestAddSubtitlesBatch(TestCase):
+    def setUp(self):
+        self.video = make_video()
+        self.user = UserFactory()
+
+    def make_items(self, *language_codes):
+        return [
+            {
+                'language_code': language_code,
+                'subtitles': SubtitleSetFactory(num_subs=2),
+            }
+            for language_code in language_codes
+        ]
+
+    def test_add(self):
+        items = self.make_items('en', 'fr')
+        items.append({
+            'language_code': 'de',
+            'subtitles': '1\n00:00:01,000 --> 00:00:02,000\nHallo\n',
+            'sub_format': 'srt',
+            'title': 'Titel',
+        })
+        versions = pipeline.add_subtitles_batch(self.video, items,
+                                                author=self.user)
+        assert_equal([(v.language_code, v.version_number) for v in versions],
+                     [('en', 1), ('fr', 1), ('de', 1)])
+        assert_equal(versions[0].get_subtitles().to_xml(),
+                     items[0]['subtitles'].to_xml())
+        assert_equal([s.text for s in versions[2].get_subtitles()],
+                     ['Hallo'])
+        assert_equal(versions[2].title, 'Titel')
+        assert_true(all(v.author == self.user for v in versions))
+
+    def test_all_or_nothing(self):
+        with mock.patch('subtitles.pipeline._perform_team_operations',
+                        side_effect=[None, ValueError()]):
+            with assert_raises(ValueError):
+                pipeline.add_subtitles_batch(self.video,
+                                             self.make_items('en', 'fr'))
+        assert_equal(SubtitleVersion.objects.filter(video=self.video).count(),
+                     0)
+
+    def test_parse_error_before_transaction(self):
+        items = self.make_items('en')
+        items.append({
+            'language_code': 'fr',
+            'subtitles': 'not subtitles',
+            'sub_format': 'dfxp',
+        })
+        with assert_raises(Exception):
+            pipeline.add_subtitles_batch(self.video, items)
+        assert_equal(SubtitleLanguage.objects.filter(video=self.video).count(),
+                     0)
+
+    def test_single_cache_invalidation(self):
+        with mock.patch.object(self.video.cache, 'invalidate') as invalidate:
+            pipeline.add_subtitles_batch(self.video,
+                                         self.make_items('en', 'fr', 'de'))
+        assert_equal(invalidate.call_count, 1)
+
+    def test_subtitles_imported_signal(self):
+        with test_utils.mock_handler(signals.subtitles_imported) as handler:
+            versions = pipeline.add_subtitles_batch(
+                self.video, self.make_items('en', 'fr'))
+        assert_equal(handler.call_count, 1)
+        assert_equal(handler.call_args[1]['versions'], versions)
+
+    def test_duplicate_language_codes(self):
+        with assert_raises(ValueError):
+            pipeline.add_subtitles_batch(self.video,
+                                         self.make_items('en', 'en'))
+
+    def test_unknown_keys(self):
+        items = self.make_items('en')
+        items[0]['unknown'] = 'value'
+        with assert_raises(ValueError):
+            pipeline.add_subtitles_batch(self.video, items)
+
 class TestRollbacks(TestCase):
     def setUp(self):
         self.video = make_video()
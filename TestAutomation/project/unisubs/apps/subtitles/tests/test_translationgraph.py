@@ -0,0 +1,99 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.cache import cache
+from django.test import TestCase
+from nose.tools import *
+
+from subtitles import pipeline
+from subtitles.models import SubtitleLanguage, ORIGIN_UPLOAD
+from subtitles.translationgraph import TranslationGraph
+from utils.factories import *
+
+class TranslationGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.video = VideoFactory(primary_audio_language_code='en')
+        # en -> fr -> de, and es translated from en
+        self.en = self.add_subtitles('en')
+        self.fr = self.add_subtitles('fr', parents=[self.en])
+        self.de = self.add_subtitles('de', parents=[self.fr])
+        self.es = self.add_subtitles('es', parents=[self.en])
+
+    def add_subtitles(self, language_code, parents=None, **kwargs):
+        parent_versions = [l.get_tip(full=True) for l in (parents or [])]
+        version = pipeline.add_subtitles(self.video, language_code,
+                                         SubtitleSetFactory(num_subs=2),
+                                         parents=parent_versions, **kwargs)
+        return version.subtitle_language
+
+    def reload(self, language):
+        return SubtitleLanguage.objects.get(id=language.id)
+
+    def test_build(self):
+        graph = TranslationGraph.build(self.video.id)
+        assert_equal(graph.source_language_code(self.en.id), None)
+        assert_equal(graph.source_language_code(self.fr.id), 'en')
+        assert_equal(graph.source_language_code(self.de.id), 'fr')
+        assert_equal(graph.source_language_code(self.es.id), 'en')
+        assert_equal(graph.source_version_id(self.fr.id),
+                     self.en.get_tip(full=True).id)
+        assert_equal(graph.dependents(self.en.id),
+                     [self.fr.id, self.de.id, self.es.id])
+        assert_equal(graph.dependents(self.en.id, direct=True),
+                     [self.fr.id, self.es.id])
+        assert_equal(graph.dependents(self.fr.id), [self.de.id])
+        assert_equal(graph.dependents(self.de.id), [])
+
+    def test_language_methods(self):
+        en = self.reload(self.en)
+        de = self.reload(self.de)
+        assert_equal(en.get_dependent_subtitle_languages(),
+                     [self.fr, self.de, self.es])
+        assert_equal(en.get_dependent_subtitle_languages(direct=True),
+                     [self.fr, self.es])
+        assert_equal(de.get_translation_source_language_code(), 'fr')
+        assert_equal(de.get_translation_source_version(),
+                     self.fr.get_tip(full=True))
+
+    def test_cached(self):
+        TranslationGraph.for_video(self.video.id)
+        en = self.reload(self.en)
+        fr = self.reload(self.fr)
+        with self.assertNumQueries(0):
+            assert_equal(fr.get_translation_source_language_code(), 'en')
+            assert_equal(TranslationGraph.for_video(self.video.id)
+                         .dependents(en.id), [self.fr.id, self.de.id,
+                                              self.es.id])
+
+    def test_add_version_invalidates(self):
+        TranslationGraph.for_video(self.video.id)
+        pt = self.add_subtitles('pt', parents=[self.fr])
+        graph = TranslationGraph.for_video(self.video.id)
+        assert_equal(graph.source_language_code(pt.id), 'fr')
+        assert_equal(graph.dependents(self.fr.id), [self.de.id, pt.id])
+
+    def test_fork_invalidates(self):
+        TranslationGraph.for_video(self.video.id)
+        # Uploading subtitles to fr forks its dependents
+        self.add_subtitles('fr', origin=ORIGIN_UPLOAD)
+        assert_true(self.reload(self.de).is_forked)
+        assert_equal(TranslationGraph.for_video(self.video.id)
+                     .dependents(self.fr.id), [])
+        assert_equal(self.reload(self.de).get_translation_source_language_code(),
+                     None)
@@ -0,0 +1,167 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""subtitles.translationgraph -- Track which languages are translations
+
+A TranslationGraph stores the translation relationships between the
+subtitle languages of a video:
+
+    - The source of each language: the most recent parent version from
+      another language
+    - The dependents of each language: non-forked languages with a tip
+      version that has the language in its lineage
+
+The graph is built with 3 queries and stored in the video CacheGroup.  Any
+change to a video's languages or versions invalidates the CacheGroup, which
+includes forking a language and the pipeline adding versions.
+"""
+
+from __future__ import absolute_import
+
+from django.db.models import F
+
+CACHE_KEY = 'translation-graph'
+
+class TranslationGraph(object):
+    """Translation relationships for a video's languages
+
+    Attributes:
+        languages: dict mapping language ids to _LanguageNode objects
+    """
+    def __init__(self, languages):
+        self.languages = languages
+
+    @classmethod
+    def for_video(cls, video_id):
+        """Get the graph for a video, using the cache if possible."""
+        from videos.models import Video
+        # Use a fresh CacheGroup.  The video instance may have one that
+        # hasn't seen an invalidation from earlier in the request.
+        cache_group = Video.cache.get_cache_group(video_id)
+        data = cache_group.get(CACHE_KEY)
+        if data is None:
+            graph = cls.build(video_id)
+            cache_group.set(CACHE_KEY, graph.to_data())
+            return graph
+        return cls.from_data(data)
+
+    @classmethod
+    def build(cls, video_id):
+        """Build the graph for a video from the DB."""
+        from subtitles.models import (SubtitleLanguage, SubtitleVersion,
+                                      json_to_lineage)
+
+        languages = dict(
+            (language_id, _LanguageNode(language_code, is_forked))
+            for (language_id, language_code, is_forked)
+            in SubtitleLanguage.objects.filter(video_id=video_id)
+            .values_list('id', 'language_code', 'is_forked'))
+
+        tips = (SubtitleVersion.objects.private_tips()
+                .filter(video_id=video_id)
+                .values_list('subtitle_language_id', 'serialized_lineage'))
+        for language_id, serialized_lineage in tips:
+            if language_id in languages and serialized_lineage:
+                languages[language_id].lineage_codes = sorted(
+                    json_to_lineage(serialized_lineage).keys())
+
+        # Find the most recent parent from another language for each
+        # language.
+        Parents = SubtitleVersion.parents.through
+        parents = (Parents.objects
+                   .filter(from_subtitleversion__video_id=video_id)
+                   .exclude(to_subtitleversion__subtitle_language=F(
+                       'from_subtitleversion__subtitle_language'))
+                   .order_by('-from_subtitleversion__version_number')
+                   .values_list('from_subtitleversion__subtitle_language_id',
+                                'to_subtitleversion__subtitle_language_id',
+                                'to_subtitleversion_id'))
+        for language_id, source_language_id, source_version_id in parents:
+            node = languages.get(language_id)
+            if node is not None and node.source_language_id is None:
+                node.source_language_id = source_language_id
+                node.source_version_id = source_version_id
+        return cls(languages)
+
+    def to_data(self):
+        """Convert the graph to a plain python object for caching."""
+        return dict(
+            (language_id, (node.language_code, node.is_forked,
+                           node.lineage_codes, node.source_language_id,
+                           node.source_version_id))
+            for language_id, node in self.languages.items())
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(dict(
+            (language_id, _LanguageNode(*values))
+            for language_id, values in data.items()))
+
+    def source_language_id(self, language_id):
+        """Get the id of the source language for a translation
+
+        Returns: language id or None if the language isn't a translation
+        """
+        node = self.languages.get(language_id)
+        return node.source_language_id if node is not None else None
+
+    def source_version_id(self, language_id):
+        """Get the id of the source version for a translation
+
+        Returns: version id or None if the language isn't a translation
+        """
+        node = self.languages.get(language_id)
+        return node.source_version_id if node is not None else None
+
+    def source_language_code(self, language_id):
+        source = self.languages.get(self.source_language_id(language_id))
+        return source.language_code if source is not None else None
+
+    def dependents(self, language_id, direct=False):
+        """Get the ids of the languages that are translations of a language
+
+        Args:
+            language_id: language to get the dependents for
+            direct: Only return direct dependents (languages translated
+                directly from language_id, rather than from one of its
+                dependents)
+
+        Returns: list of language ids, ordered by id
+        """
+        node = self.languages.get(language_id)
+        if node is None:
+            return []
+        rv = []
+        for other_id, other in sorted(self.languages.items()):
+            if (other_id == language_id or other.is_forked or
+                    node.language_code not in other.lineage_codes):
+                continue
+            if (direct and
+                    self.source_language_code(other_id) != node.language_code):
+                continue
+            rv.append(other_id)
+        return rv
+
+class _LanguageNode(object):
+    def __init__(self, language_code, is_forked, lineage_codes=(),
+                 source_language_id=None, source_version_id=None):
+        self.language_code = language_code
+        self.is_forked = is_forked
+        self.lineage_codes = lineage_codes
+        self.source_language_id = source_language_id
+        self.source_version_id = source_version_id
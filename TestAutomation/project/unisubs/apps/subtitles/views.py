@@ -24,7 +24,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import redirect_to_login
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, Http404, HttpResponseServerError, HttpResponseForbidden
+from django.http import (HttpResponse, Http404, HttpResponseServerError,
+                         HttpResponseForbidden, StreamingHttpResponse)
+from django.db import connection
 from django.db.models import Count
 from django.conf import settings
 from django.contrib import messages
@@ -36,6 +38,7 @@ from django.utils.translation import ugettext as _
 from django.views.decorators.http import require_POST
 from django.views.generic import View
 from django.shortcuts import render, get_object_or_404, redirect
+from django.test.utils import CaptureQueriesContext
 from django.template.defaultfilters import urlize, linebreaks, force_escape
 from django.views.decorators.clickjacking import xframe_options_exempt
 
@@ -44,7 +47,6 @@ from subtitles import shims
 from subtitles.workflows import get_workflow
 from subtitles.models import SubtitleLanguage, SubtitleVersion
 from subtitles.permissions import user_can_access_subtitles_format
-from subtitles.templatetags.new_subtitles_tags import visibility
 from subtitles.forms import SubtitlesUploadForm
 from teams.models import Task
 from teams.permissions import can_perform_task
@@ -64,6 +66,21 @@ def _version_data(version):
         'description': version.description,
     }
 
+def _header_visibility(header):
+    '''
+    Version header version of the new_subtitles_tags.visibility filter
+    '''
+    return header['visibility_override'] or header['visibility']
+
+def _header_is_public(header):
+    '''
+    Check if a version header would be included in
+    SubtitleVersion.objects.public()
+    '''
+    if header['visibility_override']:
+        return header['visibility_override'] == 'public'
+    return header['visibility'] != 'private'
+
 @require_POST
 def regain_lock(request, video_id, language_code):
     video = get_object_or_404(Video, video_id=video_id)
@@ -243,30 +260,71 @@ class SubtitleEditorBase(View):
 
         return editor_data
 
-    def editor_data_for_language(self, language):
-        versions_data = []
+    def fetch_version_headers(self):
+        """Fetch the version list for all languages using 1 query
 
+        This sets version_headers to a dict that maps language ids to lists
+        of dicts with the id, number and visibility for each extant version,
+        ordered by version number.
+        """
+        self.version_headers = {}
+        qs = (SubtitleVersion.objects.extant()
+              .filter(video=self.video)
+              .order_by('version_number')
+              .values('id', 'subtitle_language_id', 'version_number',
+                      'visibility', 'visibility_override'))
+        for header in qs:
+            self.version_headers.setdefault(
+                header['subtitle_language_id'], []).append(header)
+
+    def visible_version_headers(self, language):
+        headers = self.version_headers.get(language.id, [])
         if self.workflow.user_can_view_private_subtitles(
             self.user, language.language_code):
-            language_qs = language.subtitleversion_set.extant()
+            return headers
         else:
-            language_qs = language.subtitleversion_set.public()
-        for i, version in enumerate(language_qs):
+            return [h for h in headers if _header_is_public(h)]
+
+    def fetch_version_data(self):
+        """Load the subtitles that we send to the editor
+
+        We send the subtitles for the editing version, the version we're
+        translating from and the latest version of the base language.  The
+        first 2 are already loaded, any others are fetched using 1 query.
+        """
+        versions = [v for v in (self.editing_version,
+                                self.translated_from_version)
+                    if v is not None]
+        loaded_ids = set(v.id for v in versions)
+        needed_ids = set()
+        for language in self.languages:
+            if language.language_code == self.base_language:
+                headers = self.visible_version_headers(language)
+                if headers and headers[-1]['id'] not in loaded_ids:
+                    needed_ids.add(headers[-1]['id'])
+        if needed_ids:
+            languages_by_id = dict((l.id, l) for l in self.languages)
+            for version in SubtitleVersion.objects.full().filter(
+                    id__in=needed_ids):
+                languages_by_id[version.subtitle_language_id]\
+                        .optimize_loaded_version(version)
+                versions.append(version)
+        self.version_data = dict((v.id, _version_data(v)) for v in versions)
+
+    def editor_data_for_language(self, language):
+        versions_data = []
+
+        headers = self.visible_version_headers(language)
+        for header in headers:
             version_data = {
-                'version_no':version.version_number,
-                'visibility': visibility(version),
+                'version_no': header['version_number'],
+                'visibility': _header_visibility(header),
             }
-            if self.editing_version == version:
-                version_data.update(_version_data(version))
-            elif self.translated_from_version == version:
-                version_data.update(_version_data(version))
-            elif (language.language_code == self.base_language and
-                  i == len(language_qs) - 1):
-                version_data.update(_version_data(version))
+            if header['id'] in self.version_data:
+                version_data.update(self.version_data[header['id']])
 
             versions_data.append(version_data)
 
-
         return {
             'translatedFrom': self.translated_from_version and {
                 'language_code': self.translated_from_version.subtitle_language.language_code,
@@ -363,6 +421,19 @@ class SubtitleEditorBase(View):
         })
 
     def get(self, request, video_id, language_code):
+        if not settings.DEBUG:
+            return self.render_editor(request, video_id, language_code)
+        # In debug mode, report the query count and editor data size so
+        # that it's easy to spot slow pages
+        self.editor_data_size = None
+        with CaptureQueriesContext(connection) as queries:
+            response = self.render_editor(request, video_id, language_code)
+        response['X-Query-Count'] = len(queries)
+        if self.editor_data_size is not None:
+            response['X-Editor-Data-Size'] = self.editor_data_size
+        return response
+
+    def render_editor(self, request, video_id, language_code):
         self.video = get_object_or_404(Video, video_id=video_id)
         self.team_video = self.video.get_team_video()
         self.language_code = language_code
@@ -388,8 +459,10 @@ class SubtitleEditorBase(View):
         # show the user the rererence languages:
         self.translated_from_version = self.editing_language.\
             get_translation_source_version(ignore_forking=True)
-        self.languages = self.video.newsubtitlelanguage_set.annotate(
-            num_versions=Count('subtitleversion'))
+        self.languages = list(self.video.newsubtitlelanguage_set.annotate(
+            num_versions=Count('subtitleversion')))
+        self.fetch_version_headers()
+        self.fetch_version_data()
         editor_data = self.get_editor_data()
         self.experimental = 'experimental' in request.GET
 
@@ -410,6 +483,7 @@ class SubtitleEditorBase(View):
         }
         self.handle_task(context, editor_data)
         context['editor_data'] = json.dumps(editor_data, indent=4)
+        self.editor_data_size = len(context['editor_data'])
 
         if self.experimental:
             return render(request, "experimental-editor/editor.html", context)
@@ -463,23 +537,46 @@ def download(request, video_id, language_code, filename, format,
     if not format in babelsubs.get_available_formats():
         raise HttpResponseServerError("Format not found")
 
-    subs_text = babelsubs.to(version.get_subtitles(), format,
-                             language=version.language_code)
+    response = StreamingHttpResponse(
+        buffer_chunks(download_chunks(version, format)),
+        content_type="text/plain")
+    response['Content-Disposition'] = 'attachment'
+    return response
+
+def download_chunks(version, format):
+    """Generate the output for a subtitle download in chunks."""
+    if format.lower() in ('dfxp', 'xml'):
+        chunks = version.iter_stored_dfxp()
+        if chunks is not None:
+            return chunks
     # since this is a download, we can afford not to escape tags, specially
     # true since speaker change is denoted by '>>' and that would get entirely
     # stripped out
-    response = HttpResponse(subs_text, content_type="text/plain")
-    response['Content-Disposition'] = 'attachment'
-    return response
+    return babelsubs.to_iter(version.get_subtitles(), format,
+                             language=version.language_code)
+
+def buffer_chunks(chunks, buffer_size=64 * 1024):
+    """Combine small chunks so that we don't write every cue separately."""
+    buf = []
+    buffered = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            yield ''.join(buf)
+            buf = []
+            buffered = 0
+    if buf:
+        yield ''.join(buf)
 
 
 def download_all(request, video_id, filename):
     video = get_object_or_404(Video, video_id=video_id)
-    merged_dfxp = video.get_merged_dfxp()
+    chunks = video.get_merged_dfxp_chunks()
 
-    if merged_dfxp is None:
+    if chunks is None:
         raise Http404()
 
-    response = HttpResponse(merged_dfxp, content_type="text/plain")
+    response = StreamingHttpResponse(chunks, content_type="text/plain")
     response['Content-Disposition'] = 'attachment'
     return response
@@ -1,23 +1,312 @@
+from collections import defaultdict, OrderedDict
+
 from django.contrib.contenttypes.models import ContentType
-from subtitles.models import SubtitleLanguage
+from django.db import transaction
+
+from auth.models import CustomUser as User
+from messages import tasks as notifier
+from subtitles.models import (SubtitleLanguage, SubtitleVersion,
+                              SubtitleVersionMetadata)
 from subtitles.signals import subtitles_published
-from teams.signals import api_subtitles_approved
+from teams.models import (Task, TeamMember, TeamLanguagePreference,
+                          TeamLanguageStats, TeamVideoListing,
+                          WorkflowResolver)
+from teams.permissions import TeamPermissionContext
+from teams.signals import api_subtitles_approved, api_subtitles_rejected
 from utils.csv_parser import UnicodeReader
+from videos.models import Video
 from videos.tasks import video_changed_tasks
 
-def complete_approve_tasks(tasks):
-    lang_ct = ContentType.objects.get_for_model(SubtitleLanguage)
-    video_ids = set()
-    for task in tasks:
-        task.do_complete_approve(lang_ct=lang_ct)
-        version = task.get_subtitle_version()
-        api_subtitles_approved.send(version)
-        if version.is_public():
-            subtitles_published.send(version.subtitle_language, version=version)
-        video_ids.add(task.team_video.video_id)
-    for video_id in video_ids:
+def complete_approve_tasks(tasks, user):
+    """Approve a list of tasks from the bulk approvals page."""
+    completion = BulkTaskCompletion(user, Task.APPROVED_IDS['Approved'])
+    completion.run(tasks)
+    # Only send one subtitles_published signal per language
+    published = OrderedDict((v.subtitle_language_id, v)
+                            for v in completion.published_versions)
+    for version in published.values():
+        subtitles_published.send(version.subtitle_language, version=version)
+    for video_id in completion.video_ids:
         video_changed_tasks.delay(video_id)
 
+class BulkTaskCompletion(object):
+    """Complete many review/approve tasks at once
+
+    The end result is the same as calling complete_approved() or
+    complete_rejected() on each task, but:
+
+      - State changes to the tasks, versions and languages are done with
+        set-based UPDATEs.
+      - Follow-up tasks are created with bulk_create().  Note that this means
+        they might not have a pk set.
+      - Notifications and API signals are coalesced so that each
+        video/language only gets one of each.
+
+    Tasks that are not review/approve tasks are completed one at a time using
+    Task.complete().
+
+    After run() is called, published_versions will contain the versions that
+    we published and video_ids will contain the ids for all videos touched.
+    """
+    BULK_TYPES = (Task.TYPE_IDS['Review'], Task.TYPE_IDS['Approve'])
+
+    def __init__(self, user, approved):
+        self.user = user
+        self.approved = approved
+        self.was_approved = approved == Task.APPROVED_IDS['Approved']
+        self.new_tasks = []
+        self.published_versions = []
+        self.video_ids = set()
+        self.workflow_resolvers = {}
+        self.permission_contexts = {}
+        self.notifications = OrderedDict()
+        self.api_signals = OrderedDict()
+        # (team_video_id, language) pairs that have a task, including the
+        # ones that we are going to create
+        self.task_keys = set()
+
+    def run(self, tasks):
+        tasks = list(tasks)
+        with transaction.atomic():
+            bulk_tasks = [t for t in tasks if t.type in self.BULK_TYPES]
+            if bulk_tasks:
+                self.complete_bulk_tasks(bulk_tasks)
+            for task in tasks:
+                if task.type not in self.BULK_TYPES:
+                    task.assignee = self.user
+                    task.approved = self.approved
+                    task.complete()
+                    self.video_ids.add(task.team_video.video_id)
+        for func, args in self.notifications.values():
+            func.delay(*args)
+        for (signal, key), version in self.api_signals.items():
+            signal.send(version)
+        return self.new_tasks
+
+    def complete_bulk_tasks(self, tasks):
+        now = Task.now()
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+            assignee=self.user, approved=self.approved, completed=now,
+            modified=now)
+        for task in tasks:
+            task.assignee = self.user
+            task.approved = self.approved
+            task.completed = now
+            self.video_ids.add(task.team_video.video_id)
+
+        versions = [t.get_subtitle_version() for t in tasks]
+        if self.was_approved:
+            self.mark_languages_complete(tasks, versions)
+        lang_ct = ContentType.objects.get_for_model(SubtitleLanguage)
+        for task in tasks:
+            task._add_comment(lang_ct=lang_ct)
+
+        to_publish = []
+        to_approve = []
+        to_send_back = []
+        for task, version in zip(tasks, versions):
+            workflow = self.get_workflow(task)
+            if not self.was_approved:
+                to_send_back.append(task)
+                if task.is_approve_task():
+                    self.add_api_signal(api_subtitles_rejected, version)
+            elif task.is_review_task() and workflow.approve_enabled:
+                to_approve.append((task, version))
+                self.add_notification(task, notifier.reviewed_and_pending_approval,
+                                      task.pk)
+            else:
+                to_publish.append((task, version))
+                if task.is_review_task():
+                    self.add_notification(task, notifier.reviewed_and_published,
+                                          task.pk)
+                else:
+                    self.add_notification(task, notifier.approved_notification,
+                                          task.pk, True)
+                    self.add_api_signal(api_subtitles_approved, version)
+
+        self.publish([t.new_subtitle_version for t, v in to_publish])
+        self.task_keys.update(
+            Task.objects.not_deleted()
+            .filter(team_video__in=set(t.team_video_id for t in tasks))
+            .values_list('team_video_id', 'language'))
+        self.create_approve_tasks(to_approve)
+        self.create_send_back_tasks(to_send_back)
+        for task, version in to_publish:
+            if self.get_workflow(task).autocreate_translate:
+                self.create_translation_tasks(task.team_video)
+        Task.objects.bulk_create(self.new_tasks)
+
+        self.set_version_metadata(
+            'reviewed_by', [v for t, v in zip(tasks, versions)
+                            if t.is_review_task()])
+        self.set_version_metadata(
+            'approved_by', [v for t, v in zip(tasks, versions)
+                            if t.is_approve_task()])
+        self.user.new_followed_languages.add(*set(
+            v.subtitle_language for t, v in zip(tasks, versions)
+            if t.is_review_task()))
+
+        # Our UPDATEs skip the post_save handlers that normally invalidate
+        # the video cache, so do it ourselves once per video.
+        for video_id in self.video_ids:
+            Video.cache.invalidate_by_pk(video_id)
+
+    def get_workflow(self, task):
+        if task.team_id not in self.workflow_resolvers:
+            self.workflow_resolvers[task.team_id] = \
+                    WorkflowResolver.for_team(task.team)
+        resolver = self.workflow_resolvers[task.team_id]
+        return resolver.resolve_team_video(task.team_video)
+
+    def permission_context(self, team, user):
+        key = (team.id, user.id)
+        if key not in self.permission_contexts:
+            self.permission_contexts[key] = TeamPermissionContext(team, user)
+        return self.permission_contexts[key]
+
+    def add_notification(self, task, func, *args):
+        key = (func, task.team_video_id, task.language)
+        self.notifications[key] = (func, args)
+
+    def add_api_signal(self, signal, version):
+        key = (signal, version.subtitle_language_id)
+        self.api_signals[key] = version
+
+    def mark_languages_complete(self, tasks, versions):
+        to_mark = OrderedDict(
+            (v.subtitle_language_id, (t, v.subtitle_language))
+            for t, v in zip(tasks, versions)
+            if not v.subtitle_language.subtitles_complete)
+        if not to_mark:
+            return
+        SubtitleLanguage.objects.filter(id__in=to_mark.keys()).update(
+            subtitles_complete=True)
+        for v in versions:
+            v.subtitle_language.subtitles_complete = True
+            v.subtitle_language.saved_subtitles_complete = True
+        # The UPDATE skips the post_save handler that maintains the team
+        # rollups, so apply the deltas ourselves
+        language_deltas = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for task, language in to_mark.values():
+            language_deltas[task.team_id][language.language_code][1] += 1
+            TeamVideoListing.objects.add_completed(task.team_video_id, 1)
+        for team_id, deltas in language_deltas.items():
+            TeamLanguageStats.objects.add_deltas(team_id, deltas)
+
+    def publish(self, versions):
+        to_update = [v for v in versions if not v.is_public()]
+        SubtitleVersion.objects.filter(
+            id__in=[v.id for v in to_update]).update(visibility='public')
+        for version in versions:
+            version.visibility = 'public'
+            if version.is_for_primary_audio_language():
+                version._set_video_data()
+        self.published_versions.extend(versions)
+
+    def last_assignees(self, tasks, type):
+        """Find the last assignee for completed tasks of a given type
+
+        Returns a dict mapping (team_video_id, language) to users
+        """
+        qs = (Task.objects.complete()
+              .filter(team_video__in=set(t.team_video_id for t in tasks),
+                      type=type)
+              .order_by('-completed')
+              .values_list('team_video_id', 'language', 'assignee_id'))
+        assignee_ids = {}
+        for team_video_id, language, assignee_id in qs:
+            assignee_ids.setdefault((team_video_id, language), assignee_id)
+        users = User.objects.in_bulk(
+            [pk for pk in assignee_ids.values() if pk is not None])
+        return dict((key, users.get(pk))
+                    for key, pk in assignee_ids.items())
+
+    def create_approve_tasks(self, tasks_and_versions):
+        if not tasks_and_versions:
+            return
+        assignees = self.last_assignees([t for t, v in tasks_and_versions],
+                                        Task.TYPE_IDS['Approve'])
+        for task, version in tasks_and_versions:
+            # Don't auto-assign post-publish edits (see #1039)
+            if (version.is_public() and
+                    version.subtitle_language.is_complete_and_synced()):
+                assignee = None
+            else:
+                assignee = assignees.get((task.team_video_id, task.language))
+            if assignee and not self.permission_context(
+                    task.team, assignee).can_approve(task.team_video,
+                                                     task.language):
+                assignee = None
+            self.add_task(task, Task.TYPE_IDS['Approve'], assignee,
+                          new_subtitle_version=version,
+                          new_review_base_version=version)
+
+    def create_send_back_tasks(self, tasks):
+        if not tasks:
+            return
+        tasks_by_type = {}
+        for task in tasks:
+            if task.is_approve_task() and self.get_workflow(task).review_enabled:
+                type = Task.TYPE_IDS['Review']
+            elif (task.new_subtitle_version.subtitle_language
+                  .is_primary_audio_language()):
+                type = Task.TYPE_IDS['Subtitle']
+            else:
+                type = Task.TYPE_IDS['Translate']
+            tasks_by_type.setdefault(type, []).append(task)
+        for type, type_tasks in tasks_by_type.items():
+            assignees = self.last_assignees(type_tasks, type)
+            members = set(TeamMember.objects.filter(
+                team__in=set(t.team_id for t in type_tasks),
+                user__in=[u for u in assignees.values() if u])
+                .values_list('team_id', 'user_id'))
+            for task in type_tasks:
+                assignee = assignees.get((task.team_video_id, task.language))
+                if assignee and (task.team_id, assignee.id) not in members:
+                    assignee = None
+                self.add_task(task, type, assignee,
+                              new_subtitle_version=task.new_subtitle_version)
+                self.add_notification(task, notifier.reviewed_and_sent_back,
+                                      task.pk)
+
+    def create_translation_tasks(self, team_video):
+        """Bulk version of teams.models._create_translation_tasks()."""
+        preferred_langs = TeamLanguagePreference.objects.get_preferred(
+            team_video.team)
+        for lang in preferred_langs:
+            if (team_video.id, lang) in self.task_keys:
+                continue
+            sl = team_video.video.subtitle_language(lang)
+            if sl and sl.is_complete_and_synced():
+                continue
+            self.new_tasks.append(Task(
+                team=team_video.team, team_video=team_video, language=lang,
+                type=Task.TYPE_IDS['Translate']))
+            self.task_keys.add((team_video.id, lang))
+
+    def add_task(self, task, type, assignee, **kwargs):
+        new_task = Task(team=task.team, team_video=task.team_video,
+                        language=task.language, type=type,
+                        assignee=assignee, **kwargs)
+        new_task.set_expiration()
+        self.new_tasks.append(new_task)
+        self.task_keys.add((task.team_video_id, task.language))
+
+    def set_version_metadata(self, key, versions):
+        versions = dict((v.id, v) for v in versions).values()
+        if not versions:
+            return
+        key_id = SubtitleVersionMetadata.KEY_IDS[key]
+        data = unicode(self.user.pk)
+        qs = SubtitleVersionMetadata.objects.filter(
+            key=key_id, subtitle_version__in=versions)
+        existing = set(qs.values_list('subtitle_version_id', flat=True))
+        qs.update(data=data)
+        SubtitleVersionMetadata.objects.bulk_create([
+            SubtitleVersionMetadata(subtitle_version=v, key=key_id, data=data)
+            for v in versions if v.id not in existing
+        ])
+
 def add_videos_from_csv(team, user, csv_file):
     from .tasks import add_team_videos
     videos = []
@@ -16,52 +16,131 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-from django.core.cache import cache
+"""
+teams.cache -- Cached team language preferences
 
-TIMEOUT = 60 * 60 * 24 * 5 # 5 days
+A team's language preferences are packed into a single TeamLanguagePolicy
+object.  We store that in the team's CacheGroup, so that fetching the
+readable, writable and preferred languages takes one cache request instead of
+one per set.
 
-CACHE_VERSION = 2
+On top of that, policies are kept in a process-local dict for
+LOCAL_TIMEOUT seconds.  The editor, widget and API code paths call
+get_readable_langs()/get_writable_langs() many times per request, and this
+lets them all share the policy without going back to the cache.  Changing a
+TeamLanguagePreference clears the local copy in the current process and
+invalidates the CacheGroup; other processes pick up the change once their
+local copy expires.
+"""
 
-def _team_readable_langs_id(team):
-    return u"%s-readable-langs" % team.pk
+import time
 
-def _team_writable_langs_id(team):
-    return u"%s-readable-langs" % team.pk
+from utils import translation
 
-def _team_preferred_langs_id(team):
-    return u"%s-preferred-langs" % team.pk
+# How long to keep policies in the process-local tier
+LOCAL_TIMEOUT = 30
 
+_local_policies = {}
+
+class TeamLanguagePolicy(object):
+    """Language preferences for a team
+
+    We only store the languages that have a TeamLanguagePreference, which
+    keeps the cached value small.  The readable/writable sets are calculated
+    from that the first time they're needed.
+    """
+    def __init__(self, preferred, unreadable, unwritable):
+        self.preferred = frozenset(preferred)
+        self.unreadable = frozenset(unreadable)
+        self.unwritable = frozenset(unwritable)
+        self._readable = self._writable = None
+
+    @classmethod
+    def calc(cls, team):
+        from teams.models import TeamLanguagePreference
+        preferred = []
+        unreadable = []
+        unwritable = []
+        qs = (TeamLanguagePreference.objects.for_team(team)
+              .values_list('language_code', 'allow_reads', 'allow_writes',
+                           'preferred'))
+        for language_code, allow_reads, allow_writes, is_preferred in qs:
+            if is_preferred:
+                preferred.append(language_code)
+                continue
+            if not allow_reads:
+                unreadable.append(language_code)
+            if not allow_writes:
+                unwritable.append(language_code)
+        return cls(preferred, unreadable, unwritable)
+
+    def pack(self):
+        return (sorted(self.preferred), sorted(self.unreadable),
+                sorted(self.unwritable))
+
+    @classmethod
+    def unpack(cls, packed):
+        return cls(*packed)
+
+    @property
+    def readable(self):
+        if self._readable is None:
+            self._readable = frozenset(translation.ALL_LANGUAGE_CODES -
+                                       self.unreadable)
+        return self._readable
+
+    @property
+    def writable(self):
+        if self._writable is None:
+            self._writable = frozenset(translation.ALL_LANGUAGE_CODES -
+                                       self.unwritable)
+        return self._writable
+
+    @property
+    def blacklisted(self):
+        return self.unreadable & self.unwritable
+
+def get_language_policy(team):
+    """Get the TeamLanguagePolicy for a team
+
+    This checks the process-local tier, then the team's CacheGroup, then
+    calculates the policy from the DB.
+    """
+    now = time.time()
+    try:
+        expires, policy = _local_policies[team.pk]
+    except KeyError:
+        pass
+    else:
+        if expires > now:
+            return policy
+    policy = TeamLanguagePolicy.unpack(_team_cache_group(team).get_or_calc(
+        'language-policy', lambda: TeamLanguagePolicy.calc(team).pack()))
+    _local_policies[team.pk] = (now + LOCAL_TIMEOUT, policy)
+    return policy
+
+def _team_cache_group(team):
+    # Use a new CacheGroup rather than team.cache.  team.cache remembers the
+    # version it saw the first time it was used, so it wouldn't notice
+    # invalidations that happen later on in the request.
+    from teams.models import Team
+    return Team.cache.get_cache_group(team.pk)
 
 def invalidate_lang_preferences(team):
-    cache.delete(_team_readable_langs_id(team), version=CACHE_VERSION)
-    cache.delete(_team_writable_langs_id(team), version=CACHE_VERSION)
-    cache.delete(_team_preferred_langs_id(team), version=CACHE_VERSION)
+    _local_policies.pop(team.pk, None)
+    _team_cache_group(team).invalidate()
 
+def clear_local_policies():
+    _local_policies.clear()
 
 def get_readable_langs(team):
-    cache_key = _team_readable_langs_id(team)
-    value = cache.get(cache_key, version=CACHE_VERSION)
-    if value is None:
-        from teams.models import TeamLanguagePreference
-        value = TeamLanguagePreference.objects._generate_readable(team)
-        cache.set(cache_key, value, TIMEOUT, version=CACHE_VERSION)
-    return value
+    return get_language_policy(team).readable
 
 def get_writable_langs(team):
-    cache_key = _team_writable_langs_id(team)
-    value = cache.get(cache_key, version=CACHE_VERSION)
-    if value is  None:
-        from teams.models import TeamLanguagePreference
-        value = TeamLanguagePreference.objects._generate_writable(team)
-        cache.set(cache_key, value, TIMEOUT, version=CACHE_VERSION)
-    return value
+    return get_language_policy(team).writable
 
 def get_preferred_langs(team):
-    cache_key = _team_preferred_langs_id(team)
-    value = cache.get(cache_key, version=CACHE_VERSION)
-    if value is  None:
-        from teams.models import TeamLanguagePreference
-        value = TeamLanguagePreference.objects._generate_preferred(team)
-        cache.set(cache_key, value, TIMEOUT, version=CACHE_VERSION)
-    return value
+    return get_language_policy(team).preferred
 
+def get_blacklisted_langs(team):
+    return get_language_policy(team).blacklisted
@@ -1760,6 +1760,21 @@ class VideoFiltersForm(FiltersForm):
 
         return qs
 
+    def get_listing(self):
+        """Get a teams.videolisting.VideoListing for the filters
+
+        This returns the same videos as get_queryset(), but reads them from
+        the TeamVideoListing table.
+        """
+        from teams.videolisting import VideoListing
+        if not (self.is_bound and self.is_valid()):
+            return VideoListing(self.team)
+        data = self.cleaned_data
+        return VideoListing(self.team, project=data.get('project'),
+                            language=data.get('language'),
+                            duration=data.get('duration'),
+                            q=data.get('q'), sort=data.get('sort'))
+
 class ManagementVideoFiltersForm(VideoFiltersForm):
     language = NewLanguageField(label=_("Video language"),
                                 required=False,
@@ -0,0 +1,46 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.management.base import BaseCommand
+
+from teams.models import (Team, TeamLanguageStats, ProjectVideoStats,
+                          TeamVideoListing)
+
+class Command(BaseCommand):
+    help = ("Recalculate the team language, project duration and video "
+            "listing rollups")
+
+    def add_arguments(self, parser):
+        parser.add_argument('teams', nargs='*', metavar='team-slug',
+                            help='Teams to reconcile (default: all teams)')
+
+    def handle(self, **options):
+        teams = Team.objects.all().order_by('id')
+        if options['teams']:
+            teams = teams.filter(slug__in=options['teams'])
+        checked = fixed = 0
+        for team in teams.iterator():
+            languages_fixed = TeamLanguageStats.objects.rebuild_for_team(team)
+            projects_fixed = ProjectVideoStats.objects.rebuild_for_team(team)
+            listing_fixed = TeamVideoListing.objects.rebuild_for_team(team)
+            checked += 1
+            if languages_fixed or projects_fixed or listing_fixed:
+                fixed += 1
+                self.stdout.write('fixed rollups for {}\n'.format(team.slug))
+        self.stdout.write('checked {} teams, fixed {}\n'.format(
+            checked, fixed))
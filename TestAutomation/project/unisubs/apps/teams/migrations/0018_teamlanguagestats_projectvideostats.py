@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0017_merge_20181126_1529'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectVideoStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='video_stats', serialize=False, to='teams.Project')),
+                ('video_count', models.PositiveIntegerField(default=0)),
+                ('videos_with_duration', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TeamLanguageStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', models.CharField(blank=True, max_length=16)),
+                ('video_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='language_stats', to='teams.Team')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='teamlanguagestats',
+            unique_together=set([('team', 'language_code')]),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0014_auto_20181129_0617'),
+        ('teams', '0018_teamlanguagestats_projectvideostats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamVideoListing',
+            fields=[
+                ('team_video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='teams.TeamVideo')),
+                ('language_code', models.CharField(blank=True, max_length=16)),
+                ('duration', models.PositiveIntegerField(blank=True, null=True)),
+                ('title_sort', models.CharField(blank=True, max_length=100)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='teams.Project')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='teams.Team')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='videos.Video')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='teamvideolisting',
+            index_together=set([('team', 'language_code', 'created'), ('team', 'project', 'created'), ('team', 'completed_count'), ('team', 'title_sort'), ('team', 'created')]),
+        ),
+    ]
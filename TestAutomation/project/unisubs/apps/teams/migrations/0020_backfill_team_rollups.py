@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations
+
+# Fill in the rollup tables from 0018 for existing teams.  This is the same
+# calculation as the reconcile_team_rollups command, but done for all teams
+# at once.
+
+def backfill_language_stats(apps, schema_editor):
+    TeamLanguageStats = apps.get_model('teams', 'TeamLanguageStats')
+    cursor = schema_editor.connection.cursor()
+    counts = defaultdict(lambda: [0, 0])
+    cursor.execute(
+        'SELECT tv.team_id, v.primary_audio_language_code, COUNT(*) '
+        'FROM teams_teamvideo tv '
+        'JOIN videos_video v ON tv.video_id = v.id '
+        'GROUP BY tv.team_id, v.primary_audio_language_code')
+    for team_id, language_code, count in cursor.fetchall():
+        counts[team_id, language_code][0] = count
+    cursor.execute(
+        'SELECT tv.team_id, sl.language_code, COUNT(*) '
+        'FROM subtitles_subtitlelanguage sl '
+        'JOIN teams_teamvideo tv ON sl.video_id = tv.video_id '
+        'WHERE sl.subtitles_complete = %s '
+        'GROUP BY tv.team_id, sl.language_code', (True,))
+    for team_id, language_code, count in cursor.fetchall():
+        counts[team_id, language_code][1] = count
+    TeamLanguageStats.objects.all().delete()
+    TeamLanguageStats.objects.bulk_create([
+        TeamLanguageStats(team_id=team_id, language_code=language_code,
+                          video_count=video_count,
+                          completed_count=completed_count)
+        for (team_id, language_code), (video_count, completed_count)
+        in counts.items()
+    ], batch_size=1000)
+
+def backfill_project_stats(apps, schema_editor):
+    cursor = schema_editor.connection.cursor()
+    cursor.execute('DELETE FROM teams_projectvideostats')
+    cursor.execute(
+        'INSERT INTO teams_projectvideostats '
+        '(project_id, video_count, videos_with_duration, total_duration) '
+        'SELECT tv.project_id, COUNT(tv.id), COUNT(v.duration), '
+        'COALESCE(SUM(v.duration), 0) '
+        'FROM teams_teamvideo tv '
+        'JOIN videos_video v ON tv.video_id = v.id '
+        'GROUP BY tv.project_id')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subtitles', '0009_auto_20181116_1554'),
+        ('teams', '0019_teamvideolisting'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_language_stats),
+        migrations.RunPython(backfill_project_stats),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Fill in TeamVideoListing for existing team videos.  This matches
+# TeamVideoListingManager.update_for_team_video(), except that the title sort
+# key is lowercased by the DB.  reconcile_team_rollups will fix any rows where
+# that differs.
+
+def backfill_listing(apps, schema_editor):
+    cursor = schema_editor.connection.cursor()
+    cursor.execute('DELETE FROM teams_teamvideolisting')
+    cursor.execute(
+        'INSERT INTO teams_teamvideolisting '
+        '(team_video_id, team_id, project_id, video_id, language_code, '
+        'duration, title_sort, completed_count, created) '
+        'SELECT tv.id, tv.team_id, tv.project_id, v.id, '
+        'v.primary_audio_language_code, v.duration, '
+        'LOWER(SUBSTR(v.title, 1, 100)), '
+        '(SELECT COUNT(*) FROM subtitles_subtitlelanguage sl '
+        ' WHERE sl.video_id = v.id AND sl.subtitles_complete = %s), '
+        'v.created '
+        'FROM teams_teamvideo tv '
+        'JOIN videos_video v ON tv.video_id = v.id', (True,))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0020_backfill_team_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_listing),
+    ]
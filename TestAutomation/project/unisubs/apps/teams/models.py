@@ -29,19 +29,19 @@ from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.core.files import File
 from django.core.signing import Signer
-from django.db import connection
+from django.db import connection, IntegrityError
 from django.db import models
 from django.db import transaction
-from django.db.models import query, Q, Count, Sum
+from django.db.models import query, Q, Count, Sum, F, Case, When, Value
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.http import Http404
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _, ugettext 
 
 import teams.moderation_const as MODERATION
-from caching import ModelCacheManager
+from caching import CacheGroup, ModelCacheManager
 from comments.models import Comment
-from auth.models import UserLanguage, CustomUser as User
+from auth.models import UserLanguage, UserSearchToken, CustomUser as User
 from auth.providers import get_authentication_provider
 from messages import tasks as notifier
 from subtitles import shims
@@ -504,7 +504,7 @@ class Team(models.Model):
         TODO: Refactor this behaviour into something less confusing.
 
         """
-        return Workflow.get_for_target(self.id, 'team')
+        return WorkflowResolver.for_team(self).resolve_team()
 
     @property
     def auth_provider(self):
@@ -785,25 +785,8 @@ class Team(models.Model):
                 .exclude(is_active=False))
 
     def search_invitable_users(self, query):
-        qs = self.invitable_users()
-        valid_term = False
-        for term in [term.strip() for term in query.split()]:
-            if term:
-                valid_term = True
-                try:
-                    sql = """(LOWER(first_name) LIKE %s
-                OR LOWER(last_name) LIKE %s
-                OR LOWER(email) LIKE %s
-                OR LOWER(username) LIKE %s
-                OR LOWER(biography) LIKE %s)"""
-                    term = '%' + term.lower() + '%'
-                    qs = qs.extra(where=[sql], params=[term, term, term, term, term])
-                except Exception as e:
-                    logger.error(e)
-        if valid_term:
-            return qs
-        else:
-            return self.none()
+        return UserSearchToken.objects.filter_users(self.invitable_users(),
+                                                   query)
 
     def potential_language_managers(self, language_code):
         member_qs = (TeamMember.objects
@@ -876,30 +859,21 @@ class Team(models.Model):
         - videos_with_duration: number of videos with durations set
         - videos_without_duration: number of videos with NULL durations
         - total_duration: sum of all video durations (in seconds)
-        """
 
-        # We should be able to do with with an annotate() call, but for some
-        # reason it doesn't work.  I think it has to be a django bug because
-        # when you print out the query and run it you get the correct results,
-        # but when you fetch objects from the queryset, then you get the wrong
-        # results.
-        stats_sql = (
-            'SELECT p.id, COUNT(tv.id), COUNT(v.duration), SUM(v.duration) '
-            'FROM teams_project p '
-            'LEFT JOIN teams_teamvideo tv ON p.id = tv.project_id '
-            'LEFT JOIN videos_video v ON tv.video_id = v.id '
-            'WHERE p.team_id=%s '
-            'GROUP BY p.id')
-        cursor = connection.cursor()
-        cursor.execute(stats_sql, (self.id,))
-        stats_map = { r[0]: r[1:] for r in cursor }
-        projects = list(self.project_set.all())
+        The stats come from the ProjectVideoStats rollup table, so this only
+        needs 1 query regardless of how many videos the team has.
+        """
+        projects = list(self.project_set.select_related('video_stats'))
         for p in projects:
-            stats = stats_map[p.id]
-            p.video_count = stats[0]
-            p.videos_with_duration = stats[1]
-            p.videos_without_duration = stats[0] - stats[1]
-            p.total_duration = int(stats[2]) if stats[2] is not None else 0
+            try:
+                stats = p.video_stats
+            except ProjectVideoStats.DoesNotExist:
+                stats = ProjectVideoStats(project=p)
+            p.video_count = stats.video_count
+            p.videos_with_duration = stats.videos_with_duration
+            p.videos_without_duration = (stats.video_count -
+                                         stats.videos_with_duration)
+            p.total_duration = stats.total_duration
         return projects
 
     # Moderation
@@ -976,7 +950,7 @@ class Team(models.Model):
         return Task.objects.get(pk=task_pk)
 
     def get_tasks(self, task_pks):
-        return Task.objects.filter(pk__in=task_pks).select_related('new_subtitle_version', 'new_subtitle_version__subtitle_language', 'team_video', 'team_video__video', 'team_video__video__teamvideo', 'workflow')
+        return Task.objects.filter(pk__in=task_pks).select_related('new_subtitle_version', 'new_subtitle_version__subtitle_language', 'team', 'team_video', 'team_video__video', 'team_video__video__teamvideo')
 
     def _count_tasks(self):
         qs = Task.objects.filter(team=self, deleted=False, completed=None)
@@ -1107,6 +1081,17 @@ class Team(models.Model):
               .annotate(Sum('subtitles_complete')))
         return [(lc, int(count)) for lc, count in qs]
 
+    def get_language_stats(self):
+        """Get precomputed video/completed counts for each language
+
+        This reads the TeamLanguageStats rollup table rather than counting
+        videos and subtitle languages.
+
+        Returns: list of (language_code, video_count, completed_count) tuples
+        """
+        return list(self.language_stats.values_list(
+            'language_code', 'video_count', 'completed_count'))
+
 # This needs to be constructed after the model definition since we need a
 # reference to the class itself.
 Team._meta.permissions = TEAM_PERMISSIONS
@@ -1175,6 +1160,8 @@ class Project(models.Model):
         elif not self.slug:
             self.slug = pan_slugify(self.name)
         super(Project, self).save(*args, **kwargs)
+        # workflow_enabled affects the WorkflowResolver data
+        Team.cache.invalidate_by_pk(self.team_id)
 
     @property
     def is_default_project(self):
@@ -1371,6 +1358,7 @@ class TeamVideo(models.Model):
                                                user=user,
                                                destination_team=self.team,
                                                old_team=__old_team,
+                                               old_project=__old_project,
                                                video=self.video)
 
         if not within_team:
@@ -2354,10 +2342,8 @@ class Workflow(models.Model):
         '''Return the most specific Workflow for the given team_video.
 
         If workflows is given, it should be a QuerySet or List of all Workflows
-        for the TeamVideo's team.  This will let you look it up yourself once
-        and use it in many of these calls to avoid hitting the DB each time.
-
-        If workflows is not given it will be looked up with one DB query.
+        for the TeamVideo's team.  Otherwise we use the team's
+        WorkflowResolver, which is usually cached.
 
         NOTE: This function caches the workflow for performance reasons.  If the
         workflow changes within the space of a single request that
@@ -2365,8 +2351,13 @@ class Workflow(models.Model):
 
         '''
         if not hasattr(team_video, '_cached_workflow'):
-            team_video._cached_workflow = Workflow.get_for_target(
+            if workflows:
+                team_video._cached_workflow = Workflow.get_for_target(
                     team_video.id, 'team_video', workflows)
+            else:
+                resolver = WorkflowResolver.for_team(team_video.team)
+                team_video._cached_workflow = resolver.resolve_team_video(
+                    team_video)
         return team_video._cached_workflow
 
     @classmethod
@@ -2374,32 +2365,37 @@ class Workflow(models.Model):
         '''Return the most specific Workflow for the given project.
 
         If workflows is given, it should be a QuerySet or List of all Workflows
-        for the Project's team.  This will let you look it up yourself once
-        and use it in many of these calls to avoid hitting the DB each time.
-
-        If workflows is not given it will be looked up with one DB query.
+        for the Project's team.  Otherwise we use the team's
+        WorkflowResolver, which is usually cached.
 
         '''
-        return Workflow.get_for_target(project.id, 'project', workflows)
+        if workflows:
+            return Workflow.get_for_target(project.id, 'project', workflows)
+        return WorkflowResolver.for_team(project.team).resolve_project(project)
 
     @classmethod
     def add_to_team_videos(cls, team_videos):
         '''Add the appropriate Workflow objects to each TeamVideo as .workflow.
 
-        This will only perform one DB query, and it will add the most specific
-        workflow possible to each TeamVideo.
+        This uses one WorkflowResolver per team, so it performs at most one
+        DB query per team.
 
         This only exists for performance reasons.
 
         '''
-        if not team_videos:
-            return []
-
-        workflows = list(Workflow.objects.filter(team=team_videos[0].team))
-
+        resolvers = {}
         for tv in team_videos:
-            tv.workflow = Workflow.get_for_team_video(tv, workflows)
+            if tv.team_id not in resolvers:
+                resolvers[tv.team_id] = WorkflowResolver.for_team(tv.team)
+            resolvers[tv.team_id].add_to_team_video(tv)
 
+    def save(self, *args, **kwargs):
+        super(Workflow, self).save(*args, **kwargs)
+        Team.cache.invalidate_by_pk(self.team_id)
+
+    def delete(self, *args, **kwargs):
+        super(Workflow, self).delete(*args, **kwargs)
+        Team.cache.invalidate_by_pk(self.team_id)
 
     def get_specific_target(self):
         """Return the most specific target that this workflow applies to."""
@@ -2435,6 +2431,96 @@ class Workflow(models.Model):
                 or self.autocreate_translate)
 
 
+class WorkflowResolver(object):
+    """Resolve the effective Workflow for team videos and projects
+
+    We load all Workflows for a team at once, then resolve the most specific
+    one for each target in memory.  The workflow rows are stored in the
+    team's CacheGroup, so normally building a WorkflowResolver doesn't need
+    any DB queries.  Saving a Workflow or Project invalidates the cache.
+
+    The resolution rules match Workflow.get_for_target():
+
+    - A workflow for the team video itself
+    - A workflow for the team video's project, if the project has workflows
+      enabled
+    - The team-level workflow if the team has workflows enabled
+    - Otherwise, a default unsaved Workflow
+    """
+    CACHE_KEY = 'workflows'
+
+    def __init__(self, team, workflows, enabled_project_ids):
+        self.team = team
+        self.team_workflow = None
+        self.project_workflows = {}
+        self.team_video_workflows = {}
+        for w in workflows:
+            w.team = team
+            if w.team_video_id:
+                self.team_video_workflows[w.team_video_id] = w
+            elif w.project_id:
+                if w.project_id in enabled_project_ids:
+                    self.project_workflows[w.project_id] = w
+            else:
+                self.team_workflow = w
+
+    @classmethod
+    def for_team(cls, team):
+        # Use a new CacheGroup rather than team.cache, since team.cache won't
+        # notice invalidations that happen after it's first used.
+        cache_group = Team.cache.get_cache_group(team.id)
+        field_names, rows = cache_group.get_or_calc(
+            cls.CACHE_KEY, lambda: cls.fetch_rows(team))
+        workflows = []
+        enabled_project_ids = set()
+        for row in rows:
+            workflows.append(Workflow.from_db('default', field_names,
+                                              row[:-1]))
+            if row[-1]:
+                enabled_project_ids.add(workflows[-1].project_id)
+        return cls(team, workflows, enabled_project_ids)
+
+    @staticmethod
+    def fetch_rows(team):
+        field_names = [f.attname for f in Workflow._meta.concrete_fields]
+        rows = list(Workflow.objects.filter(team=team.id)
+                    .values_list(*(field_names +
+                                   ['project__workflow_enabled'])))
+        return field_names, rows
+
+    def default_workflow(self):
+        return Workflow(team=self.team)
+
+    def resolve_team(self):
+        if not self.team.workflow_enabled or self.team_workflow is None:
+            return self.default_workflow()
+        return self.team_workflow
+
+    def resolve_project(self, project):
+        try:
+            return self.project_workflows[project.id]
+        except KeyError:
+            return self.resolve_team()
+
+    def resolve_team_video(self, team_video):
+        try:
+            return self.team_video_workflows[team_video.id]
+        except KeyError:
+            pass
+        try:
+            return self.project_workflows[team_video.project_id]
+        except KeyError:
+            return self.resolve_team()
+
+    def add_to_team_video(self, team_video):
+        """Set the workflow and _cached_workflow attributes for a team video
+
+        After this, Workflow.get_for_team_video() won't need to do any
+        work.
+        """
+        team_video._cached_workflow = self.resolve_team_video(team_video)
+        team_video.workflow = team_video._cached_workflow
+
 # Tasks
 class TaskManager(models.Manager):
     def not_deleted(self):
@@ -3320,28 +3406,6 @@ class Setting(models.Model):
 
 # TeamLanguagePreferences
 class TeamLanguagePreferenceManager(models.Manager):
-    def _generate_writable(self, team):
-        """Return the set of language codes that are writeable for this team."""
-
-        unwritable = self.for_team(team).filter(allow_writes=False, preferred=False).values("language_code")
-        unwritable = set([x['language_code'] for x in unwritable])
-
-        return translation.ALL_LANGUAGE_CODES - unwritable
-
-    def _generate_readable(self, team):
-        """Return the set of language codes that are readable for this team."""
-
-        unreadable = self.for_team(team).filter(allow_reads=False, preferred=False).values("language_code")
-        unreadable = set([x['language_code'] for x in unreadable])
-
-        return translation.ALL_LANGUAGE_CODES - unreadable
-
-    def _generate_preferred(self, team):
-        """Return the set of language codes that are preferred for this team."""
-        preferred = self.for_team(team).filter(preferred=True).values("language_code")
-        return set([x['language_code'] for x in preferred])
-
-
     def for_team(self, team):
         """Return a QS of all language preferences for the given team."""
         return self.get_queryset().filter(team=team)
@@ -3355,6 +3419,14 @@ class TeamLanguagePreferenceManager(models.Manager):
         from teams.cache import invalidate_lang_preferences
         invalidate_lang_preferences(instance.team)
 
+    def get_policy(self, team):
+        """Get the TeamLanguagePolicy for a team
+
+        This packs the readable, writable, preferred and blacklisted
+        languages together and may come from the cache.
+        """
+        from teams.cache import get_language_policy
+        return get_language_policy(team)
 
     def get_readable(self, team):
         """Return the set of language codes that are readable for this team.
@@ -3362,8 +3434,7 @@ class TeamLanguagePreferenceManager(models.Manager):
         This value may come from the cache if possible.
 
         """
-        from teams.cache import get_readable_langs
-        return get_readable_langs(team)
+        return self.get_policy(team).readable
 
     def get_writable(self, team):
         """Return the set of language codes that are writeable for this team.
@@ -3371,18 +3442,14 @@ class TeamLanguagePreferenceManager(models.Manager):
         This value may come from the cache if possible.
 
         """
-        from teams.cache import get_writable_langs
-        return get_writable_langs(team)
+        return self.get_policy(team).writable
 
     def get_blacklisted(self, team):
         """Return the set of blacklisted language codes.
 
-        Note: we don't use the cache like the other functions, mostly because I
-        want to avoid touching that code (BDK).
+        This value may come from the cache if possible.
         """
-        qs = self.for_team(team).filter(preferred=False, allow_reads=False,
-                                        allow_writes=False)
-        return set(tlp.language_code for tlp in qs)
+        return self.get_policy(team).blacklisted
 
     def get_preferred(self, team):
         """Return the set of language codes that are preferred for this team.
@@ -3390,8 +3457,7 @@ class TeamLanguagePreferenceManager(models.Manager):
         This value may come from the cache if possible.
 
         """
-        from teams.cache import get_preferred_langs
-        return get_preferred_langs(team)
+        return self.get_policy(team).preferred
 
 class TeamLanguagePreference(models.Model):
     """Represent language preferences for a given team.
@@ -3458,6 +3524,7 @@ class TeamLanguagePreference(models.Model):
 
 
 post_save.connect(TeamLanguagePreference.objects.on_changed, TeamLanguagePreference)
+post_delete.connect(TeamLanguagePreference.objects.on_changed, TeamLanguagePreference)
 
 
 # TeamNotificationSettings
@@ -4117,3 +4184,373 @@ class TeamSubtitlesCompleted(models.Model):
             'video_id': self.video.video_id,
             'lang': self.language_code,
         })
+
+def counter_delta(field_name, delta):
+    """Expression that adds delta to a counter field in an UPDATE
+
+    The counters are unsigned, so negative deltas stop at 0 rather than
+    failing the query if the rollup has drifted.
+    """
+    if delta >= 0:
+        return F(field_name) + delta
+    return Case(
+        When(**{'{}__gte'.format(field_name): -delta,
+                'then': F(field_name) + delta}),
+        default=Value(0), output_field=models.BigIntegerField())
+
+class TeamLanguageStatsManager(models.Manager):
+    def add_deltas(self, team_id, deltas):
+        """Add/subtract from the rollup rows for a team
+
+        This is what the signal handlers use to keep the rows up to date.
+        Full recounts are left to rebuild_for_team().
+
+        Args:
+            team_id: team to update
+            deltas: dict mapping language codes to (video_count,
+                completed_count) deltas
+        """
+        changed = []
+        for language_code, (videos, completed) in deltas.items():
+            if language_code is None or (videos == 0 and completed == 0):
+                continue
+            changed.append(language_code)
+            qs = self.filter(team_id=team_id, language_code=language_code)
+            updated = qs.update(
+                video_count=counter_delta('video_count', videos),
+                completed_count=counter_delta('completed_count', completed))
+            if updated or videos < 0 or completed < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(team_id=team_id, language_code=language_code,
+                                video_count=videos, completed_count=completed)
+            except IntegrityError:
+                # Another process created the row first
+                qs.update(video_count=F('video_count') + videos,
+                          completed_count=F('completed_count') + completed)
+        if changed:
+            self.filter(team_id=team_id, language_code__in=changed,
+                        video_count=0, completed_count=0).delete()
+
+    def update_counts(self, team_id, language_codes, videos=True,
+                      completed=True):
+        """Recount the rollup rows for a team and some languages
+
+        Only use this when we can't calculate a delta, since each recount is
+        a COUNT query over the team's videos.
+
+        Args:
+            team_id: team to update
+            language_codes: language codes to update
+            videos: recount video_count
+            completed: recount completed_count
+        """
+        language_codes = set(lc for lc in language_codes if lc is not None)
+        for language_code in language_codes:
+            counts = {}
+            if videos:
+                counts['video_count'] = self._count_videos(
+                    team_id, language_code)
+            if completed:
+                counts['completed_count'] = self._count_completed(
+                    team_id, language_code)
+            updated = (self.filter(team_id=team_id,
+                                   language_code=language_code)
+                       .update(**counts))
+            if not updated and any(counts.values()):
+                if 'video_count' not in counts:
+                    counts['video_count'] = self._count_videos(
+                        team_id, language_code)
+                if 'completed_count' not in counts:
+                    counts['completed_count'] = self._count_completed(
+                        team_id, language_code)
+                try:
+                    with transaction.atomic():
+                        self.create(team_id=team_id,
+                                    language_code=language_code, **counts)
+                except IntegrityError:
+                    # Another process created the row first
+                    (self.filter(team_id=team_id, language_code=language_code)
+                     .update(**counts))
+        if language_codes:
+            self.filter(team_id=team_id, language_code__in=language_codes,
+                        video_count=0, completed_count=0).delete()
+
+    def _count_videos(self, team_id, language_code):
+        return TeamVideo.objects.filter(
+            team_id=team_id,
+            video__primary_audio_language_code=language_code).count()
+
+    def _count_completed(self, team_id, language_code):
+        return SubtitleLanguage.objects.filter(
+            video__teamvideo__team_id=team_id, language_code=language_code,
+            subtitles_complete=True).count()
+
+    def rebuild_for_team(self, team):
+        """Recalculate all rollup rows for a team from scratch
+
+        Returns: True if the stored rows were out of date
+        """
+        counts = defaultdict(lambda: [0, 0])
+        for language_code, count in team.get_video_language_counts():
+            counts[language_code][0] = count
+        for language_code, count in team.get_completed_language_counts():
+            counts[language_code][1] = count
+        correct = set(
+            (language_code, video_count, completed_count)
+            for language_code, (video_count, completed_count)
+            in counts.items()
+            if video_count or completed_count
+        )
+        if set(team.get_language_stats()) == correct:
+            return False
+        with transaction.atomic():
+            self.filter(team=team).delete()
+            self.bulk_create([
+                TeamLanguageStats(team=team, language_code=language_code,
+                                  video_count=video_count,
+                                  completed_count=completed_count)
+                for language_code, video_count, completed_count in correct
+            ])
+        return True
+
+class TeamLanguageStats(models.Model):
+    """Rollup of per-language counts for a team
+
+    Each row stores the number of team videos with a primary audio language
+    and the number of completed subtitle languages for a language code.  Rows
+    are kept up to date by the handlers in teams.signalhandlers and can be
+    rebuilt with the reconcile_team_rollups command.
+    """
+    team = models.ForeignKey(Team, related_name='language_stats')
+    language_code = models.CharField(max_length=16, blank=True)
+    video_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+
+    objects = TeamLanguageStatsManager()
+
+    class Meta:
+        unique_together = [
+            ('team', 'language_code'),
+        ]
+
+class ProjectVideoStatsManager(models.Manager):
+    def add_video(self, project_id, duration, sign=1):
+        """Add (sign=1) or subtract (sign=-1) a video from a project's row"""
+        self.add_deltas(project_id, sign, sign if duration is not None else 0,
+                        sign * (duration or 0))
+
+    def add_deltas(self, project_id, video_count=0, videos_with_duration=0,
+                   total_duration=0):
+        """Add/subtract from the rollup row for a project
+
+        Args:
+            project_id: project to update
+            video_count: change to the number of videos
+            videos_with_duration: change to the number of videos with a
+                duration
+            total_duration: change to the total duration
+        """
+        if project_id is None:
+            return
+        deltas = {
+            'video_count': video_count,
+            'videos_with_duration': videos_with_duration,
+            'total_duration': total_duration,
+        }
+        qs = self.filter(project_id=project_id)
+        updated = qs.update(**{
+            name: counter_delta(name, delta)
+            for name, delta in deltas.items()
+        })
+        if updated or any(delta < 0 for delta in deltas.values()):
+            return
+        try:
+            with transaction.atomic():
+                self.create(project_id=project_id, **deltas)
+        except IntegrityError:
+            qs.update(**{
+                name: F(name) + delta for name, delta in deltas.items()
+            })
+
+    def rebuild_for_team(self, team):
+        """Recalculate the rollup rows for all projects in a team
+
+        Returns: True if any of the stored rows were out of date
+        """
+        # We should be able to do with with an annotate() call, but for some
+        # reason it doesn't work.  I think it has to be a django bug because
+        # when you print out the query and run it you get the correct results,
+        # but when you fetch objects from the queryset, then you get the wrong
+        # results.
+        stats_sql = (
+            'SELECT p.id, COUNT(tv.id), COUNT(v.duration), SUM(v.duration) '
+            'FROM teams_project p '
+            'JOIN teams_teamvideo tv ON p.id = tv.project_id '
+            'JOIN videos_video v ON tv.video_id = v.id '
+            'WHERE p.team_id=%s '
+            'GROUP BY p.id')
+        cursor = connection.cursor()
+        cursor.execute(stats_sql, (team.id,))
+        correct = {
+            row[0]: (row[1], row[2], int(row[3] or 0))
+            for row in cursor
+        }
+        # Projects without videos may or may not have a row, depending on if
+        # they ever had videos.  Either way is correct.
+        current = {
+            row[0]: row[1:]
+            for row in self.filter(project__team=team).values_list(
+                'project_id', 'video_count', 'videos_with_duration',
+                'total_duration')
+            if any(row[1:])
+        }
+        if current == correct:
+            return False
+        with transaction.atomic():
+            self.filter(project__team=team).delete()
+            self.bulk_create([
+                ProjectVideoStats(project_id=project_id,
+                                  video_count=video_count,
+                                  videos_with_duration=videos_with_duration,
+                                  total_duration=total_duration)
+                for project_id, (video_count, videos_with_duration,
+                                 total_duration) in correct.items()
+            ])
+        return True
+
+class ProjectVideoStats(models.Model):
+    """Rollup of video counts and durations for a project
+
+    Maintained the same way as TeamLanguageStats.
+    """
+    project = models.OneToOneField(Project, primary_key=True,
+                                   related_name='video_stats')
+    video_count = models.PositiveIntegerField(default=0)
+    videos_with_duration = models.PositiveIntegerField(default=0)
+    total_duration = models.BigIntegerField(default=0)
+
+    objects = ProjectVideoStatsManager()
+
+class TeamVideoListingManager(models.Manager):
+    def update_for_team_video(self, team_video):
+        """Recalculate the listing row for a team video"""
+        video = team_video.video
+        values = {
+            'team_id': team_video.team_id,
+            'project_id': team_video.project_id,
+            'video_id': video.id,
+            'language_code': video.primary_audio_language_code,
+            'duration': video.duration,
+            'title_sort': TeamVideoListing.make_title_sort(video.title),
+            'completed_count': (SubtitleLanguage.objects
+                                .filter(video_id=video.id,
+                                        subtitles_complete=True)
+                                .count()),
+            'created': video.created,
+        }
+        updated = (self.filter(team_video_id=team_video.id)
+                   .update(**values))
+        if not updated:
+            try:
+                with transaction.atomic():
+                    self.create(team_video_id=team_video.id, **values)
+            except IntegrityError:
+                self.filter(team_video_id=team_video.id).update(**values)
+        TeamVideoListing.invalidate_counts(team_video.team_id)
+
+    def update_for_video(self, video):
+        team_video = video.get_team_video()
+        if team_video is not None:
+            self.update_for_team_video(team_video)
+
+    def add_completed(self, team_video_id, delta):
+        """Add/subtract from completed_count for a team video's row
+
+        The counts cached by count_cache() don't depend on completed_count,
+        so we don't need to invalidate them.
+        """
+        (self.filter(team_video_id=team_video_id)
+         .update(completed_count=counter_delta('completed_count', delta)))
+
+    def rebuild_for_team(self, team, batch_size=1000):
+        """Recalculate all listing rows for a team
+
+        Returns: True if the stored rows were out of date
+        """
+        fields = ('team_video_id', 'project_id', 'video_id', 'language_code',
+                  'duration', 'title_sort', 'completed_count', 'created')
+        correct = set(
+            (tv_id, project_id, video_id, language_code, duration,
+             TeamVideoListing.make_title_sort(title), completed_count,
+             created)
+            for (tv_id, project_id, video_id, language_code, duration, title,
+                 completed_count, created)
+            in Video.objects.filter(teamvideo__team=team)
+            .add_num_completed_languages()
+            .values_list('teamvideo__id', 'teamvideo__project_id', 'id',
+                         'primary_audio_language_code', 'duration', 'title',
+                         'num_completed_languages', 'created')
+        )
+        current = set(self.filter(team=team).values_list(*fields))
+        if current == correct:
+            return False
+        with transaction.atomic():
+            self.filter(team=team).delete()
+            self.bulk_create([
+                TeamVideoListing(team_id=team.id, **dict(zip(fields, row)))
+                for row in correct
+            ], batch_size=batch_size)
+        TeamVideoListing.invalidate_counts(team.id)
+        return True
+
+class TeamVideoListing(models.Model):
+    """Denormalized row for the team videos page
+
+    Stores the columns that the videos page filters and sorts on, so that we
+    can serve it from a single table without joining the videos and
+    subtitle languages.  Rows are kept up to date by the handlers in
+    teams.signalhandlers and can be rebuilt with the reconcile_team_rollups
+    command.  See teams.videolisting for the query side.
+    """
+    TITLE_SORT_LENGTH = 100
+
+    team_video = models.OneToOneField(TeamVideo, primary_key=True,
+                                      related_name='listing')
+    team = models.ForeignKey(Team, related_name='+')
+    project = models.ForeignKey(Project, related_name='+')
+    video = models.ForeignKey(Video, related_name='+')
+    language_code = models.CharField(max_length=16, blank=True)
+    duration = models.PositiveIntegerField(null=True, blank=True)
+    title_sort = models.CharField(max_length=TITLE_SORT_LENGTH, blank=True)
+    completed_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField()
+
+    objects = TeamVideoListingManager()
+
+    class Meta:
+        # Each index starts with team and ends with the sort column.  InnoDB
+        # appends the primary key, which we use as the tie-breaker for
+        # keyset pagination.
+        index_together = [
+            ('team', 'created'),
+            ('team', 'title_sort'),
+            ('team', 'completed_count'),
+            ('team', 'project', 'created'),
+            ('team', 'language_code', 'created'),
+        ]
+
+    @classmethod
+    def make_title_sort(cls, title):
+        return title[:cls.TITLE_SORT_LENGTH].lower()
+
+    @staticmethod
+    def count_cache(team_id):
+        """CacheGroup that stores listing counts for a team"""
+        return CacheGroup('teamvideolisting:{}'.format(team_id),
+                          invalidate_on_deploy=False)
+
+    @classmethod
+    def invalidate_counts(cls, team_id):
+        cls.count_cache(team_id).invalidate()
@@ -61,7 +61,6 @@ from activity.models import ActivityRecord
 from auth.models import CustomUser as User
 from auth.forms import CustomUserCreationForm
 from messages import tasks as messages_tasks
-from subtitles.models import SubtitleLanguage
 from teams.models import Project
 from teams.workflows import TeamWorkflow, TeamPermissionsRow
 from ui import (
@@ -172,13 +171,12 @@ def application_review_view(view_func):
 @team_view
 def videos(request, team):
     filters_form = forms.VideoFiltersForm(team, request.GET)
-    videos = filters_form.get_queryset().select_related('teamvideo',
-                                                        'teamvideo__video')
-
-    paginator = AmaraPaginatorFuture(videos, VIDEOS_PER_PAGE)
-    page = paginator.get_page(request)
-    next_page, prev_page = paginator.make_next_previous_page_links(page, request)
-    add_completed_subtitles_count(list(page))
+    listing = filters_form.get_listing()
+    paginator, page, next_page, prev_page = listing.paginate(
+        request, VIDEOS_PER_PAGE)
+    for video in page:
+        video.completed_subtitles = format_completed_subtitles_count(
+            video.listing_row.completed_count)
     context = {
         'team': team,
         'page': page,
@@ -200,14 +198,11 @@ def videos(request, team):
 
     return render(request, 'future/teams/videos/videos.html', context)
 
-def add_completed_subtitles_count(videos):
-    counts = SubtitleLanguage.count_completed_subtitles(videos)
-    for v in videos:
-        count = counts[v.id][1]
-        msg = ungettext((u'%(count)s completed subtitle'),
-                        (u'%(count)s completed subtitles'),
-                        count)
-        v.completed_subtitles = fmt(msg, count=count)
+def format_completed_subtitles_count(count):
+    msg = ungettext((u'%(count)s completed subtitle'),
+                    (u'%(count)s completed subtitles'),
+                    count)
+    return fmt(msg, count=count)
 
 @with_old_view(old_views.detail_members)
 @team_view
@@ -488,18 +483,9 @@ def project(request, team, project_slug):
 
 @team_view
 def all_languages_page(request, team):
-    video_language_counts = dict(team.get_video_language_counts())
-    completed_language_counts = dict(team.get_completed_language_counts())
-
-    all_languages = set(video_language_counts.keys() +
-                        completed_language_counts.keys())
     languages = [
-        (lc,
-         get_language_label(lc),
-         video_language_counts.get(lc, 0),
-         completed_language_counts.get(lc, 0),
-        )
-        for lc in all_languages
+        (lc, get_language_label(lc), video_count, completed_count)
+        for lc, video_count, completed_count in team.get_language_stats()
         if lc != ''
     ]
     languages.sort(key=lambda row: (-row[2], row[1]))
@@ -935,6 +921,9 @@ def activity(request, team):
         'tab': 'stream',
     }
     context.update(paginator.get_context(request))
+    page = context['page']
+    page.object_list = list(page.object_list)
+    ActivityRecord.bulk_load_related_objs(page.object_list)
     if request.is_ajax():
         renderer = AJAXResponseRenderer(request)
         renderer.replace('#activity-table',
@@ -1590,7 +1579,7 @@ def video_durations(request, team):
 @team_view
 def ajax_member_search(request, team):
     query = request.GET.get('q', '')
-    qs = User.objects.search(query).filter(team_members__team=team)
+    qs = User.objects.search(query, team=team)
     data = {
         'results': [
             {
@@ -20,7 +20,8 @@ from collections import namedtuple
 
 from django.utils.translation import ugettext as _
 
-from teams.models import Team, MembershipNarrowing, Workflow, TeamMember, Task
+from teams.models import (Team, MembershipNarrowing, Workflow,
+                          WorkflowResolver, TeamMember, Task)
 from teams.permissions_const import (
     ROLES_ORDER, ROLE_OWNER, ROLE_CONTRIBUTOR, ROLE_ADMIN, ROLE_MANAGER,
     ROLE_OUTSIDER, ROLE_PROJ_LANG_MANAGER
@@ -95,30 +96,364 @@ def get_role_for_target(user, team, project=None, lang=None):
     `lang` should be a string (the language code).
 
     """
-    member = get_member(user, team)
-    role = get_role(member)
-    narrowings = get_narrowings(member)
+    return TeamPermissionContext(team, user).role_for(project, lang)
+
+class TeamPermissionContext(object):
+    """Answer permission checks for a single user/team pair
+
+    TeamPermissionContext loads the TeamMember, narrowings and workflows
+    once and then answers the task/video permission checks from memory.  The
+    module-level can_* functions create a context for each call.  Listing
+    pages should instead use for_request() to share one context for the
+    whole request, then call evaluate() or evaluate_tasks() to check all the
+    rows at once.
+    """
+
+    # action name -> method for evaluate()
+    VIDEO_ACTIONS = {
+        'edit_video': 'can_edit_video',
+        'remove_video': 'can_remove_video',
+        'delete_video': 'can_delete_video',
+        'change_video_settings': 'can_change_video_settings',
+        'create_subtitles': 'can_create_and_edit_subtitles',
+        'create_translations': 'can_create_and_edit_translations',
+        'review': 'can_review',
+        'approve': 'can_approve',
+    }
+    # actions from VIDEO_ACTIONS that depend on the language
+    LANGUAGE_ACTIONS = set([
+        'create_subtitles', 'create_translations', 'review', 'approve',
+    ])
+
+    def __init__(self, team, user):
+        self.team = team
+        self.user = user
+        self._member_loaded = False
+        self._workflow_resolver = None
+        self._admin_owner_count = None
+
+    @classmethod
+    def for_request(cls, request, team):
+        """Get a context that's shared for the rest of the request."""
+        if not hasattr(request, '_team_permission_contexts'):
+            request._team_permission_contexts = {}
+        if team.id not in request._team_permission_contexts:
+            request._team_permission_contexts[team.id] = cls(team,
+                                                             request.user)
+        return request._team_permission_contexts[team.id]
+
+    def _load_member(self):
+        if not self._member_loaded:
+            self._member = get_member(self.user, self.team)
+            self._narrowings = get_narrowings(self._member)
+            self._project_narrowings = [
+                n.project for n in self._narrowings if n.project
+            ]
+            self._lang_narrowings = [
+                n.language for n in self._narrowings if n.language
+            ]
+            self._member_loaded = True
+
+    @property
+    def member(self):
+        self._load_member()
+        return self._member
+
+    @property
+    def workflow_resolver(self):
+        if self._workflow_resolver is None:
+            self._workflow_resolver = WorkflowResolver.for_team(self.team)
+        return self._workflow_resolver
+
+    def role_for(self, project=None, lang=None):
+        """Return the role the user effectively has for the given target."""
+        self._load_member()
+        role = get_role(self._member)
+
+        # If the user has no narrowings, just return their overall role.
+        if not self._narrowings:
+            return role
+
+        # The default project is the same as "no project".
+        if project and project.is_default_project:
+            project = None
+
+        # Otherwise the narrowings must match the target.
+        if (self._project_narrowings and
+                project not in self._project_narrowings):
+            return ROLE_CONTRIBUTOR
+
+        if self._lang_narrowings and lang not in self._lang_narrowings:
+            return ROLE_CONTRIBUTOR
 
-    # If the user has no narrowings, just return their overall role.
-    if not narrowings:
         return role
 
-    # Otherwise the narrowings must match the target.
-    project_narrowings = [n.project for n in narrowings if n.project]
-    lang_narrowings = [n.language for n in narrowings if n.language]
+    def workflow_for(self, team_video):
+        """Return the most specific Workflow for a team video
+
+        This matches Workflow.get_for_team_video(), but reuses one
+        WorkflowResolver for all the team videos we check.
+        """
+        if not hasattr(team_video, '_cached_workflow'):
+            team_video._cached_workflow = (
+                self.workflow_resolver.resolve_team_video(team_video))
+        return team_video._cached_workflow
+
+    def admin_owner_count(self):
+        if self._admin_owner_count is None:
+            self._admin_owner_count = self.team.members.filter(
+                user__is_active=True, role__in=(ROLE_ADMIN, ROLE_OWNER)
+            ).count()
+        return self._admin_owner_count
+
+    def _check_video_policy(self, team_video):
+        role = self.role_for(team_video.project)
+        role_required = {
+            1: ROLE_CONTRIBUTOR,
+            2: ROLE_MANAGER,
+            3: ROLE_ADMIN,
+        }[self.team.video_policy]
+        return role in _perms_equal_or_greater(role_required)
+
+    def can_edit_video(self, team_video):
+        if not team_video:
+            return False
+        return self._check_video_policy(team_video)
+
+    def can_remove_video(self, team_video):
+        return self._check_video_policy(team_video)
+
+    def can_delete_video(self, team_video):
+        return self.role_for() in [ROLE_OWNER, ROLE_ADMIN]
+
+    def can_change_video_settings(self, team_video):
+        role = self.role_for(team_video.project)
+        return role in [ROLE_MANAGER, ROLE_ADMIN, ROLE_OWNER]
+
+    def _check_subtitle_policy(self, policy, team_video, lang):
+        role = self.role_for(team_video.project, lang)
+        role_req = {
+            10: ROLE_OUTSIDER,
+            20: ROLE_CONTRIBUTOR,
+            30: ROLE_MANAGER,
+            40: ROLE_ADMIN,
+        }[policy]
+        return role in _perms_equal_or_greater(role_req,
+                                               include_outsiders=True)
+
+    def can_create_and_edit_subtitles(self, team_video, lang=None):
+        return self._check_subtitle_policy(self.team.subtitle_policy,
+                                           team_video, lang)
+
+    def can_create_and_edit_translations(self, team_video, lang=None):
+        return self._check_subtitle_policy(self.team.translate_policy,
+                                           team_video, lang)
+
+    def can_review_own_subtitles(self, role):
+        """See can_review_own_subtitles()"""
+        return (role == ROLE_OWNER or
+                (role == ROLE_ADMIN and self.admin_owner_count() == 1))
+
+    def can_review(self, team_video, lang=None, allow_own=False):
+        workflow = self.workflow_for(team_video)
+        role = self.role_for(team_video.project, lang)
 
-    # The default project is the same as "no project".
-    if project and project.is_default_project:
-        project = None
+        if not workflow.review_allowed:
+            return False
+
+        role_req = {
+            10: ROLE_CONTRIBUTOR,
+            20: ROLE_MANAGER,
+            30: ROLE_ADMIN,
+        }[workflow.review_allowed]
+
+        # Check that the user has the correct role.
+        if role not in _perms_equal_or_greater(role_req):
+            return False
+
+        # Users cannot review their own subtitles, unless we're specifically
+        # overriding that restriction in the arguments.
+        if allow_own:
+            return True
+
+        # Users usually cannot review their own subtitles.
+        if not hasattr(team_video, '_cached_version_for_review'):
+            team_video._cached_version_for_review = (
+                team_video.video.latest_version(language_code=lang,
+                                                public_only=False))
+
+        subtitle_version = team_video._cached_version_for_review
+
+        if (lang and subtitle_version and
+                subtitle_version.author_id == self.user.id):
+            return self.can_review_own_subtitles(role)
+
+        return True
 
-    if project_narrowings and project not in project_narrowings:
-        return ROLE_CONTRIBUTOR
+    def can_approve(self, team_video, lang=None):
+        workflow = self.workflow_for(team_video)
+        role = self.role_for(team_video.project, lang)
 
-    if lang_narrowings and lang not in lang_narrowings:
-        return ROLE_CONTRIBUTOR
+        if not workflow.approve_allowed:
+            return False
+
+        role_req = {
+            10: ROLE_MANAGER,
+            20: ROLE_ADMIN,
+        }[workflow.approve_allowed]
 
-    return role
+        return role in _perms_equal_or_greater(role_req)
 
+    def can_assign_tasks(self, project=None, lang=None):
+        role = self.role_for(project, lang)
+        role_required = {
+            10: ROLE_CONTRIBUTOR,
+            20: ROLE_MANAGER,
+            30: ROLE_ADMIN,
+        }[self.team.task_assign_policy]
+        return role in _perms_equal_or_greater(role_required)
+
+    def can_delete_tasks(self, project=None, lang=None):
+        if self.role_for(project, lang) == ROLE_CONTRIBUTOR:
+            return False
+        return self.can_assign_tasks(project, lang)
+
+    def can_perform_task_for(self, type, team_video, language,
+                             allow_own=False):
+        if type:
+            type = int(type)
+
+        if type == Task.TYPE_IDS['Subtitle']:
+            return self.can_create_and_edit_subtitles(team_video)
+        elif type == Task.TYPE_IDS['Translate']:
+            return self.can_create_and_edit_translations(team_video, language)
+        elif type == Task.TYPE_IDS['Review']:
+            return self.can_review(team_video, language, allow_own=allow_own)
+        elif type == Task.TYPE_IDS['Approve']:
+            return self.can_approve(team_video, language)
+
+    def can_perform_task(self, task, allow_own=False):
+        # Hacky check to account for the following case:
+        #
+        # * Reviewer A is reviewing v1 of subs by user B.
+        # * A makes some changes and saves for later, resulting in v2 by A.
+        # * The review task now points at v2, which is authored by A, which means
+        #   that A is now trying to review their own subs, which is not allowed.
+        #
+        # For now we're just special-casing this and saying that someone can perform
+        # a review of their own subs if they're already assigned to the task.
+        #
+        # This doesn't handle all the possible edge cases, but it's good enough for
+        # right now.
+        #
+        # TODO: Remove this hack once we get the "origin" of versions in place.
+        if task.type in (Task.TYPE_IDS['Review'], Task.TYPE_IDS['Approve']):
+            if (task.assignee_id is not None and
+                    task.assignee_id == self.user.id):
+                return True
+
+        return self.can_perform_task_for(task.type, task.team_video,
+                                         task.language, allow_own)
+
+    def can_assign_task(self, task):
+        return (self.can_assign_tasks(task.team_video.project, task.language)
+                and self.can_perform_task(task, allow_own=True))
+
+    def can_decline_task(self, task):
+        return task.assignee_id == self.user.id
+
+    def can_delete_task(self, task):
+        can_delete = self.can_delete_tasks(task.team_video.project,
+                                           task.language)
+
+        # Allow stray review tasks to be deleted.
+        if task.type == Task.TYPE_IDS['Review']:
+            if not self.workflow_for(task.team_video).review_allowed:
+                return can_delete
+
+        # Allow stray approve tasks to be deleted.
+        if task.type == Task.TYPE_IDS['Approve']:
+            if not self.workflow_for(task.team_video).approve_allowed:
+                return can_delete
+
+        return can_delete and self.can_perform_task(task)
+
+    def preload_versions_for_review(self, team_videos_and_languages):
+        """Bulk load the versions that can_review() checks the author of
+
+        team_videos_and_languages is a list of (team_video, language_code)
+        tuples.
+        """
+        from subtitles.models import SubtitleVersion
+
+        to_load = [
+            (tv, lang) for (tv, lang) in team_videos_and_languages
+            if lang and not hasattr(tv, '_cached_version_for_review')
+        ]
+        if not to_load:
+            return
+        video_ids = set(tv.video_id for (tv, lang) in to_load)
+        language_codes = set(lang for (tv, lang) in to_load)
+        versions = (SubtitleVersion.objects.extant().private_tips()
+                    .filter(video_id__in=video_ids,
+                            language_code__in=language_codes))
+        version_map = {
+            (v.video_id, v.language_code): v for v in versions
+        }
+        for tv, lang in to_load:
+            tv._cached_version_for_review = version_map.get(
+                (tv.video_id, lang))
+
+    def evaluate(self, team_videos, actions, lang=None):
+        """Check several actions for a list of team videos
+
+        This runs a constant number of queries, regardless of how many team
+        videos are passed in.
+
+        Args:
+            team_videos: list of TeamVideo objects
+            actions: list of action names from VIDEO_ACTIONS
+            lang: language code to check the subtitle actions with
+
+        Returns:
+            dict mapping team video ids to a dict that maps action names to
+            True/False
+        """
+        if 'review' in actions:
+            self.preload_versions_for_review([
+                (tv, lang) for tv in team_videos
+            ])
+        results = {}
+        for tv in team_videos:
+            results[tv.id] = tv_results = {}
+            for action in actions:
+                method = getattr(self, self.VIDEO_ACTIONS[action])
+                if action in self.LANGUAGE_ACTIONS:
+                    tv_results[action] = method(tv, lang)
+                else:
+                    tv_results[action] = method(tv)
+        return results
+
+    def evaluate_tasks(self, tasks):
+        """Check the task actions for a list of tasks
+
+        This sets the user_permissions attribute on each task to a dict with
+        the keys: perform, assign, decline, and delete.
+        """
+        self.preload_versions_for_review([
+            (task.team_video, task.language) for task in tasks
+            if task.type == Task.TYPE_IDS['Review']
+        ])
+        for task in tasks:
+            # Resolve the workflow using our resolver so that Task.workflow
+            # doesn't need to re-fetch it for each task.
+            self.workflow_for(task.team_video)
+            task.user_permissions = {
+                'perform': self.can_perform_task(task),
+                'assign': self.can_assign_task(task),
+                'decline': self.can_decline_task(task),
+                'delete': self.can_delete_task(task),
+            }
 
 def roles_user_can_assign(team, user, to_user=None):
     """Return a list of the roles the given user can assign for the given team.
@@ -439,16 +774,8 @@ def can_add_video_somewhere(team, user):
 
 def can_remove_video(team_video, user):
     """Return whether the given user can remove the given team video."""
-
-    role = get_role_for_target(user, team_video.team, team_video.project)
-
-    role_required = {
-        1: ROLE_CONTRIBUTOR,
-        2: ROLE_MANAGER,
-        3: ROLE_ADMIN,
-    }[team_video.team.video_policy]
-
-    return role in _perms_equal_or_greater(role_required)
+    return TeamPermissionContext(team_video.team, user).can_remove_video(
+        team_video)
 
 def can_remove_videos(team, user):
     """Return whether the given user can remove the given team video."""
@@ -495,16 +822,8 @@ def can_edit_video(team_video, user):
 
     if not team_video:
         return False
-
-    role = get_role_for_target(user, team_video.team, team_video.project)
-
-    role_required = {
-        1: ROLE_CONTRIBUTOR,
-        2: ROLE_MANAGER,
-        3: ROLE_ADMIN,
-    }[team_video.team.video_policy]
-
-    return role in _perms_equal_or_greater(role_required)
+    return TeamPermissionContext(team_video.team, user).can_edit_video(
+        team_video)
 
 def can_edit_videos(team, user):
     """Return whether the given user can edit the given video."""
@@ -604,8 +923,8 @@ def can_add_members(team, user):
     return user.is_staff
 
 def can_change_video_settings(user, team_video):
-    role = get_role_for_target(user, team_video.team, team_video.project, None)
-    return role in [ROLE_MANAGER, ROLE_ADMIN, ROLE_OWNER]
+    return (TeamPermissionContext(team_video.team, user)
+            .can_change_video_settings(team_video))
 
 def can_change_video_titles(user, team_video):
     role = get_role_for_target(user, team_video.team, team_video.project, None)
@@ -638,55 +957,12 @@ def can_review_own_subtitles(role, team_video):
     return False
 
 def can_review(team_video, user, lang=None, allow_own=False):
-    workflow = Workflow.get_for_team_video(team_video)
-    role = get_role_for_target(user, team_video.team, team_video.project, lang)
-
-    if not workflow.review_allowed:
-        return False
-
-    role_req = {
-        10: ROLE_CONTRIBUTOR,
-        20: ROLE_MANAGER,
-        30: ROLE_ADMIN,
-    }[workflow.review_allowed]
-
-    # Check that the user has the correct role.
-    if role not in _perms_equal_or_greater(role_req):
-        return False
-
-    # Users cannot review their own subtitles, unless we're specifically
-    # overriding that restriction in the arguments.
-    if allow_own:
-        return True
-
-    # Users usually cannot review their own subtitles.
-    if not hasattr(team_video, '_cached_version_for_review'):
-        team_video._cached_version_for_review = team_video.video.latest_version(
-            language_code=lang, public_only=False)
-
-    subtitle_version = team_video._cached_version_for_review
-
-    if lang and subtitle_version and subtitle_version.author_id == user.id:
-        if can_review_own_subtitles(role, team_video):
-            return True
-        else:
-            return False
-
-    return True
+    return TeamPermissionContext(team_video.team, user).can_review(
+        team_video, lang, allow_own)
 
 def can_approve(team_video, user, lang=None):
-    workflow = Workflow.get_for_team_video(team_video)
-    role = get_role_for_target(user, team_video.team, team_video.project, lang)
-
-    if not workflow.approve_allowed:
-        return False
-
-    role_req = {
-        10: ROLE_MANAGER,
-        20: ROLE_ADMIN,
-    }[workflow.approve_allowed]
-
-    return role in _perms_equal_or_greater(role_req)
+    return TeamPermissionContext(team_video.team, user).can_approve(
+        team_video, lang)
 
 def can_message_all_members(team, user):
     """Return whether the user has permission to message all members of the given team."""
@@ -704,28 +980,12 @@ def can_edit_project(team, user, project):
     return role in [ROLE_ADMIN, ROLE_OWNER]
 
 def can_create_and_edit_subtitles(user, team_video, lang=None):
-    role = get_role_for_target(user, team_video.team, team_video.project, lang)
-
-    role_req = {
-        10: ROLE_OUTSIDER,
-        20: ROLE_CONTRIBUTOR,
-        30: ROLE_MANAGER,
-        40: ROLE_ADMIN,
-    }[team_video.team.subtitle_policy]
-
-    return role in _perms_equal_or_greater(role_req, include_outsiders=True)
+    return (TeamPermissionContext(team_video.team, user)
+            .can_create_and_edit_subtitles(team_video, lang))
 
 def can_create_and_edit_translations(user, team_video, lang=None):
-    role = get_role_for_target(user, team_video.team, team_video.project, lang)
-
-    role_req = {
-        10: ROLE_OUTSIDER,
-        20: ROLE_CONTRIBUTOR,
-        30: ROLE_MANAGER,
-        40: ROLE_ADMIN,
-    }[team_video.team.translate_policy]
-
-    return role in _perms_equal_or_greater(role_req, include_outsiders=True)
+    return (TeamPermissionContext(team_video.team, user)
+            .can_create_and_edit_translations(team_video, lang))
 
 
 def can_publish_edits_immediately(team_video, user, lang):
@@ -850,23 +1110,11 @@ def can_create_tasks(team, user, project=None):
 
 def can_delete_tasks(team, user, project=None, lang=None):
     """Return whether the given user has permission to delete tasks at all."""
-
-    role = get_role_for_target(user, team, project, lang)
-    if role == ROLE_CONTRIBUTOR:
-        return False
-    return can_assign_tasks(team, user, project, lang)
+    return TeamPermissionContext(team, user).can_delete_tasks(project, lang)
 
 def can_assign_tasks(team, user, project=None, lang=None):
     """Return whether the given user has permission to assign tasks at all."""
-
-    role = get_role_for_target(user, team, project, lang)
-
-    role_required = {
-        10: ROLE_CONTRIBUTOR,
-        20: ROLE_MANAGER,
-        30: ROLE_ADMIN,
-    }[team.task_assign_policy]
-    return role in _perms_equal_or_greater(role_required)
+    return TeamPermissionContext(team, user).can_assign_tasks(project, lang)
 
 
 def can_resync(team, user):
@@ -875,42 +1123,13 @@ def can_resync(team, user):
 
 def can_perform_task_for(user, type, team_video, language, allow_own=False):
     """Return whether the given user can perform the given type of task."""
-
-    if type:
-        type = int(type)
-
-    if type == Task.TYPE_IDS['Subtitle']:
-        return can_create_and_edit_subtitles(user, team_video)
-    elif type == Task.TYPE_IDS['Translate']:
-        return can_create_and_edit_translations(user, team_video, language)
-    elif type == Task.TYPE_IDS['Review']:
-        return can_review(team_video, user, language, allow_own=allow_own)
-    elif type == Task.TYPE_IDS['Approve']:
-        return can_approve(team_video, user, language)
+    return TeamPermissionContext(team_video.team, user).can_perform_task_for(
+        type, team_video, language, allow_own)
 
 def can_perform_task(user, task, allow_own=False):
     """Return whether the given user can perform the given task."""
-
-    # Hacky check to account for the following case:
-    #
-    # * Reviewer A is reviewing v1 of subs by user B.
-    # * A makes some changes and saves for later, resulting in v2 by A.
-    # * The review task now points at v2, which is authored by A, which means
-    #   that A is now trying to review their own subs, which is not allowed.
-    #
-    # For now we're just special-casing this and saying that someone can perform
-    # a review of their own subs if they're already assigned to the task.
-    #
-    # This doesn't handle all the possible edge cases, but it's good enough for
-    # right now.
-    #
-    # TODO: Remove this hack once we get the "origin" of versions in place.
-    if task.get_type_display() in ['Review', 'Approve']:
-        if task.assignee == user:
-            return True
-
-    return can_perform_task_for(user, task.type, task.team_video,
-                                task.language, allow_own)
+    return TeamPermissionContext(task.team, user).can_perform_task(
+        task, allow_own)
 
 def can_assign_task(task, user):
     """Return whether the given user can assign the given task.
@@ -921,10 +1140,7 @@ def can_assign_task(task, user):
     * They can perform the task themselves.
 
     """
-    team, project, lang = task.team, task.team_video.project, task.language
-
-    return (can_assign_tasks(team, user, project, lang)
-            and can_perform_task(user, task, allow_own=True))
+    return TeamPermissionContext(task.team, user).can_assign_task(task)
 
 def can_decline_task(task, user):
     """Return whether the given user can decline the given task.
@@ -938,24 +1154,7 @@ def can_decline_task(task, user):
 
 def can_delete_task(task, user):
     """Return whether the given user can delete the given task."""
-
-    team, project, lang = task.team, task.team_video.project, task.language
-
-    can_delete = can_delete_tasks(team, user, project, lang)
-
-    # Allow stray review tasks to be deleted.
-    if task.type == Task.TYPE_IDS['Review']:
-        workflow = Workflow.get_for_team_video(task.team_video)
-        if not workflow.review_allowed:
-            return can_delete
-
-    # Allow stray approve tasks to be deleted.
-    if task.type == Task.TYPE_IDS['Approve']:
-        workflow = Workflow.get_for_team_video(task.team_video)
-        if not workflow.approve_allowed:
-            return can_delete
-
-    return can_delete and can_perform_task(user, task)
+    return TeamPermissionContext(task.team, user).can_delete_task(task)
 
 def _user_can_create_task_subtitle(user, team_video):
     role = get_role_for_target(user, team_video.team, team_video.project, None)
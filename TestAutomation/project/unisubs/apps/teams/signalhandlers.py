@@ -16,16 +16,24 @@
 # along with this program.  If not, see 
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+from collections import defaultdict
+
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 
 from auth.models import CustomUser as User
-from subtitles.signals import subtitles_published, subtitles_added
+from subtitles.models import SubtitleLanguage
+from subtitles.signals import (subtitles_published, subtitles_added,
+                               subtitle_language_changed)
 from teams import stats
 from teams.models import (TeamVideo, TeamMember, MembershipNarrowing,
-                          TeamSubtitlesCompleted)
-from teams.signals import api_teamvideo_new
-from videos.signals import feed_imported
+                          TeamSubtitlesCompleted, TeamLanguageStats,
+                          ProjectVideoStats, TeamVideoListing)
+from teams.signals import (api_teamvideo_new, video_moved_from_team_to_team,
+                           video_moved_from_project_to_project)
+from videos.models import Video
+from videos.signals import (feed_imported, duration_changed, language_changed,
+                            title_changed)
 
 @receiver(feed_imported)
 def on_feed_imported(signal, sender, new_videos, **kwargs):
@@ -64,3 +72,124 @@ def on_subtitles_published(sender, version=None, **kwargs):
                 member=member,
                 video=sender.video,
                 language_code=sender.language_code)
+
+# Keep the TeamLanguageStats, ProjectVideoStats and TeamVideoListing rollups
+# up to date.  The handlers apply deltas, so each change only costs queries on
+# the video being changed.  The reconcile_team_rollups command recounts
+# everything to fix any drift.
+
+def add_video_to_rollups(team_id, project_id, video, sign=1):
+    """Add (sign=1) or subtract (sign=-1) a video from the team rollups"""
+    deltas = defaultdict(lambda: [0, 0])
+    deltas[video.primary_audio_language_code][0] += sign
+    for language_code in (SubtitleLanguage.objects
+                          .filter(video_id=video.id, subtitles_complete=True)
+                          .values_list('language_code', flat=True)):
+        deltas[language_code][1] += sign
+    TeamLanguageStats.objects.add_deltas(team_id, deltas)
+    ProjectVideoStats.objects.add_video(project_id, video.duration, sign)
+
+@receiver(post_save, sender=TeamVideo)
+def on_team_video_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # Moves between teams and projects are handled by the moved signals
+    if created:
+        add_video_to_rollups(instance.team_id, instance.project_id,
+                             instance.video)
+    TeamVideoListing.objects.update_for_team_video(instance)
+
+@receiver(pre_delete, sender=TeamVideo)
+def on_team_video_delete(sender, instance, **kwargs):
+    # Use pre_delete so that the video and its languages are still around
+    # when the team video is deleted because the video is.  SubtitleLanguages
+    # only get deleted along with their video, so this also covers their
+    # completed counts.
+    add_video_to_rollups(instance.team_id, instance.project_id,
+                         instance.video, sign=-1)
+
+@receiver(post_delete, sender=TeamVideo)
+def on_team_video_deleted(sender, instance, **kwargs):
+    # The listing row gets deleted by the cascade, but the counts need to be
+    # recalculated
+    TeamVideoListing.invalidate_counts(instance.team_id)
+
+@receiver(video_moved_from_team_to_team)
+def on_video_moved_from_team(sender, old_team, old_project=None, **kwargs):
+    add_video_to_rollups(old_team.id,
+                         old_project.id if old_project else None,
+                         sender.video, sign=-1)
+    add_video_to_rollups(sender.team_id, sender.project_id, sender.video)
+    TeamVideoListing.invalidate_counts(old_team.id)
+
+@receiver(video_moved_from_project_to_project)
+def on_video_moved_from_project(sender, old_project, new_project, **kwargs):
+    duration = sender.video.duration
+    ProjectVideoStats.objects.add_video(old_project.id, duration, sign=-1)
+    ProjectVideoStats.objects.add_video(new_project.id, duration)
+
+@receiver(duration_changed)
+def on_video_duration_changed(sender, old_duration, **kwargs):
+    team_video = sender.get_team_video()
+    if team_video:
+        ProjectVideoStats.objects.add_deltas(
+            team_video.project_id,
+            videos_with_duration=((sender.duration is not None) -
+                                  (old_duration is not None)),
+            total_duration=(sender.duration or 0) - (old_duration or 0))
+        TeamVideoListing.objects.update_for_team_video(team_video)
+
+@receiver(title_changed)
+def on_video_title_changed(sender, **kwargs):
+    TeamVideoListing.objects.update_for_video(sender)
+
+@receiver(language_changed)
+def on_video_language_changed(sender, old_primary_audio_language_code,
+                              **kwargs):
+    team_video = sender.get_team_video()
+    if team_video:
+        TeamLanguageStats.objects.add_deltas(team_video.team_id, {
+            old_primary_audio_language_code: (-1, 0),
+            sender.primary_audio_language_code: (1, 0),
+        })
+        TeamVideoListing.objects.update_for_team_video(team_video)
+
+@receiver(post_save, sender=SubtitleLanguage)
+def on_subtitle_language_saved(sender, instance, created, raw=False,
+                               **kwargs):
+    if raw:
+        return
+    if created:
+        delta = int(instance.subtitles_complete)
+    elif instance.saved_subtitles_complete is None:
+        delta = None
+    else:
+        delta = (int(instance.subtitles_complete) -
+                 int(instance.saved_subtitles_complete))
+    if delta == 0:
+        return
+    team_video = instance.video.get_team_video()
+    if team_video is None:
+        return
+    if delta is None:
+        # subtitles_complete was deferred when the language was loaded, so
+        # we don't know if it changed.
+        TeamLanguageStats.objects.update_counts(
+            team_video.team_id, [instance.language_code], videos=False)
+        TeamVideoListing.objects.update_for_team_video(team_video)
+    else:
+        TeamLanguageStats.objects.add_deltas(team_video.team_id, {
+            instance.language_code: (0, delta),
+        })
+        TeamVideoListing.objects.add_completed(team_video.id, delta)
+
+@receiver(subtitle_language_changed)
+def on_subtitle_language_code_changed(sender, old_language, **kwargs):
+    if not sender.subtitles_complete:
+        return
+    team_video = sender.video.get_team_video()
+    if team_video:
+        TeamLanguageStats.objects.add_deltas(team_video.team_id, {
+            old_language: (0, -1),
+            sender.language_code: (0, 1),
+        })
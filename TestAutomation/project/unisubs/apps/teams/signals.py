@@ -27,7 +27,8 @@ member_leave = dispatch.Signal()
 member_remove = dispatch.Signal()
 video_removed_from_team = dispatch.Signal(providing_args=["team", "user"])
 video_moved_from_team_to_team = dispatch.Signal(
-        providing_args=["destination_team", "old_team", "video"])
+        providing_args=["destination_team", "old_team", "old_project",
+                        "video"])
 video_moved_from_project_to_project = dispatch.Signal(
         providing_args=["old_project", "new_project", "video"])
 team_settings_changed = dispatch.Signal(
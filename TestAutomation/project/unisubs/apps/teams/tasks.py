@@ -6,11 +6,8 @@ logger = logging.getLogger('teams.tasks')
 from django.conf import settings
 from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
-import requests
 
 from utils import send_templated_email
-from utils.panslugify import pan_slugify
-from utils.translation import SUPPORTED_LANGUAGE_CODES
 from widget.video_cache import (
     invalidate_cache as invalidate_video_cache,
     invalidate_video_moderation,
@@ -169,73 +166,19 @@ def process_billing_report(billing_report_pk):
 @job
 def add_team_videos(team_pk, user_pk, videos):
     from .permissions import can_add_videos_bulk
-    from teams.models import Team, Project, TeamVideo
-    from videos.models import Video
-    from videos.types import video_type_registrar
+    from teams.models import Team
+    from teams.videoimport import TeamVideoImporter
     from auth.models import CustomUser as User
-    from utils.subtitles import load_subtitles
-    from subtitles.pipeline import add_subtitles
     user = User.objects.get(pk=int(user_pk))
     team = Team.objects.get(pk=int(team_pk))
-    num_successful_videos = 0
-    messages = []
     if can_add_videos_bulk(user):
-        for video_item in videos:
-            video_url = video_item['url']
-            try:
-                video_type = video_type_registrar.video_type_for_url(video_url)
-                video_url = video_type.convert_to_video_url()
-            except:
-                messages.append(fmt(_(u"Unknown video type: %(url)s\n"), url=video_url))
-                continue
-
-            def setup_video(video, video_url):
-                video.is_public = team.videos_public()
-                if video_item.get('title'):
-                    video.title = video_item['title']
-                if video_item.get('description'):
-                    video.description = video_item['description']
-                if video_item.get('language'):
-                    language = video_item['language'].lower()
-                    if language in SUPPORTED_LANGUAGE_CODES:
-                        video.primary_audio_language_code = language
-                    else:
-                        messages.append(fmt(_(u"Badly formated language for %(url)s: %(language)s, ignoring it."), url=video_url, language=video_item['language']))
-                if video_item.get('duration') and not video.duration:
-                    try:
-                        video.duration = int(video_item['duration'])
-                    except:
-                        messages.append(fmt(_(u"Badly formated duration for %(url)s: %(duration)s, ignoring it."), url=video_url, duration=video_item['duration']))
-                if video_item.get('project'):
-                    project, created = Project.objects.get_or_create(team=team, slug=pan_slugify(video_item['project']), defaults={'name': video_item['project']})
-                else:
-                    project = team.default_project
-                team_video = TeamVideo.objects.create(video=video, team=team,
-                                                      project=project, added_by=user)
-
-            try:
-                video, video_url = Video.add(video_type, user, setup_video, team)
-            except Video.DuplicateUrlError, e:
-                messages.append(fmt(
-                    _(u"Video is already added to team: %(url)s\n"),
-                    url=e.video_url))
-                continue
-
-            if 'transcript' in video_item and len(video_item['transcript']) > 0 and video.primary_audio_language_code:
-                try:
-                    sub_type = video_item['transcript'].split(".")[-1]
-                    r = requests.get(video_item['transcript'])
-                    if r.ok:
-                        subs = load_subtitles(video.primary_audio_language_code, r.text, sub_type)
-                        version = add_subtitles(video, video.primary_audio_language_code, subs)
-                    else:
-                        raise Exception("Request not successful")
-                except Exception, e:
-                    logger.error("Error while importing transcript file: {}".format(str(e)))
-                    messages.append(fmt(_(u"Invalid transcript file or language code for video %(url)s\n"), url=video_url))
-            num_successful_videos += 1
+        importer = TeamVideoImporter(team, user, videos)
+        importer.run()
+        messages = importer.messages
+        num_successful_videos = importer.num_successful_videos
     else:
-        messages.append(fmt(_(u'You are not authorized to perform such action\n')))
+        messages = [fmt(_(u'You are not authorized to perform such action\n'))]
+        num_successful_videos = 0
     messages.append(fmt(_(u"Number of videos added to team: %(num)i\n"), num=num_successful_videos))
     domain = settings.HOSTNAME
     context = {
@@ -20,7 +20,8 @@ from collections import namedtuple
 
 from django import template
 from datetime import timedelta
-from teams.models import Team, TeamVideo, Project, TeamMember, Workflow, Task
+from teams.models import (Team, TeamVideo, Project, TeamMember, Workflow, Task,
+                          WorkflowResolver)
 from django.db.models import Count
 from videos.models import Video
 from widget import video_cache
@@ -414,11 +415,9 @@ def can_leave_team(team, user):
 
 @register.simple_tag(takes_context=True)
 def can_create_any_task_for_teamvideo(context, team_video, user):
-    workflows = context.get('team_workflows')
-
-    if can_create_task_subtitle(team_video, user, workflows):
+    if can_create_task_subtitle(team_video, user):
         result = True
-    elif can_create_task_translate(team_video, user, workflows):
+    elif can_create_task_translate(team_video, user):
         result = True
     else:
         result = False
@@ -430,15 +429,14 @@ def can_create_any_task_for_teamvideo(context, team_video, user):
 
 @register.filter
 def review_enabled(team):
-    w = Workflow.get_for_target(team.id, 'team')
+    resolver = WorkflowResolver.for_team(team)
 
-    if w.review_enabled:
+    if resolver.resolve_team().review_enabled:
         return True
 
     for p in team.project_set.all():
         if p.workflow_enabled:
-            w = Workflow.get_for_project(p)
-            if w.review_enabled:
+            if resolver.resolve_project(p).review_enabled:
                 return True
 
     return False
@@ -446,15 +444,14 @@ def review_enabled(team):
 
 @register.filter
 def approve_enabled(team):
-    w = Workflow.get_for_target(team.id, 'team')
+    resolver = WorkflowResolver.for_team(team)
 
-    if w.approve_enabled:
+    if resolver.resolve_team().approve_enabled:
         return True
 
     for p in team.project_set.all():
         if p.workflow_enabled:
-            w = Workflow.get_for_project(p)
-            if w.approve_enabled:
+            if resolver.resolve_project(p).approve_enabled:
                 return True
 
     return False
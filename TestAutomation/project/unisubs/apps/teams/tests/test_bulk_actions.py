@@ -0,0 +1,147 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.test import TestCase
+from nose.tools import *
+
+from subtitles.models import SubtitleVersion
+from teams.bulk_actions import BulkTaskCompletion
+from teams.models import Task, TeamMember, TeamLanguagePreference, Workflow
+from utils.factories import *
+from utils.test_utils import *
+
+APPROVED = Task.APPROVED_IDS['Approved']
+REJECTED = Task.APPROVED_IDS['Rejected']
+NOTIFICATIONS = [
+    'approved_notification',
+    'reviewed_and_pending_approval',
+    'reviewed_and_published',
+    'reviewed_and_sent_back',
+]
+
+class BulkTaskCompletionTest(TestCase):
+    """Check that BulkTaskCompletion matches completing tasks one by one."""
+    def setUp(self):
+        self.admin = UserFactory()
+        self.subtitler = UserFactory()
+
+    def make_team(self, review_allowed, approve_allowed):
+        team = TeamFactory(workflow_enabled=True)
+        TeamMemberFactory(team=team, user=self.admin,
+                          role=TeamMember.ROLE_ADMIN)
+        TeamMemberFactory(team=team, user=self.subtitler,
+                          role=TeamMember.ROLE_CONTRIBUTOR)
+        WorkflowFactory(team=team, review_allowed=review_allowed,
+                        approve_allowed=approve_allowed,
+                        autocreate_translate=True)
+        TeamLanguagePreference.objects.create(team=team, language_code='fr',
+                                              preferred=True)
+        team_videos = [
+            TeamVideoFactory(team=team,
+                             video__primary_audio_language_code='en')
+            for i in range(3)
+        ]
+        return team, team_videos
+
+    def make_tasks(self, team_videos, stage):
+        for tv in team_videos:
+            if stage == 'review':
+                task = TaskFactory.create_review(tv, 'en', self.subtitler)
+            else:
+                task = TaskFactory.create_approve(tv, 'en', self.admin,
+                                                  subtitler=self.subtitler)
+        return list(Task.objects.incomplete()
+                    .filter(team_video__in=team_videos)
+                    .order_by('id'))
+
+    def snapshot(self, team_videos):
+        rv = []
+        for tv in team_videos:
+            tasks = sorted(
+                (t.type, t.language, t.assignee_id, t.approved,
+                 t.completed is not None, t.new_subtitle_version_id is not None)
+                for t in Task.objects.filter(team_video=tv))
+            languages = sorted(
+                (sl.language_code, sl.subtitles_complete)
+                for sl in tv.video.newsubtitlelanguage_set.all())
+            versions = sorted(
+                (v.language_code, v.version_number, v.visibility,
+                 sorted((m.key, m.data) for m in v.metadata.all()))
+                for v in SubtitleVersion.objects.filter(video=tv.video))
+            rv.append((tasks, languages, versions))
+        return rv
+
+    def run_both(self, workflow_settings, stage, approved):
+        mocks = dict((name, mock.Mock()) for name in NOTIFICATIONS)
+        def notifications():
+            return sorted((name, mocks[name].delay.call_count)
+                          for name in NOTIFICATIONS)
+
+        with mock.patch.multiple('messages.tasks', **mocks):
+            team, team_videos = self.make_team(*workflow_settings)
+            tasks = self.make_tasks(team_videos, stage)
+            for m in mocks.values():
+                m.reset_mock()
+            for task in tasks:
+                task.assignee = self.admin
+                task.approved = approved
+                task.complete()
+            per_task = self.snapshot(team_videos)
+            per_task_notifications = notifications()
+
+            team, team_videos = self.make_team(*workflow_settings)
+            tasks = self.make_tasks(team_videos, stage)
+            for m in mocks.values():
+                m.reset_mock()
+            BulkTaskCompletion(self.admin, approved).run(
+                team.get_tasks([t.pk for t in tasks]))
+            bulk = self.snapshot(team_videos)
+            bulk_notifications = notifications()
+
+        assert_equal(bulk, per_task)
+        assert_equal(bulk_notifications, per_task_notifications)
+
+    def test_approve(self):
+        self.run_both((Workflow.REVIEW_IDS['Admin must review'],
+                       Workflow.APPROVE_IDS['Admin must approve']),
+                      'approve', APPROVED)
+
+    def test_reject_approve(self):
+        self.run_both((Workflow.REVIEW_IDS['Admin must review'],
+                       Workflow.APPROVE_IDS['Admin must approve']),
+                      'approve', REJECTED)
+
+    def test_review_then_approve(self):
+        self.run_both((Workflow.REVIEW_IDS['Admin must review'],
+                       Workflow.APPROVE_IDS['Admin must approve']),
+                      'review', APPROVED)
+
+    def test_review_and_publish(self):
+        self.run_both((Workflow.REVIEW_IDS['Admin must review'],
+                       Workflow.APPROVE_IDS["Don't require approval"]),
+                      'review', APPROVED)
+
+    def test_reject_review(self):
+        self.run_both((Workflow.REVIEW_IDS['Admin must review'],
+                       Workflow.APPROVE_IDS["Don't require approval"]),
+                      'review', REJECTED)
+
+    def test_approve_without_review(self):
+        self.run_both((Workflow.REVIEW_IDS["Don't require review"],
+                       Workflow.APPROVE_IDS['Admin must approve']),
+                      'approve', APPROVED)
@@ -20,9 +20,11 @@
 from django.test import TestCase
 
 from teams import tasks
+from teams.videoimport import TeamVideoImporter, progress_key
+from utils import jobprogress
 from utils.factories import *
 from utils.test_utils import *
-from videos.models import Video, make_title_from_url
+from videos.models import Video, VideoUrl, make_title_from_url
 
 class BulkAddVideosTest(TestCase):
     @patch_for_test('teams.tasks.send_templated_email')
@@ -231,3 +233,65 @@ class BulkAddVideosTest(TestCase):
             "Badly formated language for http://example.com/video3.mp4: abcdef, ignoring it.",
             'Number of videos added to team: 3',
         )
+
+    def test_unknown_video_type(self):
+        self.run_add_team_videos([
+            {'url': 'not-a-url'},
+            {'url': self.url},
+        ])
+        self.check_video(self.url)
+        self.check_email('Unknown video type: not-a-url',
+                         'Number of videos added to team: 1')
+
+    def test_already_added(self):
+        VideoFactory(video_url__url=self.url, team=self.team)
+        self.run_add_team_videos([{
+            'url': self.url,
+        }])
+        self.check_email('Video is already added to team: {url}',
+                         'Number of videos added to team: 0')
+
+    def test_duplicate_rows(self):
+        self.run_add_team_videos([
+            {'url': self.url, 'title': 'first'},
+            {'url': self.url, 'title': 'second'},
+        ])
+        self.check_video(self.url, title='first')
+        self.check_email('Video is already added to team: {url}',
+                         'Number of videos added to team: 1')
+
+    def test_dedup_query_per_chunk(self):
+        urls = ['http://example.com/video{}.mp4'.format(i)
+                for i in range(5)]
+        with mock.patch('videos.models.VideoUrl.objects.filter',
+                        wraps=VideoUrl.objects.filter) as mock_filter:
+            with mock.patch.object(TeamVideoImporter, 'chunk_size', 2):
+                self.run_add_team_videos([{'url': url} for url in urls])
+        dedup_calls = [
+            c for c in mock_filter.call_args_list
+            if 'url_hash__in' in c[1]
+        ]
+        assert_equal(len(dedup_calls), 3)
+        for url in urls:
+            self.check_video(url)
+
+    @patch_for_test('utils.jobprogress.update')
+    @patch_for_test('utils.jobprogress.complete')
+    def test_progress(self, mock_complete, mock_update):
+        rows = [{'url': self.url}, {'url': 'http://example.com/video2.mp4'}]
+        self.run_add_team_videos(rows)
+        key = progress_key(self.team, rows)
+        assert_equal(mock_update.call_args_list[-1], mock.call(key, 2, 2))
+        assert_equal(mock_complete.call_args, mock.call(key))
+
+    def test_resume(self):
+        url2 = 'http://example.com/video2.mp4'
+        rows = [{'url': self.url}, {'url': url2}]
+        # Simulate an import that failed after the first row
+        with mock.patch('utils.jobprogress.get') as mock_get:
+            mock_get.return_value = jobprogress.ProgressStatus(1, 2)
+            self.run_add_team_videos(rows)
+        assert_false(VideoUrl.objects.filter(url=self.url).exists())
+        self.check_video(url2)
+        self.check_email('Resuming a previous import after 1 rows',
+                         'Number of videos added to team: 1')
@@ -21,8 +21,11 @@ from __future__ import absolute_import
 from django.test import TestCase
 
 from caching.tests.utils import assert_invalidates_model_cache
-from teams.models import MembershipNarrowing
+from teams import cache as team_cache
+from teams.models import MembershipNarrowing, TeamLanguagePreference
+from utils import translation
 from utils.factories import *
+from utils.test_utils import *
 
 class TeamCacheInvalidationTest(TestCase):
     def setUp(self):
@@ -50,3 +53,71 @@ class TeamCacheInvalidationTest(TestCase):
             narrowing.save()
         with assert_invalidates_model_cache(self.team):
             narrowing.delete()
+
+    def test_change_language_preference(self):
+        with assert_invalidates_model_cache(self.team):
+            tlp = TeamLanguagePreference.objects.create(
+                team=self.team, language_code='en', preferred=True)
+        with assert_invalidates_model_cache(self.team):
+            tlp.save()
+        with assert_invalidates_model_cache(self.team):
+            tlp.delete()
+
+class TeamLanguagePolicyTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        TeamLanguagePreference.objects.create(
+            team=self.team, language_code='en', preferred=True)
+        TeamLanguagePreference.objects.create(
+            team=self.team, language_code='fr', allow_reads=True,
+            allow_writes=False)
+        TeamLanguagePreference.objects.create(
+            team=self.team, language_code='de', allow_reads=False,
+            allow_writes=False)
+
+    def test_policy(self):
+        all_codes = translation.ALL_LANGUAGE_CODES
+        assert_equal(self.team.get_readable_langs(), all_codes - set(['de']))
+        assert_equal(self.team.get_writable_langs(),
+                     all_codes - set(['de', 'fr']))
+        assert_equal(TeamLanguagePreference.objects.get_preferred(self.team),
+                     set(['en']))
+        assert_equal(
+            TeamLanguagePreference.objects.get_blacklisted(self.team),
+            set(['de']))
+
+    def test_one_query_and_local_tier(self):
+        with self.assertNumQueries(1):
+            self.team.get_readable_langs()
+            self.team.get_writable_langs()
+            TeamLanguagePreference.objects.get_preferred(self.team)
+        # the policy is stored in the team's CacheGroup
+        team_cache.clear_local_policies()
+        with self.assertNumQueries(0):
+            self.team.get_writable_langs()
+        # once it's in the local tier, we don't need the cache either
+        with mock.patch('caching.CacheGroup.get') as cache_get:
+            self.team.get_writable_langs()
+        assert_equal(cache_get.call_count, 0)
+
+    def test_invalidate_on_change(self):
+        assert_true('fr' in self.team.get_readable_langs())
+        TeamLanguagePreference.objects.filter(language_code='fr').update(
+            allow_reads=False)
+        # update() doesn't send signals, so we still see the old policy
+        assert_true('fr' in self.team.get_readable_langs())
+        TeamLanguagePreference.objects.get(language_code='fr').save()
+        assert_false('fr' in self.team.get_readable_langs())
+
+    def test_delete_invalidates(self):
+        assert_false('de' in self.team.get_readable_langs())
+        TeamLanguagePreference.objects.filter(language_code='de').delete()
+        assert_true('de' in self.team.get_readable_langs())
+
+    def test_local_tier_expires(self):
+        self.team.get_readable_langs()
+        with mock.patch('time.time') as mock_time:
+            mock_time.return_value = 1e12
+            with self.assertNumQueries(0):
+                # expired from the local tier, but still in the CacheGroup
+                self.team.get_readable_langs()
@@ -19,7 +19,7 @@
 from __future__ import absolute_import
 
 import datetime
-from django.test import TestCase
+from django.test import TestCase, RequestFactory
 from django.urls import reverse
 from teams.models import Team, TeamVideo, TeamMember, Workflow, Task
 from auth.models import CustomUser as User
@@ -38,7 +38,9 @@ from teams.permissions import (
     can_create_task_translate, can_join_team, can_edit_video, can_approve,
     roles_user_can_invite, can_add_video_somewhere, can_assign_tasks,
     can_create_and_edit_translations, save_role, can_remove_video,
-    can_delete_team, can_delete_video, can_post_edit_subtitles, can_manage_subtitles, can_send_email_invite
+    can_delete_team, can_delete_video, can_post_edit_subtitles, can_manage_subtitles, can_send_email_invite,
+    can_perform_task, can_assign_task, can_decline_task, can_delete_task,
+    TeamPermissionContext
 )
 
 
@@ -972,6 +974,104 @@ class TestRules(BaseTestPermission):
         langs = can_create_task_translate(self.nonproject_video, outsider)
         self.assertEqual(langs, [])
 
+class TeamPermissionContextTest(BaseTestPermission):
+    def setUp(self):
+        super(TeamPermissionContextTest, self).setUp()
+        self.update_team(workflow_enabled=True)
+        WorkflowFactory(team=self.team, review_allowed=20,
+                        approve_allowed=20)
+        self.team_videos = [self.project_video, self.nonproject_video]
+        for i in range(3):
+            self.team_videos.append(TeamVideoFactory(team=self.team))
+
+    def reload_team_videos(self):
+        return list(TeamVideo.objects
+                    .filter(id__in=[tv.id for tv in self.team_videos])
+                    .select_related('team', 'project', 'video'))
+
+    def check_evaluate(self, lang=None):
+        actions = TeamPermissionContext.VIDEO_ACTIONS.keys()
+        context = TeamPermissionContext(self.team, self.user)
+        results = context.evaluate(self.reload_team_videos(), actions,
+                                   lang=lang)
+        for tv in self.reload_team_videos():
+            self.assertEqual(results[tv.id], {
+                'edit_video': can_edit_video(tv, self.user),
+                'remove_video': can_remove_video(tv, self.user),
+                'delete_video': can_delete_video(tv, self.user),
+                'change_video_settings': can_change_video_settings(
+                    self.user, tv),
+                'create_subtitles': can_create_and_edit_subtitles(
+                    self.user, tv, lang),
+                'create_translations': can_create_and_edit_translations(
+                    self.user, tv, lang),
+                'review': can_review(tv, self.user, lang),
+                'approve': can_approve(tv, self.user, lang),
+            })
+
+    def test_evaluate_matches_functions(self):
+        self.check_evaluate()
+        for r in [ROLE_CONTRIBUTOR, ROLE_MANAGER, ROLE_ADMIN, ROLE_OWNER]:
+            with self.role(r):
+                self.check_evaluate('en')
+            with self.role(r, project=self.test_project):
+                self.check_evaluate('en')
+            with self.role(r, lang='fr'):
+                self.check_evaluate('en')
+                self.check_evaluate('fr')
+
+    def test_evaluate_query_count(self):
+        TeamMemberFactory(team=self.team, user=self.user,
+                          role=ROLE_MANAGER)
+        actions = TeamPermissionContext.VIDEO_ACTIONS.keys()
+        team_videos = self.reload_team_videos()
+        self.team.uncache_member(self.user)
+        # Loading the member, narrowings, workflows and versions for
+        # review should be the only queries, no matter how many videos there
+        # are.
+        with self.assertNumQueries(4):
+            TeamPermissionContext(self.team, self.user).evaluate(
+                team_videos[:1], actions, lang='en')
+        team_videos = self.reload_team_videos()
+        self.team.uncache_member(self.user)
+        with self.assertNumQueries(4):
+            TeamPermissionContext(self.team, self.user).evaluate(
+                team_videos, actions, lang='en')
+
+    def test_evaluate_tasks(self):
+        TeamMemberFactory(team=self.team, user=self.user,
+                          role=ROLE_MANAGER)
+        tasks = [
+            TaskFactory(team=self.team, team_video=self.team_videos[0],
+                        type=Task.TYPE_IDS['Subtitle']),
+            TaskFactory(team=self.team, team_video=self.team_videos[1],
+                        type=Task.TYPE_IDS['Review'], language='en'),
+            TaskFactory(team=self.team, team_video=self.team_videos[2],
+                        type=Task.TYPE_IDS['Approve'], language='fr',
+                        assignee=self.user),
+        ]
+        context = TeamPermissionContext(self.team, self.user)
+        context.evaluate_tasks(tasks)
+        for task in tasks:
+            reloaded_task = Task.objects.get(id=task.id)
+            self.assertEqual(task.user_permissions, {
+                'perform': can_perform_task(self.user, reloaded_task),
+                'assign': can_assign_task(reloaded_task, self.user),
+                'decline': can_decline_task(reloaded_task, self.user),
+                'delete': can_delete_task(reloaded_task, self.user),
+            })
+
+    def test_for_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        context = TeamPermissionContext.for_request(request, self.team)
+        self.assertIs(TeamPermissionContext.for_request(request, self.team),
+                      context)
+        other_team = TeamFactory()
+        self.assertIsNot(TeamPermissionContext.for_request(request,
+                                                           other_team),
+                         context)
+
 class RolePermissionsTest(BaseTestPermission):
     """ Test a permission using role-based checking
 
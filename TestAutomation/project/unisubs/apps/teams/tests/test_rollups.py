@@ -0,0 +1,145 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2017 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.core.management import call_command
+from django.test import TestCase
+from nose.tools import *
+
+from teams.models import TeamLanguageStats, ProjectVideoStats
+from utils.factories import *
+
+class TeamLanguageStatsTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+
+    def check_stats(self, team, *correct):
+        assert_items_equal(team.get_language_stats(), correct)
+        # the incremental updates should agree with a full recount
+        assert_false(TeamLanguageStats.objects.rebuild_for_team(team))
+
+    def test_video_counts(self):
+        VideoFactory(team=self.team, primary_audio_language_code='en')
+        VideoFactory(team=self.team, primary_audio_language_code='en')
+        VideoFactory(team=self.team, primary_audio_language_code='fr')
+        self.check_stats(self.team, ('en', 2, 0), ('fr', 1, 0))
+
+    def test_completed_counts(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        make_version(video, 'en', subtitles_complete=True)
+        make_version(video, 'de', subtitles_complete=False)
+        self.check_stats(self.team, ('en', 1, 1))
+
+    def test_mark_incomplete(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        version = make_version(video, 'en', subtitles_complete=True)
+        version.subtitle_language.mark_incomplete()
+        self.check_stats(self.team, ('en', 1, 0))
+
+    def test_primary_audio_language_change(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        video.primary_audio_language_code = 'fr'
+        video.save()
+        self.check_stats(self.team, ('fr', 1, 0))
+
+    def test_video_removed(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        make_version(video, 'en', subtitles_complete=True)
+        video.get_team_video().remove(UserFactory())
+        self.check_stats(self.team)
+
+    def test_video_moved(self):
+        other_team = TeamFactory()
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        make_version(video, 'en', subtitles_complete=True)
+        video.get_team_video().move_to(other_team)
+        self.check_stats(self.team)
+        self.check_stats(other_team, ('en', 1, 1))
+
+    def test_video_deleted(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        make_version(video, 'en', subtitles_complete=True)
+        video.delete()
+        self.check_stats(self.team)
+
+    def test_subtitle_language_code_changed(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        version = make_version(video, 'de', subtitles_complete=True)
+        version.subtitle_language.change_language_code('fr')
+        self.check_stats(self.team, ('en', 1, 0), ('fr', 0, 1))
+
+    def test_deltas_stop_at_zero(self):
+        # If the rows have drifted, subtracting shouldn't make the query fail
+        TeamLanguageStats.objects.create(team=self.team, language_code='en',
+                                         video_count=0, completed_count=2)
+        TeamLanguageStats.objects.add_deltas(self.team.id, {'en': (-1, -1)})
+        assert_equal(self.team.get_language_stats(), [('en', 0, 1)])
+
+    def test_rebuild(self):
+        video = VideoFactory(team=self.team, primary_audio_language_code='en')
+        make_version(video, 'en', subtitles_complete=True)
+        TeamLanguageStats.objects.all().delete()
+        assert_true(TeamLanguageStats.objects.rebuild_for_team(self.team))
+        self.check_stats(self.team, ('en', 1, 1))
+
+class ProjectVideoStatsTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.project = ProjectFactory(team=self.team)
+
+    def check_stats(self, project, video_count, videos_without_duration,
+                    total_duration):
+        projects = {
+            p.id: p for p in project.team.projects_with_video_stats()
+        }
+        p = projects[project.id]
+        assert_equal(p.video_count, video_count)
+        assert_equal(p.videos_without_duration, videos_without_duration)
+        assert_equal(p.total_duration, total_duration)
+        assert_false(ProjectVideoStats.objects.rebuild_for_team(project.team))
+
+    def test_durations(self):
+        TeamVideoFactory(team=self.team, project=self.project,
+                         video=VideoFactory(duration=100))
+        TeamVideoFactory(team=self.team, project=self.project,
+                         video=VideoFactory(duration=50))
+        TeamVideoFactory(team=self.team, project=self.project,
+                         video=VideoFactory(duration=None))
+        self.check_stats(self.project, 3, 1, 150)
+        self.check_stats(self.team.default_project, 0, 0, 0)
+
+    def test_duration_changed(self):
+        tv = TeamVideoFactory(team=self.team, project=self.project,
+                              video=VideoFactory(duration=None))
+        tv.video.duration = 60
+        tv.video.save()
+        self.check_stats(self.project, 1, 0, 60)
+
+    def test_moved_between_projects(self):
+        tv = TeamVideoFactory(team=self.team, project=self.project,
+                              video=VideoFactory(duration=100))
+        tv.project = self.team.default_project
+        tv.save()
+        self.check_stats(self.project, 0, 0, 0)
+        self.check_stats(self.team.default_project, 1, 0, 100)
+
+    def test_reconcile_command(self):
+        TeamVideoFactory(team=self.team, project=self.project,
+                         video=VideoFactory(duration=100))
+        ProjectVideoStats.objects.all().delete()
+        call_command('reconcile_team_rollups', self.team.slug)
+        self.check_stats(self.project, 1, 0, 100)
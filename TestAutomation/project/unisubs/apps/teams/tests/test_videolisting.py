@@ -0,0 +1,143 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2017 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.test import TestCase, RequestFactory
+from nose.tools import *
+
+from teams.forms import VideoFiltersForm
+from teams.models import TeamVideoListing
+from utils.factories import *
+from utils.pagination import encode_cursor
+
+class VideoListingTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.project = ProjectFactory(team=self.team)
+        self.videos = []
+        titles = ['delta', 'alpha', 'echo', 'charlie', 'bravo']
+        for i, title in enumerate(titles):
+            video = VideoFactory(
+                title=title, duration=(i + 1) * 300,
+                primary_audio_language_code='en' if i % 2 else 'fr')
+            if i < 3:
+                TeamVideoFactory(team=self.team, video=video,
+                                 project=self.project)
+            else:
+                TeamVideoFactory(team=self.team, video=video)
+            for language_code in ['de', 'es', 'ja'][:i]:
+                make_version(video, language_code, subtitles_complete=True)
+            self.videos.append(video)
+        self.rf = RequestFactory()
+
+    def make_form(self, **data):
+        return VideoFiltersForm(self.team, self.rf.get('/', data).GET)
+
+    def get_page(self, listing, per_page=2, **params):
+        request = self.rf.get('/', params)
+        return listing.paginate(request, per_page)
+
+    def check_matches_queryset(self, **data):
+        form = self.make_form(**data)
+        paginator, page, next_page, prev_page = self.get_page(
+            form.get_listing(), per_page=100)
+        correct = list(form.get_queryset())
+        if data.get('sort') in ('name', '-name'):
+            assert_equal(list(page), correct)
+        else:
+            assert_items_equal(list(page), correct)
+        assert_equal(paginator.count, len(correct))
+
+    def test_filters(self):
+        self.check_matches_queryset()
+        self.check_matches_queryset(project=self.project.slug)
+        self.check_matches_queryset(language='en')
+        self.check_matches_queryset(duration='2')
+        self.check_matches_queryset(sort='name')
+        self.check_matches_queryset(sort='-name')
+        self.check_matches_queryset(sort='subs')
+        self.check_matches_queryset(language='fr', sort='-name')
+
+    def test_subs_sort(self):
+        form = self.make_form(sort='-subs')
+        paginator, page, next_page, prev_page = self.get_page(
+            form.get_listing(), per_page=100)
+        assert_equal([v.listing_row.completed_count for v in page],
+                     [3, 3, 2, 1, 0])
+
+    def test_keyset_paging(self):
+        listing = self.make_form(sort='name').get_listing()
+        paginator, page, next_page, prev_page = self.get_page(listing)
+        assert_equal([v.title for v in page], ['alpha', 'bravo'])
+        assert_equal(prev_page, '')
+        seen = [v.title for v in page]
+        while next_page:
+            params = self.rf.get('/' + next_page).GET.dict()
+            paginator, page, next_page, prev_page = self.get_page(
+                listing, **params)
+            seen.extend(v.title for v in page)
+        assert_equal(seen, ['alpha', 'bravo', 'charlie', 'delta', 'echo'])
+        assert_equal(page.number, 3)
+        assert_equal((page.start_index(), page.end_index()), (5, 5))
+        # go back a page
+        params = self.rf.get('/' + prev_page).GET.dict()
+        paginator, page, next_page, prev_page = self.get_page(
+            listing, **params)
+        assert_equal([v.title for v in page], ['charlie', 'delta'])
+        assert_equal(page.number, 2)
+
+    def test_page_number_without_cursor(self):
+        listing = self.make_form(sort='name').get_listing()
+        paginator, page, next_page, prev_page = self.get_page(listing,
+                                                              page='2')
+        assert_equal([v.title for v in page], ['charlie', 'delta'])
+
+    def test_tampered_cursor(self):
+        # cursor values that don't fit the ordering fields should be treated
+        # like a missing cursor
+        listing = self.make_form(sort='-time').get_listing()
+        for position in (['x', 'y'], ['x'], [1, 2]):
+            paginator, page, next_page, prev_page = self.get_page(
+                listing, page='2', after=encode_cursor(position))
+            assert_equal(len(page), 2)
+
+    def test_count_is_cached(self):
+        listing = self.make_form(language='en').get_listing()
+        assert_equal(listing.count(), 2)
+        with self.assertNumQueries(0):
+            assert_equal(listing.count(), 2)
+        # changing a listing row should invalidate the count
+        video = self.videos[0]
+        video.primary_audio_language_code = 'en'
+        video.save()
+        assert_equal(listing.count(), 3)
+
+    def test_updates(self):
+        video = self.videos[0]
+        video.title = 'Zulu'
+        video.save()
+        make_version(video, 'pt', subtitles_complete=True)
+        row = TeamVideoListing.objects.get(video=video)
+        assert_equal(row.title_sort, 'zulu')
+        assert_equal(row.completed_count, 1)
+        assert_false(TeamVideoListing.objects.rebuild_for_team(self.team))
+
+    def test_remove_video(self):
+        video = self.videos[0]
+        video.get_team_video().remove(UserFactory())
+        assert_false(TeamVideoListing.objects.filter(video=video).exists())
+        assert_equal(self.make_form().get_listing().count(), 4)
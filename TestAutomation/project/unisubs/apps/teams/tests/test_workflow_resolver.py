@@ -0,0 +1,98 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.test import TestCase
+from nose.tools import *
+
+from teams.models import Workflow, WorkflowResolver
+from utils.factories import *
+
+class WorkflowResolverTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory(workflow_enabled=True)
+        self.enabled_project = ProjectFactory(team=self.team,
+                                              workflow_enabled=True)
+        self.disabled_project = ProjectFactory(team=self.team,
+                                               workflow_enabled=False)
+        self.team_workflow = WorkflowFactory(team=self.team)
+        WorkflowFactory(team=self.team, project=self.enabled_project)
+        WorkflowFactory(team=self.team, project=self.disabled_project)
+        self.team_videos = [
+            TeamVideoFactory(team=self.team),
+            TeamVideoFactory(team=self.team, project=self.enabled_project),
+            TeamVideoFactory(team=self.team, project=self.disabled_project),
+        ]
+        self.video_workflow = WorkflowFactory(
+            team=self.team, team_video=self.team_videos[0])
+
+    def check_matches_get_for_target(self, team):
+        resolver = WorkflowResolver.for_team(team)
+        for tv in self.team_videos:
+            correct = Workflow.get_for_target(tv.id, 'team_video')
+            assert_equal(resolver.resolve_team_video(tv).pk, correct.pk)
+        for project in (self.enabled_project, self.disabled_project):
+            correct = Workflow.get_for_target(project.id, 'project')
+            assert_equal(resolver.resolve_project(project).pk, correct.pk)
+        assert_equal(resolver.resolve_team().pk,
+                     Workflow.get_for_target(team.id, 'team').pk)
+
+    def test_matches_get_for_target(self):
+        self.check_matches_get_for_target(self.team)
+
+    def test_matches_get_for_target_workflows_disabled(self):
+        self.team.workflow_enabled = False
+        self.team.save()
+        self.check_matches_get_for_target(self.team)
+
+    def test_default_workflow(self):
+        team = TeamFactory(workflow_enabled=False)
+        workflow = WorkflowResolver.for_team(team).resolve_team()
+        assert_equal(workflow.pk, None)
+        assert_equal(workflow.team, team)
+
+    def test_cached(self):
+        WorkflowResolver.for_team(self.team)
+        with self.assertNumQueries(0):
+            WorkflowResolver.for_team(self.team)
+
+    def test_add_to_team_videos(self):
+        Workflow.add_to_team_videos(self.team_videos)
+        with self.assertNumQueries(0):
+            for tv in self.team_videos:
+                assert_equal(Workflow.get_for_team_video(tv), tv.workflow)
+        assert_equal(self.team_videos[0].workflow, self.video_workflow)
+        assert_equal(self.team_videos[2].workflow, self.team_workflow)
+
+    def test_workflow_save_invalidates(self):
+        WorkflowResolver.for_team(self.team)
+        self.video_workflow.delete()
+        resolver = WorkflowResolver.for_team(self.team)
+        assert_equal(resolver.resolve_team_video(self.team_videos[0]),
+                     self.team_workflow)
+        self.team_workflow.review_allowed = 0
+        self.team_workflow.save()
+        resolver = WorkflowResolver.for_team(self.team)
+        assert_equal(resolver.resolve_team().review_allowed, 0)
+
+    def test_project_save_invalidates(self):
+        WorkflowResolver.for_team(self.team)
+        self.disabled_project.workflow_enabled = True
+        self.disabled_project.save()
+        resolver = WorkflowResolver.for_team(self.team)
+        assert_equal(resolver.resolve_project(self.disabled_project).project,
+                     self.disabled_project)
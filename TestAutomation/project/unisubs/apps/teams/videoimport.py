@@ -0,0 +1,279 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""teams.videoimport -- Bulk import team videos from CSV rows
+
+The import runs in 2 passes.  First we validate all rows: match the URLs to
+video types and parse the language and duration fields.  This doesn't touch
+the DB or network.  Then we import the rows in chunks, each chunk going
+through these stages:
+
+    - dedup: filter out URLs that are already added to the team, using a
+      single query on VideoUrl.url_hash
+    - projects: look up the projects for the chunk, creating any new ones
+    - metadata: call VideoType.prefetch_metadata() and download the
+      transcripts for the new rows using a bounded thread pool, since it's
+      mostly waiting on HTTP calls
+    - insert: create the videos
+
+After each chunk, we record our position using utils.jobprogress.  If the
+import fails and is run again with the same rows, we resume from the last
+completed chunk.  Rows before that point were either added or are filtered
+out by the dedup stage, so re-running a chunk is safe.
+"""
+
+from functools import partial
+import hashlib
+import logging
+
+from django.utils.translation import ugettext as _
+import requests
+
+from utils import jobprogress
+from utils.panslugify import pan_slugify
+from utils.text import fmt
+from utils.translation import SUPPORTED_LANGUAGE_CODES
+
+logger = logging.getLogger('teams.videoimport')
+
+def progress_key(team, rows):
+    """Get the utils.jobprogress key for a team video import."""
+    digest = hashlib.md5()
+    for row in rows:
+        digest.update(row['url'].encode('utf-8'))
+        digest.update('\n')
+    return 'team-video-import-{}-{}'.format(team.id, digest.hexdigest())
+
+class ImportItem(object):
+    """Validated version of a CSV row."""
+    def __init__(self, row):
+        from videos.types import video_type_registrar
+        self.url = row['url']
+        try:
+            self.video_type = video_type_registrar.video_type_for_url(self.url)
+            self.url = self.video_type.convert_to_video_url()
+        except:
+            self.video_type = None
+        self.title = row.get('title')
+        self.description = row.get('description')
+        self.language_text = row.get('language')
+        self.language = None
+        if self.language_text:
+            language = self.language_text.lower()
+            if language in SUPPORTED_LANGUAGE_CODES:
+                self.language = language
+        self.duration_text = row.get('duration')
+        self.duration = None
+        if self.duration_text:
+            try:
+                self.duration = int(self.duration_text)
+            except ValueError:
+                pass
+        self.project_name = row.get('project')
+        self.transcript_url = row.get('transcript')
+        self.transcript_response = None
+        self.duplicate = False
+
+    def should_fetch_transcript(self):
+        return bool(self.transcript_url and self.language)
+
+class TeamVideoImporter(object):
+    """Import videos from a list of CSV rows."""
+
+    # Number of rows to handle at once
+    chunk_size = 100
+    # Max number of threads to use to fetch video metadata
+    metadata_workers = 8
+
+    def __init__(self, team, user, rows):
+        """Create a TeamVideoImporter
+
+        :param team: Team to add the videos to
+        :param user: User adding the videos
+        :param rows: list of dicts mapping CSV column names to values
+        """
+        self.team = team
+        self.user = user
+        self.rows = rows
+        self.progress_key = progress_key(team, rows)
+        self.messages = []
+        self.num_successful_videos = 0
+        self.projects = {}
+        self.seen_urls = set()
+
+    def run(self):
+        items = [ImportItem(row) for row in self.rows]
+        total = len(items)
+        start = self.resume_position(total)
+        if start:
+            self.messages.append(fmt(
+                _(u"Resuming a previous import after %(num)i rows\n"),
+                num=start))
+        jobprogress.update(self.progress_key, start, total)
+        for chunk_start in xrange(start, total, self.chunk_size):
+            chunk = items[chunk_start:chunk_start+self.chunk_size]
+            self.import_chunk(chunk)
+            jobprogress.update(self.progress_key, chunk_start + len(chunk),
+                               total)
+        jobprogress.complete(self.progress_key)
+
+    def resume_position(self, total):
+        progress = jobprogress.get(self.progress_key)
+        if progress is not None and progress.total == total:
+            return progress.current
+        else:
+            return 0
+
+    def import_chunk(self, items):
+        valid_items = [item for item in items if item.video_type is not None]
+        self.find_duplicates(valid_items)
+        new_items = [item for item in valid_items if not item.duplicate]
+        self.lookup_projects(new_items)
+        self.fetch_metadata(new_items)
+        for item in items:
+            if item.video_type is None:
+                self.messages.append(fmt(_(u"Unknown video type: %(url)s\n"),
+                                         url=item.url))
+            elif item.duplicate:
+                self.messages.append(fmt(
+                    _(u"Video is already added to team: %(url)s\n"),
+                    url=item.url))
+            else:
+                self.insert(item)
+
+    def find_duplicates(self, items):
+        """Mark items with URLs that are already added to the team
+
+        This uses 1 query to check all URLs.  Items that have the same URL
+        as an earlier row are also marked.
+        """
+        from videos.models import VideoUrl, url_hash
+
+        # Filter on url_hash since it's indexed, then check the URLs to guard
+        # against hash collisions
+        existing_urls = set(
+            VideoUrl.objects
+            .filter(url_hash__in=set(url_hash(i.url) for i in items),
+                    team_id=self.team.id)
+            .values_list('url', flat=True))
+        for item in items:
+            if item.url in existing_urls or item.url in self.seen_urls:
+                item.duplicate = True
+            self.seen_urls.add(item.url)
+
+    def lookup_projects(self, items):
+        from teams.models import Project
+
+        slugs = {}
+        for item in items:
+            if item.project_name:
+                slug = pan_slugify(item.project_name)
+                if slug not in self.projects:
+                    slugs.setdefault(slug, item.project_name)
+        if not slugs:
+            return
+        for project in self.team.project_set.filter(slug__in=slugs.keys()):
+            self.projects[project.slug] = project
+        for slug, name in slugs.items():
+            if slug not in self.projects:
+                self.projects[slug], created = Project.objects.get_or_create(
+                    team=self.team, slug=slug, defaults={'name': name})
+
+    def get_project(self, item):
+        if item.project_name:
+            return self.projects[pan_slugify(item.project_name)]
+        else:
+            return self.team.default_project
+
+    def fetch_metadata(self, items):
+        from videos.types import prefetch_metadata
+        prefetch_metadata(
+            [item.video_type for item in items], self.user, self.team,
+            self.metadata_workers, extra_fetches=[
+                (item.transcript_url,
+                 partial(self.fetch_transcript_for_item, item))
+                for item in items if item.should_fetch_transcript()
+            ])
+
+    def fetch_transcript_for_item(self, item):
+        item.transcript_response = self.fetch_transcript(item)
+
+    def fetch_transcript(self, item):
+        try:
+            return requests.get(item.transcript_url)
+        except Exception, e:
+            return e
+
+    def insert(self, item):
+        from teams.models import TeamVideo
+        from videos.models import Video
+
+        project = self.get_project(item)
+
+        def setup_video(video, video_url):
+            video.is_public = self.team.videos_public()
+            if item.title:
+                video.title = item.title
+            if item.description:
+                video.description = item.description
+            if item.language:
+                video.primary_audio_language_code = item.language
+            elif item.language_text:
+                self.messages.append(fmt(_(u"Badly formated language for %(url)s: %(language)s, ignoring it."), url=video_url, language=item.language_text))
+            if item.duration_text and not video.duration:
+                if item.duration is not None:
+                    video.duration = item.duration
+                else:
+                    self.messages.append(fmt(_(u"Badly formated duration for %(url)s: %(duration)s, ignoring it."), url=video_url, duration=item.duration_text))
+            TeamVideo.objects.create(video=video, team=self.team,
+                                     project=project, added_by=self.user)
+
+        try:
+            video, video_url = Video.add(item.video_type, self.user,
+                                         setup_video, self.team)
+        except Video.DuplicateUrlError, e:
+            self.messages.append(fmt(
+                _(u"Video is already added to team: %(url)s\n"),
+                url=e.video_url))
+            return
+
+        if item.transcript_url and video.primary_audio_language_code:
+            self.add_transcript(item, video)
+        self.num_successful_videos += 1
+
+    def add_transcript(self, item, video):
+        from subtitles.pipeline import add_subtitles
+        from utils.subtitles import load_subtitles
+
+        try:
+            response = item.transcript_response
+            if response is None:
+                # The language came from the video type, so we didn't know
+                # to fetch the transcript ahead of time.
+                response = self.fetch_transcript(item)
+            if isinstance(response, Exception):
+                raise response
+            if not response.ok:
+                raise Exception("Request not successful")
+            sub_type = item.transcript_url.split(".")[-1]
+            subs = load_subtitles(video.primary_audio_language_code,
+                                  response.text, sub_type)
+            add_subtitles(video, video.primary_audio_language_code, subs)
+        except Exception, e:
+            logger.error("Error while importing transcript file: {}".format(str(e)))
+            self.messages.append(fmt(_(u"Invalid transcript file or language code for video %(url)s\n"), url=item.url))
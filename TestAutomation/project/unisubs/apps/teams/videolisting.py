@@ -0,0 +1,126 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+teams.videolisting -- Filter and sort team videos using TeamVideoListing
+
+The team videos page filters by project, language and duration, and sorts by
+date, title or number of completed languages.  Doing that on the videos
+table means joining videos, team videos and subtitle languages, then running
+a COUNT(*) for the paginator.  For large teams that's slow.
+
+Instead, we read from the TeamVideoListing table, which has one row per team
+video and covering indexes for each sort order.  Pages are fetched using
+keyset pagination and the total count for each combination of filters is
+cached in a CacheGroup that gets invalidated whenever a listing row changes.
+"""
+
+import hashlib
+
+from teams.models import TeamVideoListing
+from utils.pagination import KeysetPaginator
+from videos.forms import VideoDurationField
+from videos.models import Video
+
+# Map sort values from VideoFiltersForm to orderings.  Each ordering ends with
+# the primary key to make it unique.
+ORDERINGS = {
+    'name': ('title_sort', 'team_video_id'),
+    '-name': ('-title_sort', '-team_video_id'),
+    'subs': ('completed_count', 'team_video_id'),
+    '-subs': ('-completed_count', '-team_video_id'),
+    'time': ('created', 'team_video_id'),
+    '-time': ('-created', '-team_video_id'),
+}
+
+class VideoListing(object):
+    """List of team videos matching a set of filters
+
+    Args:
+        team: Team to list videos for
+        project: Project or project slug to filter by
+        language: primary audio language code to filter by
+        duration: VideoDurationField value to filter by
+        q: search query
+        sort: one of the keys from ORDERINGS
+    """
+    def __init__(self, team, project=None, language=None, duration=None,
+                 q=None, sort=None):
+        self.team = team
+        self.filters = {}
+        if project:
+            if isinstance(project, basestring):
+                self.filters['project__slug'] = project
+            else:
+                self.filters['project_id'] = project.id
+        if language:
+            self.filters['language_code'] = language
+        if duration:
+            self.filters.update(VideoDurationField.filter_data(duration))
+        self.q = q
+        self.sort = sort if sort in ORDERINGS else '-time'
+
+    @property
+    def ordering(self):
+        return ORDERINGS[self.sort]
+
+    def queryset(self):
+        qs = TeamVideoListing.objects.filter(team=self.team, **self.filters)
+        if self.q:
+            qs = qs.filter(video__in=Video.objects.search(self.q))
+        return qs
+
+    def signature(self):
+        """Get a string that identifies the set of rows we list
+
+        This doesn't include the sort order, since it doesn't affect the
+        count.
+        """
+        parts = sorted('{}={}'.format(k, v) for k, v in self.filters.items())
+        if self.q:
+            parts.append(u'q={}'.format(self.q).encode('utf-8'))
+        return hashlib.sha1('&'.join(parts)).hexdigest()
+
+    def count(self):
+        cache = TeamVideoListing.count_cache(self.team.id)
+        return cache.get_or_calc('count:{}'.format(self.signature()),
+                                 self.queryset().count)
+
+    def paginate(self, request, per_page):
+        """Paginate the listing
+
+        Returns: (paginator, page, next_page_link, prev_page_link) tuple.  The
+        page contains Video objects, with teamvideo and listing_row set.
+        """
+        qs = self.queryset().select_related('team_video__video')
+        paginator = KeysetPaginator(qs, per_page, self.ordering,
+                                    count=self.count)
+        page = paginator.get_page(request)
+        # the cursor links are built from the listing rows, so calculate them
+        # before replacing the rows with videos
+        next_page, prev_page = paginator.make_next_previous_page_links(
+            page, request)
+        page.object_list = [self.row_to_video(row) for row in page]
+        return paginator, page, next_page, prev_page
+
+    def row_to_video(self, row):
+        team_video = row.team_video
+        video = team_video.video
+        video.teamvideo = team_video
+        video.listing_row = row
+        return video
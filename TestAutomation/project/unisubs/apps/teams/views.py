@@ -69,7 +69,8 @@ from teams.permissions import (
     roles_user_can_assign, can_join_team, can_edit_video, can_delete_tasks,
     can_perform_task, can_rename_team, can_change_team_settings,
     can_perform_task_for, can_delete_team, can_delete_video, can_remove_video,
-    can_move_videos, can_view_stats_tab, can_sort_by_primary_language
+    can_move_videos, can_view_stats_tab, can_sort_by_primary_language,
+    TeamPermissionContext
 )
 from teams.signals import api_teamvideo_new
 from teams.tasks import (
@@ -599,9 +600,6 @@ def detail(request, slug, project_slug=None, languages=None):
     team_video_md_list, pagination_info = paginate(qs, per_page, request.GET.get('page'))
     extra_context.update(pagination_info)
     extra_context['team_video_md_list'] = team_video_md_list
-    extra_context['team_workflows'] = list(
-        Workflow.objects.filter(team=team.id)
-                        .select_related('project', 'team', 'team_video'))
 
     if not filtered and not query:
         if project:
@@ -783,9 +781,6 @@ def move_videos(request, slug, project_slug=None, languages=None):
     team_video_md_list, pagination_info = paginate(qs, per_page, request.GET.get('page'))
     extra_context.update(pagination_info)
     extra_context['team_video_md_list'] = team_video_md_list
-    extra_context['team_workflows'] = list(
-        Workflow.objects.filter(team=team.id)
-                        .select_related('project', 'team', 'team_video'))
 
     if not filtered and not query:
         if project:
@@ -1136,10 +1131,7 @@ def approvals(request, slug):
             # Not sure about the best place to add that code
             tasks = team.get_tasks(approvals)
             try:
-                tasks.update(assignee=request.user,
-                             approved=Task.APPROVED_IDS['Approved'],
-                             completed=datetime.now())
-                complete_approve_tasks(tasks)
+                complete_approve_tasks(tasks, request.user)
             except:
                 HttpResponseForbidden(_(u'Invalid task to approve'))
 
@@ -1665,6 +1657,8 @@ def team_tasks(request, slug, project_slug=None):
             'new_subtitle_version__subtitle_language',
             'new_subtitle_version__author'))
     tasks.sort(key=lambda t: task_ids.index(t.pk))
+    permissions_context = TeamPermissionContext.for_request(request, team)
+    permissions_context.evaluate_tasks(tasks)
 
     if filters.get('team_video'):
         filters['team_video'] = TeamVideo.objects.get(pk=filters['team_video'])
@@ -1699,8 +1693,8 @@ def team_tasks(request, slug, project_slug=None):
     context = {
         'team': team,
         'project': project, # TODO: Review
-        'user_can_delete_tasks': can_delete_tasks(team, request.user),
-        'user_can_assign_tasks': can_assign_tasks(team, request.user),
+        'user_can_delete_tasks': permissions_context.can_delete_tasks(),
+        'user_can_assign_tasks': permissions_context.can_assign_tasks(),
         'assign_form': TaskAssignForm(team, member),
         'languages': languages,
         'tasks': tasks,
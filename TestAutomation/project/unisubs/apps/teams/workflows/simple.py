@@ -165,7 +165,7 @@ def dashboard(request, team):
 
     top_languages = [
         (get_language_label(lc), count)
-        for lc, count in team.get_completed_language_counts() if count > 0
+        for lc, video_count, count in team.get_language_stats() if count > 0
     ]
     top_languages.sort(key=lambda pair: pair[1], reverse=True)
 
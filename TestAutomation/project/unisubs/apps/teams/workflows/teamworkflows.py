@@ -49,6 +49,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ungettext, ugettext as _, ugettext_lazy
 
 from activity.models import ActivityRecord
+from videos.listing import annotate_videos
 from videos.models import Video
 from subtitles.models import SubtitleLanguage
 from teams import experience
@@ -239,9 +240,8 @@ class TeamWorkflow(object):
     # these can be used to customize the content in the project/language
     # manager pages
     def render_project_page(self, request, team, project, page_data):
-        page_data['videos'] = (team.videos
-                             .filter(teamvideo__project=project)
-                             .order_by('-id'))[:5]
+        page_data['videos'] = annotate_videos(
+            team.videos.filter(teamvideo__project=project).order_by('-id')[:5])
 
         return render(request, 'new-teams/project-page.html', page_data)
 
@@ -252,7 +252,7 @@ class TeamWorkflow(object):
         qs = (self.team.videos
               .filter(primary_audio_language_code=language_code)
               .order_by('-id'))
-        page_data['videos']= qs[:5]
+        page_data['videos'] = annotate_videos(qs[:5])
         return render(request, 'new-teams/language-page.html', page_data)
 
     def fetch_member_history(self, user, query=None):
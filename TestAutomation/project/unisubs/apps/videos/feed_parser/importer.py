@@ -16,12 +16,35 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-"""videos.feed_parser.import -- Import videos from a feed."""
+"""videos.feed_parser.import -- Import videos from a feed.
 
+Each page of the feed goes through a pipeline of stages:
+
+    - parse: parse the feed and match entries to video types
+    - dedup: filter out URLs that we've already imported, using a single
+      query on VideoUrl.url_hash
+    - metadata: call VideoType.prefetch_metadata() for the new entries using
+      a bounded thread pool, since it's mostly waiting on HTTP calls
+    - insert: create the videos
+
+The time spent in each stage is stored in VideoImporter.timings.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import time
+
+from videos.types import prefetch_metadata
 from .parser import FeedParser
 
+STAGES = ('parse', 'dedup', 'metadata', 'insert')
+
 class VideoImporter(object):
     """Import videos from a feed URL."""
+
+    # Max number of threads to use to fetch video metadata
+    metadata_workers = 8
+
     def __init__(self, url, user, team):
         """Create a VideoImporter
 
@@ -34,10 +57,12 @@ class VideoImporter(object):
         self.team = team
         self.checked_entries = 0
         self.last_link = ''
+        self.timings = OrderedDict((stage, 0.0) for stage in STAGES)
 
     def import_videos(self, import_next=False):
         self._created_videos = []
-        feed_parser = FeedParser(self.url)
+        with self._time_stage('parse'):
+            feed_parser = FeedParser(self.url)
         # the link at the top of the feed should be the latest link
         try:
             self.last_link = feed_parser.feed.entries[0]['link']
@@ -61,29 +86,57 @@ class VideoImporter(object):
 
         while next_urls:
             url = next_urls[0]['href']
-            feed_parser = FeedParser(url)
+            with self._time_stage('parse'):
+                feed_parser = FeedParser(url)
             last_created_video_count = len(self._created_videos)
             self._create_videos(feed_parser)
             next_urls = self._next_urls(feed_parser)
 
+    @contextmanager
+    def _time_stage(self, stage):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.time() - start_time
+
     def _create_videos(self, feed_parser):
-        from videos.models import VideoUrl
+        with self._time_stage('parse'):
+            items = list(feed_parser.items(ignore_error=True))
+        with self._time_stage('dedup'):
+            new_items = self._filter_existing_items(items)
+        with self._time_stage('metadata'):
+            prefetch_metadata([vt for vt, info, entry in new_items],
+                              self.user, self.team, self.metadata_workers)
+        with self._time_stage('insert'):
+            for vt, info, entry in new_items:
+                self._create_video(vt, info, entry)
+        self.checked_entries += len(items)
 
-        items = list(feed_parser.items(ignore_error=True))
+    def _filter_existing_items(self, items):
+        """Filter out items without a video type or with an existing URL
 
-        urls = [
-            vt.convert_to_video_url()
-            for vt, info, entry in items
+        This uses 1 query to check all URLs.  Items that have the same URL
+        as an earlier item in the feed are also filtered out.
+        """
+        from videos.models import VideoUrl, url_hash
+
+        items = [
+            (vt, info, entry) for (vt, info, entry) in items
             if vt is not None
         ]
-        existing_urls = set(VideoUrl.objects
-                            .filter(url__in=urls)
-                            .values_list('url', flat=True))
-
-        for vt, info, entry in items:
-            if vt and vt.convert_to_video_url() not in existing_urls:
-                self._create_video(vt, info, entry)
-            self.checked_entries += 1
+        urls = [vt.convert_to_video_url() for vt, info, entry in items]
+        # Filter on url_hash since it's indexed, then check the URLs to guard
+        # against hash collisions
+        seen_urls = set(VideoUrl.objects
+                        .filter(url_hash__in=set(url_hash(u) for u in urls))
+                        .values_list('url', flat=True))
+        new_items = []
+        for url, item in zip(urls, items):
+            if url not in seen_urls:
+                new_items.append(item)
+                seen_urls.add(url)
+        return new_items
 
     def _create_video(self, video_type, info, entry):
         from videos.models import Video
@@ -0,0 +1,123 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""videos.listing -- Prepare lists of videos for display
+
+Pages that list videos usually display the same things for each one: the
+title, thumbnail, team/project and some subtitle counts.  Fetching those from
+each Video object means several queries per video.  annotate_videos() fetches
+the data for the whole list up front, using a fixed number of queries, and
+sets up the caches that the Video methods check:
+
+    - get_team_video() / get_team(): 1 query for the team videos, with
+      their team and project
+    - get_primary_videourl_obj() and title_display(): 1 query for the
+      primary URLs
+    - has_public_version(): 1 query
+    - num_completed_languages / num_incomplete_languages: 1 query
+    - all_subtitle_languages() and SubtitleLanguage.has_public_version():
+      2 queries, only if languages=True.  In this case the language counts
+      are calculated from the fetched languages.
+
+The thumbnail URLs are calculated from the video row, so they don't need any
+extra work.
+"""
+
+from subtitles.models import SubtitleLanguage, SubtitleVersion
+from teams.models import TeamVideo
+from videos.models import VideoUrl
+
+def annotate_videos(videos, languages=False):
+    """Fetch the data needed to list a group of videos
+
+    Args:
+        videos: list/queryset of Video objects
+        languages: also fetch all subtitle languages for the videos
+
+    Returns: list of the videos passed in
+    """
+    videos = list(videos)
+    if not videos:
+        return videos
+    _add_team_videos(videos)
+    _add_primary_urls(videos)
+    _add_public_version_flags(videos)
+    if languages:
+        _add_languages(videos)
+    else:
+        _add_language_counts(videos)
+    return videos
+
+def _add_team_videos(videos):
+    to_fetch = dict((v.id, v) for v in videos
+                    if not hasattr(v, '_cached_teamvideo'))
+    if not to_fetch:
+        return
+    qs = (TeamVideo.objects
+          .filter(video_id__in=to_fetch.keys())
+          .select_related('team', 'project'))
+    team_videos = dict((tv.video_id, tv) for tv in qs)
+    for video_id, video in to_fetch.items():
+        team_video = team_videos.get(video_id)
+        if team_video is not None:
+            team_video.video = video
+        video._cached_teamvideo = team_video
+
+def _add_primary_urls(videos):
+    qs = VideoUrl.objects.filter(video_id__in=[v.id for v in videos],
+                                 primary=True)
+    primary_urls = {}
+    for video_url in qs:
+        primary_urls.setdefault(video_url.video_id, video_url)
+    for video in videos:
+        video_url = primary_urls.get(video.id)
+        if video_url is not None:
+            video_url.video = video
+        video._cached_primary_videourl = video_url
+
+def _add_public_version_flags(videos):
+    with_public_versions = set(
+        SubtitleVersion.objects.public()
+        .filter(video_id__in=[v.id for v in videos])
+        .values_list('video_id', flat=True)
+        .distinct())
+    for video in videos:
+        video._has_public_version = video.id in with_public_versions
+
+def _add_language_counts(videos):
+    counts = SubtitleLanguage.count_completed_subtitles(videos)
+    for video in videos:
+        incomplete_count, completed_count = counts[video.id]
+        video.num_incomplete_languages = incomplete_count
+        video.num_completed_languages = completed_count
+
+def _add_languages(videos):
+    languages_by_video = dict((v.id, []) for v in videos)
+    qs = SubtitleLanguage.objects.filter(video_id__in=languages_by_video.keys())
+    for language in qs:
+        languages_by_video[language.video_id].append(language)
+    all_languages = []
+    for video in videos:
+        video_languages = languages_by_video[video.id]
+        video._language_fetcher.set_all_languages(video, video_languages)
+        video.num_completed_languages = len(
+            [l for l in video_languages if l.subtitles_complete])
+        video.num_incomplete_languages = (len(video_languages) -
+                                          video.num_completed_languages)
+        all_languages.extend(video_languages)
+    SubtitleLanguage.bulk_has_public_version(all_languages)
@@ -0,0 +1,97 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2017 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from videos.types import video_type_registrar
+
+# URL shapes that we see in practice from Video.add, feeds and CSV imports
+URL_CORPUS = [
+    'http://www.youtube.com/watch?v=woobL2yAxD4',
+    'https://www.youtube.com/watch?v=woobL2yAxD4&feature=youtu.be',
+    'http://www.youtube.com/watch#!v=UOtJUmiUZ08&feature=featured',
+    'http://www.youtube.com/v/6Z5msRdai-Q',
+    'https://youtube.com/watch?v=_ShmidkrcY0',
+    'http://youtu.be/HaAVZ2yXDBo',
+    'https://m.youtube.com/watch?v=woobL2yAxD4',
+    'https://www.youtube.com/channel/UCwaIk2M6ehBoWs3N0Z2S1fQ',
+    'http://vimeo.com/22070806',
+    'https://vimeo.com/channels/staffpicks/22070806',
+    'https://player.vimeo.com/video/22070806',
+    'http://www.dailymotion.com/video/x7u2ww_juliette-drums_lifestyle',
+    'https://www.dailymotion.com/video/x7u2ww',
+    'https://fast.wistia.net/embed/iframe/abc123def4',
+    'https://home.wistia.com/medias/abc123def4',
+    'http://cdnapi.kaltura.com/p/1492321/sp/149232100/playManifest/entryId/1_zr7niumr/flavorId/1_djpnqf7y/format/url/protocol/http/a.mp4',
+    'http://link.brightcove.com/services/player/bcpid1234?bctid=5678',
+    'http://bcove.me/8wpcbajc',
+    'https://brightcove.hs.llnwd.net/e1/uds/pd/96980657001/96980657001_109379449001_Bird-CommonRedpoll.mp4',
+    'http://bcbolt446c5271-a.akamaihd.net/media/v1/pmp4/static/clear/6057940510001/a.mp4?videoId=1234&pubId=5678',
+    'http://example.com/video.mp4',
+    'https://cdn.example.org/media/2016/lecture-01.webm',
+    'http://example.com/path/to/video.ogv',
+    'http://example.com/video.m4v?token=abcdef',
+    'https://s3.amazonaws.com/bucket/interview.mp3',
+    'http://example.com/old/clip.flv',
+    'http://example.com/not-a-video.html',
+    'https://www.example.com/watch?v=woobL2yAxD4',
+    'ftp://example.com/file.mp4',
+    'some url',
+]
+
+class Command(BaseCommand):
+    help = "Compare URL matching speed of the full type scan and the domain index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', dest='iterations',
+                            type=int, default=1000,
+                            help='Number of passes over the URL corpus')
+
+    def handle(self, **options):
+        iterations = options['iterations']
+        registrar = video_type_registrar
+        for url in URL_CORPUS:
+            full_scan = registrar.find_type(url, registrar.type_list)
+            indexed = registrar.find_type(url,
+                                          registrar.candidate_types(url))
+            if full_scan != indexed:
+                self.stdout.write('MISMATCH: {} ({} vs {})\n'.format(
+                    url, full_scan, indexed))
+
+        full_scan_time = self.time_matching(
+            iterations, lambda url: registrar.type_list)
+        indexed_time = self.time_matching(
+            iterations, registrar.candidate_types)
+        url_count = iterations * len(URL_CORPUS)
+        self.stdout.write('full scan: {:.2f} usec/url\n'.format(
+            full_scan_time * 1000000 / url_count))
+        self.stdout.write('domain index: {:.2f} usec/url\n'.format(
+            indexed_time * 1000000 / url_count))
+        if indexed_time:
+            self.stdout.write('speedup: {:.2f}x\n'.format(
+                full_scan_time / indexed_time))
+
+    def time_matching(self, iterations, get_candidates):
+        find_type = video_type_registrar.find_type
+        start_time = time.time()
+        for i in xrange(iterations):
+            for url in URL_CORPUS:
+                find_type(url, get_candidates(url))
+        return time.time() - start_time
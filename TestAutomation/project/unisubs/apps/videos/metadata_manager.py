@@ -16,58 +16,120 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+"""videos.metadata_manager -- Recompute the denormalized video fields
+
+Several Video columns are calculated from the video's subtitles and team:
+is_public, is_subtitled, was_subtitled, languages_count and complete_date.
+update_metadata() recalculates all of them from a single snapshot of the
+video's languages and their tip versions, then writes the columns that changed
+using one UPDATE.
+
+Code that changes subtitles usually calls schedule_update() via
+videos.tasks.video_changed_tasks().  It waits UPDATE_DELAY seconds before
+running the update and skips scheduling if there's already an update pending
+for the video, so a burst of changes results in a single recompute.
+"""
+
 from datetime import datetime
 
-def update_metadata(video_pk):
-    from videos.models import Video
-    video = Video.objects.get(pk=video_pk)
-    video.edited = datetime.now()
-    video.save()
-    _update_is_public(video)
-    _update_is_was_subtitled(video)
-    _update_languages_count(video)
-    _update_complete_date(video)
+from django_redis import get_redis_connection
+
+# How long to wait before running a scheduled update
+UPDATE_DELAY = 10
+# How long the pending flag lasts.  This is only used if the worker never
+# runs the update.
+PENDING_TIMEOUT = 600
+
+def update_metadata(video_pk, update_search_index=False):
+    """Recalculate the metadata fields for a video
+
+    Args:
+        video_pk: pk of the video to update
+        update_search_index: also recalculate the search_text field
+
+    Returns: the updated Video
+    """
+    from videos.models import Video, MAX_SEACH_TEXT_LENGTH
+    video = Video.objects.select_related('teamvideo__team').get(pk=video_pk)
+    languages = (video.newsubtitlelanguage_set.all()
+                 .fetch_and_join(video=video, private_tips=True))
+    changes = _calc_changes(video, languages)
+    changes['edited'] = datetime.now()
+    if update_search_index:
+        search_text = video.calc_search_text(MAX_SEACH_TEXT_LENGTH)
+        if search_text != video.search_text:
+            changes['search_text'] = search_text
+    Video.objects.filter(pk=video.pk).update(**changes)
+    for name, value in changes.items():
+        setattr(video, name, value)
+    # update() skips the post_save handler, so invalidate the cache ourselves
+    video.cache.invalidate()
     _invalidate_cache(video)
+    return video
 
-def _update_is_was_subtitled(video):
-    from subtitles.models import SubtitleLanguage
-    language_code = video.primary_audio_language_code
-    has_version = (SubtitleLanguage.objects.having_nonempty_tip()
-                                           .filter(video=video, 
-                                                   language_code=language_code)
-                                           .exists())
-
-    if not has_version:
-        if video.is_subtitled:
-            video.is_subtitled = False
-            video.save()
-    else:
-        if not video.is_subtitled or not video.was_subtitled:
-            video.is_subtitled = True
-            video.was_subtitled = True
-            video.save()
+def schedule_update(video_pk):
+    """Schedule an update_metadata() call for a video
 
-def _update_languages_count(video):
-    video.languages_count = video.newsubtitlelanguage_set.having_nonempty_tip().count()
-    video.save()
+    If an update is already pending for the video, then this is a no-op.
+    """
+    from videos.tasks import update_video_metadata
+    r = get_redis_connection('storage')
+    if not r.set(_pending_key(video_pk), 1, nx=True, ex=PENDING_TIMEOUT):
+        return
+    try:
+        update_video_metadata.enqueue_in(UPDATE_DELAY, video_pk)
+    except:
+        r.delete(_pending_key(video_pk))
+        raise
 
-def _update_complete_date(video):
-    is_complete = video.is_complete
-    if is_complete and video.complete_date is None:
-        video.complete_date = datetime.now()
-        video.save()
-    elif not is_complete and video.complete_date is not None:
-        video.complete_date = None
-        video.save()
+def run_scheduled_update(video_pk):
+    """Run an update that was scheduled with schedule_update()."""
+    from videos.models import Video
+    # Clear the pending flag first, so that changes that happen while we're
+    # running schedule another update.
+    get_redis_connection('storage').delete(_pending_key(video_pk))
+    try:
+        update_metadata(video_pk, update_search_index=True)
+    except Video.DoesNotExist:
+        # video deleted before the update ran
+        pass
 
-def _invalidate_cache(video):
-    from widget import video_cache
-    video_cache.invalidate_cache(video.video_id)
+def _pending_key(video_pk):
+    return 'video-metadata-update-pending-{}'.format(video_pk)
 
-def _update_is_public(video):
+def _calc_changes(video, languages):
+    """Calculate the metadata fields for a video
+
+    Returns: dict mapping field names to values for fields that changed.
+    """
     team_video = video.get_team_video()
     if team_video:
-        video.is_public = team_video.team.videos_public()
+        is_public = team_video.team.videos_public()
+    else:
+        is_public = True
+    nonempty_languages = [l for l in languages if _has_nonempty_tip(l)]
+    values = {
+        'is_public': is_public,
+        'languages_count': len(nonempty_languages),
+    }
+    if any(l.language_code == video.primary_audio_language_code
+           for l in nonempty_languages):
+        values['is_subtitled'] = True
+        values['was_subtitled'] = True
     else:
-        video.is_public = True
-    video.save()
+        values['is_subtitled'] = False
+    is_complete = any(l.is_complete_and_synced() for l in languages)
+    if is_complete and video.complete_date is None:
+        values['complete_date'] = datetime.now()
+    elif not is_complete:
+        values['complete_date'] = None
+    return dict((name, value) for name, value in values.items()
+                if getattr(video, name) != value)
+
+def _has_nonempty_tip(language):
+    tip = language.get_tip()
+    return tip is not None and tip.subtitle_count > 0
+
+def _invalidate_cache(video):
+    from widget import video_cache
+    video_cache.invalidate_cache(video.video_id)
@@ -60,7 +60,8 @@ from utils import translation
 from utils.amazon import S3EnabledImageField
 from utils.panslugify import pan_slugify
 from utils.searching import get_terms
-from utils.subtitles import create_new_subtitles, dfxp_merge
+from utils.subtitles import (create_new_subtitles, dfxp_merge_parts,
+                             dfxp_merge_wrapper, DFXP_MERGE_SEPARATOR)
 from utils.text import fmt
 from utils.url_escape import url_escape
 from teams.moderation_const import MODERATION_STATUSES, UNMODERATED
@@ -250,6 +251,14 @@ class SubtitleLanguageFetcher(object):
         self.all_languages_fetched = True
         return languages
 
+    def set_all_languages(self, video, languages):
+        """Fill the cache with languages that were fetched elsewhere."""
+        self.cache = {}
+        for lang in languages:
+            lang.video = video
+            self.cache[lang.language_code] = lang
+        self.all_languages_fetched = True
+
     def prefetch_languages(self, video, languages, with_public_tips,
                            with_private_tips):
         language_qs = video.newsubtitlelanguage_set.all()
@@ -717,6 +726,8 @@ class Video(models.Model):
         This will return a VideoUrl object.
 
         """
+        if hasattr(self, '_cached_primary_videourl'):
+            return self._cached_primary_videourl
         try:
             return self.videourl_set.filter(primary=True).all()[:1].get()
         except models.ObjectDoesNotExist:
@@ -1187,22 +1198,74 @@ class Video(models.Model):
 
     def get_merged_dfxp(self):
         """Get a DFXP file containing subtitles for all languages."""
-        self.prefetch_languages(with_public_tips=True)
-
-        subtitle_sets = []
-        for language in self.all_subtitle_languages():
-            tip = language.get_public_tip()
-            if tip is not None:
-                if language.is_primary_audio_language():
-                    subtitle_sets.insert(0, tip.get_subtitles())
-                else:
-                    subtitle_sets.append(tip.get_subtitles())
-
-        if len(subtitle_sets) > 0:
-            return dfxp_merge(subtitle_sets)
+        chunks = self.get_merged_dfxp_chunks()
+        if chunks is not None:
+            return ''.join(chunks)
         else:
             return None
 
+    def get_merged_dfxp_chunks(self):
+        """Get a DFXP file containing subtitles for all languages in chunks
+
+        This returns a list of strings that join together to make the same
+        output as dfxp_merge() called with the public tip for each language,
+        with the primary audio language first and the rest in the order they
+        were created.  Use it to stream the file
+        rather than building a single string.
+
+        The chunks are cached in our CacheGroup using the public tip version
+        ids as the key, so any new or updated public version results in a
+        new key.  The <div> for each version is cached separately, since
+        versions are never changed.  When one language gets a new version
+        we only render the div for it and reuse the others.
+
+        Returns: list of strings, or None if there are no public versions
+        """
+        from subtitles.models import SubtitleVersion
+
+        tips = sorted(
+            SubtitleVersion.objects.public_tips()
+            .filter(video=self)
+            .values_list('id', 'language_code', 'subtitle_language_id'),
+            key=lambda (version_id, language_code, language_id): (
+                language_code != self.primary_audio_language_code,
+                language_id))
+        if not tips:
+            return None
+        version_ids = [tip[0] for tip in tips]
+        cache_key = 'merged-dfxp-{}'.format(hashlib.sha1(
+            ','.join(str(version_id) for version_id in version_ids)
+        ).hexdigest())
+        chunks = self.cache.get(cache_key)
+        if chunks is None:
+            header, footer = dfxp_merge_wrapper()
+            chunks = [header]
+            for i, div in enumerate(self._get_merged_dfxp_divs(version_ids)):
+                if i > 0:
+                    chunks.append(DFXP_MERGE_SEPARATOR)
+                chunks.append(div)
+            chunks.append(footer)
+            self.cache.set(cache_key, chunks)
+        return chunks
+
+    def _get_merged_dfxp_divs(self, version_ids):
+        from subtitles.models import SubtitleVersion
+
+        div_keys = dict((version_id, 'merged-dfxp-div-{}'.format(version_id))
+                        for version_id in version_ids)
+        divs = cache.get_many(div_keys.values())
+        missing_ids = [version_id for version_id in version_ids
+                       if div_keys[version_id] not in divs]
+        if missing_ids:
+            new_divs = {}
+            for version in SubtitleVersion.objects.full().filter(
+                    id__in=missing_ids):
+                header, div, footer = dfxp_merge_parts(version.get_subtitles())
+                new_divs[div_keys[version.id]] = div
+            cache.set_many(new_divs)
+            divs.update(new_divs)
+        return [divs[div_keys[version_id]] for version_id in version_ids]
+
     def version(self, version_number=None, language=None, public_only=True):
         """Return the SubtitleVersion for this video matching the given criteria.
 
@@ -2306,6 +2369,7 @@ class VideoUrl(models.Model):
         # set this one to primary
         self.primary = True
         self.save(updates_timestamp=False)
+        self.video._cached_primary_videourl = self
         signals.video_url_made_primary.send(sender=self, old_url=old_url,
                                             user=user)
 
@@ -2393,13 +2457,17 @@ class VideoFeed(models.Model):
         importer = VideoImporter(self.url, self.user, self.team)
         new_videos = importer.import_videos(
             import_next=self.last_update is None)
+        # Time spent in each stage of the import, see feed_parser.importer
+        self.last_import_timings = importer.timings
 
         self.last_update = VideoFeed.now()
         self.save()
         # create videos last-to-first so that the latest video is at the top
         # of the list when viewing the imported videos
-        for video in reversed(new_videos):
-            ImportedVideo.objects.create(feed=self, video=video)
+        ImportedVideo.objects.bulk_create([
+            ImportedVideo(feed=self, video=video)
+            for video in reversed(new_videos)
+        ])
         signals.feed_imported.send(sender=self, new_videos=new_videos)
         return new_videos
 
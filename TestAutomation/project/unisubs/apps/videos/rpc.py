@@ -27,6 +27,7 @@ from django.utils.translation import ugettext as _
 from django.utils.translation import ugettext_lazy
 
 from subtitles.models import SubtitleLanguage
+from videos.listing import annotate_videos
 from videos.models import Video
 from videos.tasks import send_change_title_email
 from utils.multi_query_set import MultiQuerySet
@@ -234,7 +235,7 @@ def render_page(page, qs, on_page=30, request=None,
         page_obj = paginator.page(paginator.num_pages)
 
     context = {
-        'video_list': page_obj.object_list,
+        'video_list': annotate_videos(page_obj.object_list),
         'page': page_obj,
         'display_views': display_views
     }
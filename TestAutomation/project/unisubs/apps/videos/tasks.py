@@ -77,10 +77,8 @@ def update_video_feed(video_feed_id):
 @job
 def video_changed_tasks(video_pk, new_version_id=None):
     from videos import metadata_manager
-    from videos.models import Video
-    from teams.models import TeamVideo, BillingRecord
+    from teams.models import BillingRecord
 
-    metadata_manager.update_metadata(video_pk)
     if new_version_id is not None:
         send_new_version_notification(new_version_id)
         try:
@@ -90,9 +88,12 @@ def video_changed_tasks(video_pk, new_version_id=None):
             logger.error("Could not add billing record", extra={
                 "version_pk": new_version_id,
                 "exception": str(e)})
+    metadata_manager.schedule_update(video_pk)
 
-    video = Video.objects.get(pk=video_pk)
-    video.update_search_index()
+@job
+def update_video_metadata(video_pk):
+    from videos import metadata_manager
+    metadata_manager.run_scheduled_update(video_pk)
 
 @job
 def subtitles_complete_changed(language_pk):
@@ -146,8 +147,14 @@ def send_change_title_email(video_id, user_id, old_title, new_title):
 def import_videos_from_feed(feed_id):
     feed = VideoFeed.objects.get(id=feed_id)
     new_videos = feed.update()
+    logger.info('imported %s videos from %s (%s)', len(new_videos), feed.url,
+                ', '.join('{}: {:.2f}s'.format(stage, seconds)
+                          for stage, seconds
+                          in feed.last_import_timings.items()))
     if feed.user is not None:
-        tasks.videos_imported_message.delay(feed.user.id, len(new_videos))
+        tasks.videos_imported_message.delay(
+            feed.user.id, len(new_videos),
+            timings=feed.last_import_timings.items())
 
 def send_new_version_notification(version_id):
     try:
@@ -159,6 +159,52 @@ class VideoImporterTestCase(TestCase):
             VideoUrl.objects.get(url=self.url('item-4')).video,
         ])
 
+    def test_duplicate_items_in_feed(self):
+        self.setup_feed_items([
+            ('item-1', {}),
+            ('item-2', {}),
+            ('item-1', {}),
+        ])
+        self.run_import_videos()
+        self.check_videos('item-1', 'item-2')
+
+    def test_prefetch_metadata(self):
+        VideoFactory(video_url__url=self.url('item-1'))
+        self.setup_feed_items([
+            ('item-1', {}),
+            ('item-2', {}),
+            ('item-3', {}),
+        ])
+        with mock.patch.object(HtmlFiveVideoType,
+                               'prefetch_metadata') as prefetch_metadata:
+            self.run_import_videos()
+        # we should only prefetch metadata for the new items
+        assert_equal(prefetch_metadata.call_count, 2)
+        prefetch_metadata.assert_called_with(self.user, None)
+
+    def test_prefetch_metadata_error(self):
+        # errors prefetching metadata shouldn't stop the import
+        self.setup_feed_items([
+            ('item-1', {}),
+            ('item-2', {}),
+        ])
+        with mock.patch.object(HtmlFiveVideoType,
+                               'prefetch_metadata') as prefetch_metadata:
+            prefetch_metadata.side_effect = ValueError()
+            self.run_import_videos()
+        self.check_videos('item-1', 'item-2')
+
+    def test_timings(self):
+        self.setup_feed_items([
+            ('item-1', {}),
+        ])
+        import_obj = importer.VideoImporter(self.feed_url(), self.user, None)
+        import_obj.import_videos()
+        assert_equal(import_obj.timings.keys(),
+                     ['parse', 'dedup', 'metadata', 'insert'])
+        for seconds in import_obj.timings.values():
+            assert_true(seconds >= 0)
+
     def test_import_extra_links_from_youtube(self):
         # test importing extra items from youtube.
         #
@@ -0,0 +1,151 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from nose.tools import *
+from rest_framework.test import APIClient
+
+from utils.factories import *
+from videos.listing import annotate_videos
+from videos.models import Video, make_title_from_url
+from videos.rpc import render_page
+
+class AnnotateVideosTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.project = ProjectFactory(team=self.team)
+        self.videos = [
+            VideoFactory(title=''),
+            VideoFactory(team=self.team),
+            VideoFactory(),
+        ]
+        TeamVideoFactory(team=self.team, project=self.project,
+                         video=self.videos[2])
+        make_version(self.videos[0], 'en', subtitles_complete=True)
+        make_version(self.videos[0], 'fr', visibility='private',
+                     subtitles_complete=False)
+        make_version(self.videos[1], 'de', visibility='private',
+                     subtitles_complete=False)
+        self.primary_urls = [v.get_primary_videourl_obj()
+                             for v in self.videos]
+
+    def fetch_videos(self):
+        return list(Video.objects.filter(id__in=[v.id for v in self.videos])
+                    .order_by('id'))
+
+    def check_listing_data(self, videos):
+        assert_equal([v.get_team() for v in videos],
+                     [None, self.team, self.team])
+        assert_equal(videos[2].get_team_video().project, self.project)
+        assert_equal([v.get_primary_videourl_obj() for v in videos],
+                     self.primary_urls)
+        assert_equal(videos[0].title_display(),
+                     make_title_from_url(self.primary_urls[0].url))
+        assert_equal([v.has_public_version() for v in videos],
+                     [True, False, False])
+        assert_equal([v.num_completed_languages for v in videos], [1, 0, 0])
+        assert_equal([v.num_incomplete_languages for v in videos], [1, 1, 0])
+
+    def test_annotate(self):
+        videos = annotate_videos(self.fetch_videos())
+        with self.assertNumQueries(0):
+            self.check_listing_data(videos)
+
+    def test_annotate_with_languages(self):
+        videos = annotate_videos(self.fetch_videos(), languages=True)
+        with self.assertNumQueries(0):
+            self.check_listing_data(videos)
+            assert_equal(
+                sorted((l.language_code, l.has_public_version())
+                       for l in videos[0].all_subtitle_languages()),
+                [('en', True), ('fr', False)])
+
+    def test_query_count(self):
+        videos = self.fetch_videos()
+        with self.assertNumQueries(4):
+            annotate_videos(videos)
+        videos = self.fetch_videos()
+        with self.assertNumQueries(5):
+            annotate_videos(videos, languages=True)
+
+    def test_empty_list(self):
+        with self.assertNumQueries(0):
+            assert_equal(annotate_videos([]), [])
+
+class ListingPageQueryCountTest(TestCase):
+    """Check that listing pages use a fixed number of queries
+
+    For each page, we render it with 1 video, then with several and check
+    that the query count stays the same.
+    """
+    def setUp(self):
+        self.user = UserFactory(password='password')
+        self.team = TeamFactory(owner=self.user)
+        self.project = ProjectFactory(team=self.team)
+
+    def make_video(self):
+        video = VideoFactory(user=self.user, title='')
+        TeamVideoFactory(team=self.team, project=self.project, video=video,
+                         added_by=self.user)
+        make_version(video, 'en', subtitles_complete=True)
+        make_version(video, 'fr', visibility='private',
+                     subtitles_complete=False)
+        return video
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context)
+
+    def check_fixed_query_count(self, func):
+        self.make_video()
+        single_count = self.count_queries(func)
+        for i in range(3):
+            self.make_video()
+        assert_equal(self.count_queries(func), single_count)
+
+    def test_profile_videos(self):
+        self.client.login(username=self.user.username, password='password')
+        url = reverse('profiles:videos', args=(self.user.username,))
+        def get_page():
+            assert_equal(self.client.get(url).status_code, 200)
+        self.check_fixed_query_count(get_page)
+
+    def test_project_page(self):
+        self.client.login(username=self.user.username, password='password')
+        url = reverse('teams:project', args=(self.team.slug,
+                                             self.project.slug))
+        def get_page():
+            assert_equal(self.client.get(url).status_code, 200)
+        self.check_fixed_query_count(get_page)
+
+    def test_search_results(self):
+        def get_page():
+            render_page(1, Video.objects.all(), 20)
+        self.check_fixed_query_count(get_page)
+
+    def test_api_video_list(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('api:video-list')
+        def get_page():
+            assert_equal(client.get(url).status_code, 200)
+        self.check_fixed_query_count(get_page)
@@ -0,0 +1,120 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+from nose.tools import *
+import mock
+
+from teams.models import VideoVisibility
+from videos import metadata_manager
+from videos import tasks
+from videos.models import Video
+from utils.factories import *
+
+class UpdateMetadataTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory(primary_audio_language_code='en')
+
+    def reload_video(self):
+        return Video.objects.get(pk=self.video.pk)
+
+    def update_metadata(self):
+        with CaptureQueriesContext(connection) as context:
+            metadata_manager.update_metadata(self.video.pk)
+        return [q['sql'] for q in context.captured_queries
+                if q['sql'].startswith('UPDATE')]
+
+    def test_fields(self):
+        make_version(self.video, 'en', subtitles_complete=True)
+        make_version(self.video, 'fr', subtitles_complete=False)
+        make_version(self.video, 'de', subtitles_complete=False,
+                     subtitle_set=SubtitleSetFactory(num_subs=0))
+        self.update_metadata()
+        video = self.reload_video()
+        assert_equal(video.languages_count, 2)
+        assert_true(video.is_subtitled)
+        assert_true(video.was_subtitled)
+        assert_not_equal(video.complete_date, None)
+        assert_true(video.is_public)
+
+    def test_team_visibility(self):
+        team = TeamFactory(video_visibility=VideoVisibility.PRIVATE)
+        TeamVideoFactory(team=team, video=self.video)
+        self.update_metadata()
+        assert_false(self.reload_video().is_public)
+
+    def test_no_subtitles(self):
+        self.update_metadata()
+        video = self.reload_video()
+        assert_equal(video.languages_count, 0)
+        assert_false(video.is_subtitled)
+        assert_false(video.was_subtitled)
+        assert_equal(video.complete_date, None)
+
+    def test_single_update(self):
+        make_version(self.video, 'en', subtitles_complete=True)
+        updates = self.update_metadata()
+        assert_equal(len(updates), 1)
+        assert_true('languages_count' in updates[0])
+        assert_true('complete_date' in updates[0])
+
+    def test_only_changed_columns(self):
+        make_version(self.video, 'en', subtitles_complete=True)
+        self.update_metadata()
+        updates = self.update_metadata()
+        assert_equal(len(updates), 1)
+        for name in ('languages_count', 'is_subtitled', 'was_subtitled',
+                     'is_public', 'complete_date', 'search_text'):
+            assert_false(name in updates[0], name)
+
+class ScheduleUpdateTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        get_redis_connection('storage').delete(
+            metadata_manager._pending_key(self.video.pk))
+        patcher = mock.patch.object(tasks.update_video_metadata, 'enqueue_in')
+        self.enqueue_in = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_coalesce(self):
+        for i in range(3):
+            metadata_manager.schedule_update(self.video.pk)
+        assert_equal(self.enqueue_in.call_args_list, [
+            mock.call(metadata_manager.UPDATE_DELAY, self.video.pk),
+        ])
+
+    def test_schedule_after_run(self):
+        metadata_manager.schedule_update(self.video.pk)
+        metadata_manager.run_scheduled_update(self.video.pk)
+        metadata_manager.schedule_update(self.video.pk)
+        assert_equal(self.enqueue_in.call_count, 2)
+
+    def test_run_updates_search_index(self):
+        Video.objects.filter(pk=self.video.pk).update(title='New title')
+        metadata_manager.run_scheduled_update(self.video.pk)
+        video = Video.objects.get(pk=self.video.pk)
+        assert_true('New title' in video.search_text)
+
+    def test_run_after_video_deleted(self):
+        video_pk = self.video.pk
+        self.video.delete()
+        # This should not raise an exception
+        metadata_manager.run_scheduled_update(video_pk)
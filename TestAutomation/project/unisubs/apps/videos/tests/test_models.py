@@ -19,6 +19,7 @@
 
 import functools
 
+from django.core.cache import cache
 from django.db import IntegrityError
 from django.test import TestCase, TransactionTestCase
 from django.utils.encoding import iri_to_uri
@@ -36,7 +37,7 @@ from videos.tests.data import (
     get_video, make_subtitle_language, make_subtitle_version, make_rollback_to
 )
 from widget import video_cache
-from utils.subtitles import dfxp_merge
+from utils.subtitles import dfxp_merge, dfxp_merge_parts
 from utils import test_utils
 from utils.factories import *
 from utils.test_utils import MockVideoType
@@ -443,6 +444,10 @@ class TestSelectHasPublicVersion(TestCase):
             assert_false(videos[1].has_public_version())
 
 class TestGetMergedDFXP(TestCase):
+    def setUp(self):
+        # Version ids get reused between tests, so clear the cached divs
+        cache.clear()
+
     def test_get_merged_dfxp(self):
         video = VideoFactory(primary_audio_language_code='en')
         pipeline.add_subtitles(video, 'en', [
@@ -467,6 +472,57 @@ class TestGetMergedDFXP(TestCase):
 
         self.assertEquals(video.get_merged_dfxp(), dfxp_merge(subtitles))
 
+    def make_video_with_subtitles(self):
+        video = VideoFactory(primary_audio_language_code='fr')
+        for language_code in ('en', 'fr', 'es'):
+            pipeline.add_subtitles(video, language_code,
+                                   SubtitleSetFactory(num_subs=5))
+        return video
+
+    def check_merged_dfxp(self, video):
+        subtitles = [
+            video.subtitle_language(lang).get_public_tip().get_subtitles()
+            for lang in ('fr', 'en', 'es')
+        ]
+        assert_equal(video.get_merged_dfxp(), dfxp_merge(subtitles))
+
+    def test_no_public_versions(self):
+        video = VideoFactory()
+        pipeline.add_subtitles(video, 'en', SubtitleSetFactory(),
+                               visibility='private')
+        assert_equal(video.get_merged_dfxp(), None)
+        assert_equal(video.get_merged_dfxp_chunks(), None)
+
+    def test_cached(self):
+        video = self.make_video_with_subtitles()
+        merged = video.get_merged_dfxp()
+        with self.assertNumQueries(1):
+            assert_equal(video.get_merged_dfxp(), merged)
+
+    def test_splice_in_changed_language(self):
+        video = self.make_video_with_subtitles()
+        video.get_merged_dfxp()
+        pipeline.add_subtitles(video, 'en', SubtitleSetFactory(num_subs=2))
+        video.clear_language_cache()
+        with mock.patch('videos.models.dfxp_merge_parts',
+                        wraps=dfxp_merge_parts) as mock_merge_parts:
+            self.check_merged_dfxp(video)
+        assert_equal(mock_merge_parts.call_count, 1)
+
+    def test_visibility_change(self):
+        video = self.make_video_with_subtitles()
+        video.get_merged_dfxp()
+        version = pipeline.add_subtitles(video, 'es',
+                                         SubtitleSetFactory(num_subs=2))
+        video.clear_language_cache()
+        self.check_merged_dfxp(video)
+        # Changing the visibility doesn't invalidate the video cache, but it
+        # changes the public tips, so we should notice it
+        version.visibility_override = 'private'
+        version.save()
+        video.clear_language_cache()
+        self.check_merged_dfxp(video)
+
 class TestTypeUrlPatterns(TestCase):
     def setUp(self):
         pattern = VideoTypeUrlPattern()
@@ -245,6 +245,59 @@ class VideoTypeRegistrarTest(TestCase):
         self.assertRaises(VideoTypeError, video_type_registrar.video_type_for_url,
                           'http://youtube.com/v=100500')
 
+    def test_candidate_types(self):
+        registrar = VideoTypeRegistrar()
+
+        class SiteVideoType(VideoType):
+            abbreviation = 'site'
+            name = 'Site'
+            url_domains = ('example.com',)
+
+        class GenericVideoType(VideoType):
+            abbreviation = 'generic'
+            name = 'Generic'
+
+        class OtherSiteVideoType(VideoType):
+            abbreviation = 'other'
+            name = 'Other Site'
+            url_domains = ('example.org',)
+
+        registrar.register(SiteVideoType)
+        registrar.register(GenericVideoType)
+        registrar.register(OtherSiteVideoType)
+        self.assertEqual(registrar.candidate_types('http://example.com/a'),
+                         [SiteVideoType, GenericVideoType])
+        self.assertEqual(
+            registrar.candidate_types('http://www.Example.COM:8000/a'),
+            [SiteVideoType, GenericVideoType])
+        self.assertEqual(registrar.candidate_types('http://example.org/a'),
+                         [GenericVideoType, OtherSiteVideoType])
+        self.assertEqual(registrar.candidate_types('http://notexample.com/a'),
+                         [GenericVideoType])
+        self.assertEqual(registrar.candidate_types('some url'),
+                         [GenericVideoType])
+
+    def test_domain_index_matches_full_scan(self):
+        urls = [
+            'http://www.youtube.com/watch?v=woobL2yAxD4',
+            'http://youtu.be/HaAVZ2yXDBo',
+            'http://vimeo.com/22070806',
+            'http://www.dailymotion.com/video/x7u2ww_juliette-drums_lifestyle',
+            'https://fast.wistia.net/embed/iframe/abc123def4',
+            'http://link.brightcove.com/services/player/bcpid1234?bctid=5678',
+            'http://example.com/video.mp4',
+            'http://www.youtube.com/video.mp4',
+            'http://example.com/video.flv',
+            'http://example.com/audio.mp3',
+            'http://example.com/page.html',
+            'some url',
+        ]
+        registrar = video_type_registrar
+        for url in urls:
+            self.assertEqual(
+                registrar.find_type(url, registrar.candidate_types(url)),
+                registrar.find_type(url, registrar.type_list), url)
+
 class BrightcoveVideoTypeTest(TestCase):
     player_id = '1234'
     video_id = '5678'
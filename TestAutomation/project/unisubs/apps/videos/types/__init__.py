@@ -15,7 +15,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see 
 # http://www.gnu.org/licenses/agpl-3.0.html.
-from base import VideoType, VideoTypeRegistrar, VideoTypeError
+from base import (VideoType, VideoTypeRegistrar, VideoTypeError,
+                  prefetch_metadata)
 from youtube import YoutubeVideoType
 from htmlfive import HtmlFiveVideoType
 from kaltura import KalturaVideoType
@@ -16,6 +16,8 @@
 # along with this program.  If not, see 
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+from functools import partial
+from multiprocessing.pool import ThreadPool
 from urlparse import urlparse
 import subprocess, sys, uuid, os
 import requests
@@ -23,16 +25,63 @@ import logging
 
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.db import connection
 
 from utils.url_escape import url_escape
 
 logger = logging.getLogger(__name__)
 
+def prefetch_metadata(video_types, user, team, workers, extra_fetches=()):
+    """Call VideoType.prefetch_metadata() for many video types at once
+
+    This is mostly waiting on HTTP calls, so we run the fetches from a
+    thread pool.  Errors are logged and otherwise ignored, set_values() will
+    handle them when the videos are created.
+
+    Args:
+        video_types: VideoTypes to prefetch metadata for
+        user: user adding the videos
+        team: team the videos are being added to, or None
+        workers: max number of threads to use
+        extra_fetches: list of (url, function) tuples for other HTTP calls to
+            run in the same pool
+    """
+    jobs = [
+        (video_type.url, partial(video_type.prefetch_metadata, user, team))
+        for video_type in video_types
+    ]
+    jobs.extend(extra_fetches)
+    if not jobs:
+        return
+    pool = ThreadPool(min(workers, len(jobs)))
+    try:
+        pool.map(_run_prefetch_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+def _run_prefetch_job(job):
+    url, func = job
+    try:
+        func()
+    except Exception:
+        logger.warn('Error prefetching metadata for %s', url, exc_info=True)
+    finally:
+        # Each thread gets its own DB connection, make sure it's closed
+        connection.close()
+
 class VideoType(object):
 
     abbreviation = None
     name = None    
 
+    # Domains that URLs for this type are hosted on.  Subdomains match as
+    # well, so 'vimeo.com' also covers 'player.vimeo.com'.  The registrar
+    # only calls matches_video_url() for URLs on one of these domains.  Types
+    # that can match a URL on any host (for example direct links to video
+    # files) should leave this empty.
+    url_domains = ()
+
     CAN_IMPORT_SUBTITLES = False
 
     def __init__(self, url):
@@ -112,6 +161,17 @@ class VideoType(object):
 
     def get_direct_url(self, prefer_audio=False):
         return None
+
+    def prefetch_metadata(self, user, team):
+        """Fetch metadata for the video ahead of time
+
+        Types that fetch metadata over HTTP in set_values() can override this
+        to fetch it early and store it on the instance.  The importers call
+        this through prefetch_metadata(), so the fetches for many videos run
+        concurrently.  Errors should be suppressed, set_values() will
+        handle them as usual.
+        """
+        pass
     
     def convert_to_video_url(self):
         return self.format_url(self.url)
@@ -148,7 +208,34 @@ class VideoType(object):
     def format_url(cls, url):
         return url.strip()
     
+def url_hostname(url):
+    """Get the lowercased hostname for a URL, without the port.
+
+    Returns None if url doesn't have a hostname.
+    """
+    try:
+        return urlparse(url.strip()).hostname
+    except ValueError:
+        # malformed URL (for example an unclosed IPv6 address)
+        return None
+
+def domain_suffixes(hostname):
+    """Get all domain suffixes for a hostname.
+
+    For example www.youtube.com -> www.youtube.com, youtube.com, com
+    """
+    parts = hostname.split('.')
+    return ['.'.join(parts[i:]) for i in xrange(len(parts))]
+
 class VideoTypeRegistrar(dict):
+    """Registry of VideoType classes.
+
+    To find the type for a URL we parse the hostname once and look it up in
+    an index of the url_domains for each type.  matches_video_url() then only
+    runs for the types on that domain, plus the generic types that can match
+    any host.  Candidates are always checked in registration order, so the
+    result is the same as checking every type in turn.
+    """
     
     domains = []
     
@@ -156,18 +243,54 @@ class VideoTypeRegistrar(dict):
         super(VideoTypeRegistrar, self).__init__(*args, **kwargs)
         self.choices = []
         self.type_list = []
+        # maps domains to (position, video_type) tuples
+        self.domain_index = {}
+        # (position, video_type) tuples for types without url_domains
+        self.generic_types = []
         
     def register(self, video_type):
         self[video_type.abbreviation] = video_type
+        position = len(self.type_list)
         self.type_list.append(video_type)
         self.choices.append((video_type.abbreviation, video_type.name))
         domain = getattr(video_type, 'site', None)
         domain and self.domains.append(domain)
+        if video_type.url_domains:
+            for domain in video_type.url_domains:
+                self.domain_index.setdefault(domain.lower(), []).append(
+                    (position, video_type))
+        else:
+            self.generic_types.append((position, video_type))
+
+    def candidate_types(self, url):
+        """Get the video types that could possibly match a URL
+
+        Returns a list of VideoType classes in registration order.
+        """
+        hostname = url_hostname(url)
+        domain_matches = []
+        if hostname:
+            for suffix in domain_suffixes(hostname):
+                domain_matches.extend(self.domain_index.get(suffix, ()))
+        if not domain_matches:
+            return [video_type for (position, video_type) in self.generic_types]
+        candidates = sorted(set(domain_matches + self.generic_types))
+        return [video_type for (position, video_type) in candidates]
         
     def video_type_for_url(self, url):
-        for video_type in self.type_list:
+        video_type = self.find_type(url, self.candidate_types(url))
+        if video_type is not None:
+            return video_type(url)
+
+    def find_type(self, url, video_types):
+        """Find the first type in video_types that matches a URL
+
+        Returns the VideoType class, or None if none of them match.  Pass
+        type_list for video_types to check every registered type.
+        """
+        for video_type in video_types:
             if video_type.matches_video_url(url):
-                return video_type(url)
+                return video_type
             
 class VideoTypeError(Exception):
     pass
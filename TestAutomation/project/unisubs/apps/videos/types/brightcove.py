@@ -58,9 +58,12 @@ class OldStyleBrightcoveVideoMatcher(object):
         for r in self.REGEXES:
             if bool(r.match(url)):
                 return True
+        # Check this before fetching the patterns, since it's much cheaper
+        if url.find('bctid') <= 0:
+            return False
         from videos.models import VideoTypeUrlPattern
         for pattern in VideoTypeUrlPattern.objects.patterns_for_type('C'):
-            if url.find(pattern.url_pattern) == 0 and url.find('bctid') > 0:
+            if url.find(pattern.url_pattern) == 0:
                 return True
         return False
 
@@ -33,6 +33,7 @@ class VimeoVideoType(VideoType):
     abbreviation = 'V'
     name = 'Vimeo.com'   
     site = 'vimeo.com'
+    url_domains = ('vimeo.com',)
     
     def __init__(self, url):
         self.url = url
@@ -51,7 +52,7 @@ class VimeoVideoType(VideoType):
 
     def set_values(self, video_obj, user, team, video_url):
         try:
-            values = vimeo.get_values(self.videoid, user, team)
+            values = self.get_video_info(user, team, video_url)
             video_obj.thumbnail = values[3]
             video_obj.duration = values[2]
             video_obj.title = values[0]
@@ -62,7 +63,16 @@ class VimeoVideoType(VideoType):
             pass
 
     def get_video_info(self, user, team, video_url):
-        return vimeo.get_values(self.videoid, user, team)
+        if not hasattr(self, '_values'):
+            self._values = vimeo.get_values(self.videoid, user, team)
+        return self._values
+
+    def prefetch_metadata(self, user, team):
+        try:
+            self.get_video_info(user, team, None)
+        except Exception:
+            # set_values() will try again and handle the error
+            pass
 
     @classmethod
     def set_owner_username(cls, video_url, username):
@@ -30,6 +30,7 @@ class WistiaVideoType(VideoType):
     abbreviation = 'W'
     name = 'Wistia.com'   
     site = 'wistia.com'
+    url_domains = ('wistia.com', 'wistia.net', 'wi.st')
     linkurl = None
 
     def __init__(self, url):
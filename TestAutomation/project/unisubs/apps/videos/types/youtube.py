@@ -33,6 +33,7 @@ class YoutubeVideoType(VideoType):
     ]]
 
     HOSTNAMES = ( "youtube.com", "youtu.be", "www.youtube.com",)
+    url_domains = ("youtube.com", "youtu.be",)
 
     abbreviation = 'Y'
     name = 'Youtube'
@@ -92,6 +93,13 @@ class YoutubeVideoType(VideoType):
                     raise
         return self._video_info, incomplete
 
+    def prefetch_metadata(self, user, team):
+        try:
+            self.get_video_info(None, user, team, None)
+        except Exception:
+            # set_values() will try again and handle the error
+            pass
+
     @classmethod
     def complete_set_values(cls, video, video_url, video_info):
         if not video.title:
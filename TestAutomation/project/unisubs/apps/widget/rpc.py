@@ -48,6 +48,7 @@ from widget.forms import  FinishReviewForm, FinishApproveForm
 from widget.models import SubtitlingSession
 
 from functools import partial
+from subtitles import effects
 from subtitles import pipeline
 from subtitles.models import ORIGIN_LEGACY_EDITOR
 from babelsubs.storage import SubtitleSet, diff
@@ -688,7 +689,7 @@ class Rpc(BaseRpc):
 
         language.save()
         if forked:
-            pipeline._fork_dependents(language)
+            effects.fork_dependents(language.id)
 
         if must_trigger_api_language_edited:
             language.video.save()
@@ -88,8 +88,19 @@ def to(subs, type, language=None):
 
     return Generator.generate(subs, language=language)
 
+def to_iter(subs, type, language=None):
+    """
+    Like to(), but returns an iterator that generates the output in chunks.
+    """
+    Generator = generators.discover(type)
+
+    if not Generator:
+        raise TypeError("Could not find a type %s" % type)
+
+    return Generator.generate_iter(subs, language=language)
+
 def dfxp_merge(subtitle_sets):
     return generators.DFXPGenerator.merge_subtitles(subtitle_sets)
 
-__all__ = ['load_from', 'load_from_file', 'to', 'get_available_formats',
-           'dfxp_merge']
+__all__ = ['load_from', 'load_from_file', 'to', 'to_iter',
+           'get_available_formats', 'dfxp_merge']
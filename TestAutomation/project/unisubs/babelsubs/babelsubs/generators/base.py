@@ -16,6 +16,13 @@ class BaseGenerator(object):
     def __unicode__(self):
         raise Exception('Should return subtitles')
 
+    def __iter__(self):
+        """
+        Iterate over the output in chunks.  Generators that can build their
+        output cue by cue override this, the default is a single chunk.
+        """
+        yield unicode(self)
+
     @classmethod
     def isnumber(cls, val):
         return isinstance(val, (int, long, float))
@@ -24,6 +31,10 @@ class BaseGenerator(object):
     def generate(cls, subtitle_set, language=None):
         return unicode(cls(subtitle_set, language=language))
 
+    @classmethod
+    def generate_iter(cls, subtitle_set, language=None):
+        return iter(cls(subtitle_set, language=language))
+
 class GeneratorListClass(dict):
 
     def register(self, handler, type=None):
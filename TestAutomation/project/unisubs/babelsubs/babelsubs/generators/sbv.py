@@ -11,16 +11,22 @@ class SBVGenerator(BaseGenerator):
                 language)
 
     def __unicode__(self):
-        output = []
+        return u''.join(self)
 
+    def __iter__(self):
+        first = True
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(self.MAPPINGS):
             start = self.format_time(from_ms)
             end = self.format_time(to_ms)
-            output.append(u'%s,%s' % (start, end))
-            output.append(content.strip())
-            output.append(u'')
-
-        return self.line_delimiter.join(output)
+            cue = self.line_delimiter.join([
+                u'%s,%s' % (start, end),
+                content.strip(),
+                u'',
+            ])
+            if not first:
+                cue = self.line_delimiter + cue
+            yield cue
+            first = False
 
     def format_time(self, time):
         if time is None:
@@ -13,18 +13,24 @@ class SRTGenerator(BaseGenerator):
         self.line_delimiter = '\r\n'
 
     def __unicode__(self):
-        output = []
+        return u''.join(self)
+
+    def __iter__(self):
         i = 1
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(mappings=self.MAPPINGS):
-            output.append(unicode(i))
-            output.append(u'%s --> %s' % (
-                self.format_time(from_ms),
-                self.format_time(to_ms)
-            ))
-            output.append(content)
-            output.append(u'')
+            cue = self.line_delimiter.join([
+                unicode(i),
+                u'%s --> %s' % (
+                    self.format_time(from_ms),
+                    self.format_time(to_ms)
+                ),
+                content,
+                u'',
+            ])
+            if i > 1:
+                cue = self.line_delimiter + cue
+            yield cue
             i += 1
-        return self.line_delimiter.join(output)
 
     def format_time(self, milliseconds):
         if milliseconds is None:
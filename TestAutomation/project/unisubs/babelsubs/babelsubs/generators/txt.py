@@ -14,14 +14,19 @@ class TXTGenerator(BaseGenerator):
         self.language = language
 
     def __unicode__(self):
-        output = []
+        return u''.join(self)
+
+    def __iter__(self):
         items = self.subtitle_set.subtitle_items(mappings=self.MAPPINGS)
+        first = True
 
         for _, _, content, _ in items:
             if content:
-                output.append(content.strip())
-
-        return self.line_delimiter.join(output)
+                if first:
+                    yield content.strip()
+                else:
+                    yield self.line_delimiter + content.strip()
+                first = False
 
 
 register(TXTGenerator)
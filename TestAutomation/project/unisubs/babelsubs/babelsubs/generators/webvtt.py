@@ -16,16 +16,28 @@ class WEBVTTGenerator(BaseGenerator):
         self.line_delimiter = '\n'
 
     def __unicode__(self):
-        output = ['WEBVTT\n']
-        for sub in self.subtitle_set.subtitle_items(mappings=self.MAPPINGS):
+        return u''.join(self)
+
+    def __iter__(self):
+        items = self.subtitle_set.subtitle_items(mappings=self.MAPPINGS)
+        if not items:
+            yield u'WEBVTT'
+            return
+        yield u'WEBVTT\n'
+        for i, sub in enumerate(items):
+            # Each line is preceded by the delimiter.  The blank line after
+            # each cue is output at the start of the next one, so that we
+            # don't have a trailing newline.
+            output = []
+            if i > 0:
+                output.append(u'')
             if sub.new_paragraph:
                 output.append(u'NOTE Paragraph')
                 output.append(u'')
 
             output.append(self.format_cue_header(sub))
             output.append(sub.text)
-            output.append(u'')
-        return self.line_delimiter.join(output)[:-1]
+            yield u''.join(self.line_delimiter + line for line in output)
 
     def format_cue_header(self, sub):
         parts = []
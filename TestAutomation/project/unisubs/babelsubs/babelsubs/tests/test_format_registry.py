@@ -1,9 +1,10 @@
 from unittest import TestCase
-from babelsubs import get_available_formats
+from babelsubs import get_available_formats, to, to_iter
 from babelsubs.parsers import base, discover
 from babelsubs.parsers.base import ParserList
 from babelsubs.generators.base import GeneratorList
 from babelsubs.generators.base import discover as generator_discover
+from babelsubs.tests import utils
 
 
 class FormatRegistryTest(TestCase):
@@ -35,3 +36,15 @@ class FormatRegistryTest(TestCase):
     def test_dfxp_aliases(self):
         self.assertTrue(discover('xml'))
 
+
+class GenerateIterTest(TestCase):
+    def test_matches_to(self):
+        # to_iter() should generate the same output as to(), in chunks
+        subs = utils.get_subs('simple.srt').to_internal()
+        for format in get_available_formats():
+            self.assertEqual(u''.join(to_iter(subs, format)),
+                             to(subs, format))
+
+    def test_chunked_per_cue(self):
+        subs = utils.get_subs('simple.srt').to_internal()
+        self.assertEqual(len(list(to_iter(subs, 'srt'))), len(subs))
@@ -90,9 +90,11 @@ class AmaraPlugin(object):
         MockRedis.persist = persist
 
     def pytest_runtest_teardown(self, item, nextitem):
+        from teams.cache import clear_local_policies
         self.patcher.reset_mocks()
         get_redis_connection("default").flushdb()
         get_redis_connection("storage").flushdb()
+        clear_local_policies()
 
     def pytest_unconfigure(self, config):
         self.patcher.unpatch_functions()
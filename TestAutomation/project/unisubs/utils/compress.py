@@ -35,3 +35,22 @@ def compress(data):
 def decompress(data):
     """Decompress data created with compress."""
     return zlib.decompress(base64.decodestring(data))
+
+def iter_decompress(data, chunk_size=64 * 1024):
+    """Decompress data created with compress in chunks.
+
+    This yields bytestrings of at most chunk_size bytes, which lets us stream
+    large values without holding the entire decompressed data in memory.
+    """
+    decompressor = zlib.decompressobj()
+    compressed = base64.decodestring(data)
+    for start in xrange(0, len(compressed), chunk_size):
+        pending = compressed[start:start+chunk_size]
+        while pending:
+            chunk = decompressor.decompress(pending, chunk_size)
+            if chunk:
+                yield chunk
+            pending = decompressor.unconsumed_tail
+    chunk = decompressor.flush()
+    if chunk:
+        yield chunk
@@ -20,13 +20,12 @@ from __future__ import absolute_import
 import json
 
 from django import forms
-from django.db.models import Q
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext_lazy as _
 
 from .autocomplete import AutocompleteTextInput
-from auth.models import CustomUser as User
+from auth.models import CustomUser as User, UserSearchToken
 from utils.text import fmt
 
 class UserAutocompleteField(forms.CharField):
@@ -63,10 +62,7 @@ def autocomplete_user_view(request, queryset, limit=10):
     limit -= len(users)
     # add non-exact matches next
     users.extend(
-        queryset.filter(Q(username__icontains=query)|
-                        Q(first_name__icontains=query)|
-                        Q(last_name__icontains=query)|
-                        Q(full_name__icontains=query))
+        UserSearchToken.objects.filter_users(queryset, query)
         .exclude(username=query)[:limit]
     )
     data = [
@@ -29,7 +29,7 @@ from django.shortcuts import render
 
 def object_list(request, queryset, paginate_by=None, allow_empty=True,
                 template_name=None, extra_context=None,
-                template_object_name='object'):
+                template_object_name='object', prepare_objects=None):
 
     paginator = Paginator(queryset, paginate_by,
                           allow_empty_first_page=allow_empty)
@@ -47,6 +47,8 @@ def object_list(request, queryset, paginate_by=None, allow_empty=True,
     except InvalidPage:
         raise Http404
 
+    if prepare_objects is not None:
+        page_obj.object_list = prepare_objects(page_obj.object_list)
     context = {
             '%s_list' % template_object_name: page_obj.object_list,
             'paginator': paginator,
@@ -18,7 +18,14 @@
 
 """Extends the django Paginator class to work with amara """
 
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import (Paginator, Page, EmptyPage,
+                                   PageNotAnInteger)
+from django.db.models import Q
 
 class AmaraPaginator(Paginator):
     def get_page(self, request):
@@ -98,3 +105,232 @@ class AmaraPaginatorFuture(Paginator):
             'next': next_page,
             'prev': prev_page,
         }
+
+def keyset_filter(ordering, position):
+    """Build a Q object that selects items after position
+
+    For ordering (a, b) this is: a > A OR (a = A AND b > B)
+
+    Args:
+        ordering: list of fields that uniquely orders the queryset, using the
+            same "-field" syntax as order_by()
+        position: list of values for those fields, for the item to start
+            after
+    """
+    q = Q()
+    equal_fields = {}
+    for field, value in zip(ordering, position):
+        if field.startswith('-'):
+            name = field[1:]
+            lookup = '{}__lt'.format(name)
+        else:
+            name = field
+            lookup = '{}__gt'.format(name)
+        q |= Q(**dict(equal_fields.items() + [(lookup, value)]))
+        equal_fields[name] = value
+    return q
+
+class InvalidCursor(ValueError):
+    """Raised by decode_cursor() when we can't use a cursor"""
+
+def get_position(obj, ordering):
+    """Get the position of obj for keyset pagination
+
+    This is the list of obj's values for the ordering fields, converted to
+    strings so that they can be JSON encoded.
+    """
+    return [unicode(getattr(obj, field.lstrip('-'))) for field in ordering]
+
+def encode_cursor(position):
+    """Encode a position from get_position() into a URL-safe string"""
+    return urlsafe_b64encode(json.dumps(position))
+
+def decode_cursor(cursor, ordering, model):
+    """Decode a cursor from encode_cursor()
+
+    Cursors come from the query string, so we don't trust them.  Each value
+    gets converted to the python type of its field, so that a tampered cursor
+    can't make it into the query.
+
+    Args:
+        cursor: string from encode_cursor()
+        ordering: list of fields that the cursor is for
+        model: model class that the ordering fields are on
+
+    Returns:
+        list of values to pass to keyset_filter(), or None if cursor is empty
+
+    Raises:
+        InvalidCursor: cursor is not a valid position for ordering
+    """
+    if not cursor:
+        return None
+    try:
+        position = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(position, list) or len(position) != len(ordering):
+        raise InvalidCursor(cursor)
+    values = []
+    for field_name, value in zip(ordering, position):
+        if not isinstance(value, basestring):
+            raise InvalidCursor(cursor)
+        field = model._meta.get_field(field_name.lstrip('-'))
+        try:
+            values.append(field.to_python(value))
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+    return values
+
+def reverse_ordering(ordering):
+    return [
+        field[1:] if field.startswith('-') else '-' + field
+        for field in ordering
+    ]
+
+class KeysetPage(Page):
+    def __init__(self, object_list, number, paginator, has_next,
+                 has_previous):
+        super(KeysetPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+class KeysetPaginator(object):
+    """Paginator that uses keyset pagination instead of OFFSET
+
+    Pages after the first are fetched with a WHERE clause that starts after
+    the last item of the previous page (or before the first item of the next
+    page when going backwards).  This means that deep pages cost the same as
+    the first one.  We still keep the page number in the query string so that
+    templates can display "21-40 out of 300".  A page number without a cursor
+    (for example an old bookmark) falls back to OFFSET.
+
+    KeysetPaginator supports the same API as AmaraPaginatorFuture, so it works
+    with the future/paginator.html template.
+
+    Args:
+        queryset: queryset to paginate
+        per_page: items per page
+        ordering: list of fields that uniquely orders the queryset.  The last
+            field should be the primary key.
+        count: total number of items, or a function that calculates it.  Use
+            this to pass in a cached count.
+    """
+    after_param = 'after'
+    before_param = 'before'
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        if count is None:
+            count = queryset.count
+        self._count = count
+
+    @property
+    def count(self):
+        if callable(self._count):
+            self._count = self._count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        return max(1, int(math.ceil(float(self.count) / self.per_page)))
+
+    def get_page(self, request):
+        try:
+            number = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            number = 1
+        after = self.decode_cursor(request.GET.get(self.after_param))
+        before = self.decode_cursor(request.GET.get(self.before_param))
+        if after is not None:
+            items = list(self.queryset
+                         .filter(keyset_filter(self.ordering, after))
+                         .order_by(*self.ordering)[:self.per_page + 1])
+            has_next = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_previous = True
+        elif before is not None:
+            reversed_ordering = reverse_ordering(self.ordering)
+            items = list(self.queryset
+                         .filter(keyset_filter(reversed_ordering, before))
+                         .order_by(*reversed_ordering)[:self.per_page + 1])
+            has_previous = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            has_next = True
+        else:
+            start = (number - 1) * self.per_page
+            items = list(self.queryset.order_by(*self.ordering)
+                         [start:start + self.per_page + 1])
+            has_next = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_previous = number > 1
+        if not has_previous:
+            number = 1
+        page = KeysetPage(items, number, self, has_next, has_previous)
+        self.add_links_to_page(page, request)
+        return page
+
+    def add_links_to_page(self, page, request):
+        query = request.GET.copy()
+        page.first_page_link = self.make_page_link(1, query)
+        page.last_page_link = None
+        page.nearest_page_links = [(1, page.first_page_link)]
+        if page.number > 1:
+            page.nearest_page_links.append(
+                (page.number, '?' + request.GET.urlencode()))
+
+    def make_page_link(self, page_number, query, after=None, before=None):
+        query = query.copy()
+        for name in (self.after_param, self.before_param):
+            if name in query:
+                del query[name]
+        if page_number > 1:
+            query['page'] = page_number
+            if after is not None:
+                query[self.after_param] = self.encode_cursor(after)
+            if before is not None:
+                query[self.before_param] = self.encode_cursor(before)
+        elif 'page' in query:
+            del query['page']
+        return '?' + query.urlencode()
+
+    def make_next_previous_page_links(self, page, request):
+        query = request.GET.copy()
+        if page.has_next() and page.object_list:
+            next_url = self.make_page_link(
+                page.number + 1, query,
+                after=self.get_position(page.object_list[-1]))
+        else:
+            next_url = ''
+        if page.has_previous() and page.object_list:
+            prev_url = self.make_page_link(
+                page.number - 1, query,
+                before=self.get_position(page.object_list[0]))
+        else:
+            prev_url = ''
+        return (next_url, prev_url)
+
+    def get_position(self, obj):
+        return get_position(obj, self.ordering)
+
+    def encode_cursor(self, position):
+        return encode_cursor(position)
+
+    def decode_cursor(self, cursor):
+        # An invalid cursor gets treated like a missing one, which falls back
+        # to OFFSET using the page number
+        try:
+            return decode_cursor(cursor, self.ordering, self.queryset.model)
+        except InvalidCursor:
+            return None
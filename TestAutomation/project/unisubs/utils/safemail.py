@@ -47,6 +47,12 @@ class InternalOnlyBackend(object):
                         break
         return clean
 
+    def open(self):
+        return self.smtp_backend.open()
+
+    def close(self):
+        self.smtp_backend.close()
+
     def send_messages(self, email_messages):
         try:
             self.file_backend.send_messages(email_messages)
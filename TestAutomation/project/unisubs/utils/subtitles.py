@@ -24,6 +24,8 @@ styling/layout.
 
 from babelsubs.loader import SubtitleLoader
 
+from utils.memoize import memoize
+
 subtitle_loader = SubtitleLoader()
 subtitle_loader.add_style('amara-style',
                           color="white",
@@ -54,3 +56,26 @@ def load_subtitles_from_file(language_code, path):
 
 def dfxp_merge(subtitle_sets):
     return subtitle_loader.dfxp_merge(subtitle_sets)
+
+# Whitespace that dfxp_merge() puts between the <div> for each language
+DFXP_MERGE_SEPARATOR = '\n' + ' ' * 8
+
+def dfxp_merge_parts(subtitle_set):
+    """Split the dfxp_merge() output for a single subtitle set
+
+    Returns a (header, div, footer) tuple.  The header and footer are the
+    same for all subtitle sets, so the output of dfxp_merge() for several
+    sets is the header, then the divs joined with DFXP_MERGE_SEPARATOR, then
+    the footer.  This lets us cache the div for each subtitle set and only
+    re-render the ones that change.
+    """
+    xml = dfxp_merge([subtitle_set])
+    start = xml.index('<div')
+    end = len(xml[:xml.rindex('</body>')].rstrip())
+    return xml[:start], xml[start:end], xml[end:]
+
+@memoize
+def dfxp_merge_wrapper():
+    """Get the (header, footer) tuple for dfxp_merge_parts()."""
+    header, div, footer = dfxp_merge_parts(create_new_subtitles(''))
+    return header, footer
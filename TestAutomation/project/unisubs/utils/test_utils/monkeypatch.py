@@ -130,6 +130,10 @@ update_all_subtitles = mock.Mock()
 fetch_subs_task = mock.Mock()
 import_videos_from_feed = mock.Mock()
 notifications_do_http_post = mock.Mock()
+# TestCase runs each test inside a transaction that never commits, so run the
+# subtitle pipeline effects right away.  Use run_original_for_test() with a
+# TransactionTestCase to test the real behavior.
+effects_on_commit = mock.Mock(side_effect=lambda func: func())
 
 class MonkeyPatcher(object):
     """Replace a functions with mock objects for the tests.
@@ -161,6 +165,7 @@ class MonkeyPatcher(object):
         ('externalsites.tasks.fetch_subs', fetch_subs_task),
         ('videos.tasks.import_videos_from_feed', import_videos_from_feed),
         ('notifications.handlers.do_http_post', notifications_do_http_post),
+        ('subtitles.effects.on_commit', effects_on_commit),
     ]
     @classmethod
     def register_patch(cls, spec, mock_obj):